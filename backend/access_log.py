@@ -0,0 +1,72 @@
+"""
+Log de acesso em JSON
+Registra cada request atendido (rota, status, duração, usuário/parceiro) em
+ACCESS_LOG_PATH, uma linha JSON por request. É a entrada do replay de
+tráfego de produção (backend/benchmarks/replay.py).
+
+Corpos de request/response não são registrados.
+
+Settings:
+    - perf.access_log.enabled (ACCESS_LOG_ENABLED): liga o log (padrão true)
+"""
+import time
+from datetime import datetime
+
+from pyramid.settings import asbool
+
+from backend.logging_config import bootstrap_access_logging, log_access
+
+
+def build_access_entry(request, response, started_at, elapsed):
+    """Monta a linha do log de acesso de um request"""
+    claims = getattr(request, 'jwt_claims', None) or {}
+    return {
+        'timestamp': started_at.isoformat(),
+        'request_id': getattr(request, 'request_id', None),
+        'method': request.method,
+        'path': request.path,
+        'query': request.query_string,
+        'route': request.matched_route.name if getattr(request, 'matched_route', None) else None,
+        'status': response.status_code if response is not None else 500,
+        'duration_ms': round(elapsed * 1000, 2),
+        'bytes': response.content_length if response is not None else None,
+        'user_id': claims.get('user_id'),
+        'role': claims.get('role'),
+        'partner_id': claims.get('partner_id'),
+    }
+
+
+def access_log_tween_factory(handler, registry):
+    """
+    Tween do log de acesso
+
+    Fica acima do pyramid_tm para que a duração inclua o commit.
+    """
+    def access_log_tween(request):
+        started_at = datetime.utcnow()
+        started = time.perf_counter()
+        response = None
+        try:
+            response = handler(request)
+            return response
+        finally:
+            log_access(build_access_entry(request, response, started_at, time.perf_counter() - started))
+
+    return access_log_tween
+
+
+def includeme(config):
+    """
+    Registra o tween do log de acesso
+
+    Args:
+        config: Configurator do Pyramid
+    """
+    if not asbool(config.get_settings().get('perf.access_log.enabled', True)):
+        return
+
+    bootstrap_access_logging()
+    config.add_tween(
+        'backend.access_log.access_log_tween_factory',
+        over='pyramid_tm.tm_tween_factory'
+    )
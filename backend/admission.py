@@ -0,0 +1,189 @@
+"""
+Controle de admissão dos requests que usam o banco
+Limita os requests simultâneos que chegam ao banco e, sob carga, descarta
+primeiro o que é menos importante: login é servido mesmo com o limite
+atingido (folga reservada), requests comuns esperam um pouco por uma vaga e
+exportações só entram enquanto houver folga. O que não é admitido recebe 503
+com Retry-After em vez de ficar preso num worker.
+
+Também acompanha o tempo médio para obter uma conexão (com o NullPool, o
+tempo de conexão ao banco/PgBouncer); acima do limite, exportações são
+recusadas.
+
+Settings:
+    - perf.admission.max_in_flight (ADMISSION_MAX_IN_FLIGHT): requests simultâneos; 0 desliga
+    - perf.admission.max_wait_ms: espera máxima por uma vaga (padrão 250)
+    - perf.admission.low_priority_share: fração do limite para exportações (padrão 0.5)
+    - perf.admission.max_connect_wait_ms: tempo médio de conexão que bloqueia exportações (padrão 200)
+
+Health check e páginas de documentação não usam o banco e não passam pelo controle.
+"""
+import json
+import threading
+import time
+from collections import Counter
+
+from pyramid.interfaces import IRoutesMapper
+from pyramid.response import Response
+from sqlalchemy import event
+
+from backend.logging_config import log_warning
+
+RETRY_AFTER_SECONDS = 2
+CONNECT_WAIT_SMOOTHING = 0.2
+
+CRITICAL = 'critical'
+NORMAL = 'normal'
+LOW = 'low'
+
+ROUTE_PRIORITIES = {
+    'auth_login': CRITICAL,
+    'export_installments_csv': LOW,
+    'export_installments_pdf': LOW,
+    'report_consultant_utilization_csv': LOW,
+}
+NON_DB_ROUTES = {'health', 'api_home', 'api_docs', 'swagger_ui', 'openapi_spec'}
+
+
+class AdmissionController:
+    """Vagas de requests simultâneos por prioridade"""
+
+    def __init__(self, max_in_flight, max_wait_ms=250, low_priority_share=0.5, max_connect_wait_ms=200):
+        self.capacity = max_in_flight
+        self.critical_headroom = max(1, max_in_flight // 4)
+        self.low_priority_limit = max(1, int(max_in_flight * low_priority_share))
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_connect_wait_ms = max_connect_wait_ms
+        self.in_flight = 0
+        self.connect_wait_ms = 0.0
+        self.admitted = Counter()
+        self.rejected = Counter()
+        self._cond = threading.Condition()
+
+    def _limit(self, priority):
+        if priority == CRITICAL:
+            return self.capacity + self.critical_headroom
+        if priority == LOW:
+            if self.max_connect_wait_ms and self.connect_wait_ms > self.max_connect_wait_ms:
+                return 0
+            return self.low_priority_limit
+        return self.capacity
+
+    def acquire(self, priority):
+        """Ocupa uma vaga, esperando até max_wait (exportações não esperam); False se recusado"""
+        deadline = time.monotonic() + (0 if priority == LOW else self.max_wait)
+        with self._cond:
+            while self.in_flight >= self._limit(priority):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.rejected[priority] += 1
+                    return False
+                self._cond.wait(remaining)
+            self.in_flight += 1
+            self.admitted[priority] += 1
+            return True
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            # Acorda todos: quem tem limite maior (login) passa primeiro
+            self._cond.notify_all()
+
+    def _before_connect(self, dialect, conn_rec, cargs, cparams):
+        conn_rec.info['admission_connect_start'] = time.perf_counter()
+
+    def _after_connect(self, dbapi_connection, connection_record):
+        started = connection_record.info.pop('admission_connect_start', None)
+        if started is not None:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.connect_wait_ms += CONNECT_WAIT_SMOOTHING * (elapsed_ms - self.connect_wait_ms)
+
+    def attach(self, engine):
+        event.listen(engine, 'do_connect', self._before_connect)
+        event.listen(engine, 'connect', self._after_connect)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'max_in_flight': self.capacity,
+                'critical_headroom': self.critical_headroom,
+                'low_priority_limit': self.low_priority_limit,
+                'in_flight': self.in_flight,
+                'connect_wait_ms': round(self.connect_wait_ms, 2),
+                'admitted': dict(self.admitted),
+                'rejected': dict(self.rejected),
+            }
+
+
+def _overloaded_response():
+    response = Response(
+        json.dumps({'error': 'Servidor sobrecarregado. Tente novamente em instantes.'}).encode('utf-8'),
+        status=503,
+        content_type='application/json',
+        charset='utf-8'
+    )
+    response.headers['Retry-After'] = str(RETRY_AFTER_SECONDS)
+    return response
+
+
+def admission_tween_factory(handler, registry):
+    """
+    Tween de admissão
+
+    Fica acima do pyramid_tm: request recusado não abre transação nem conexão.
+    Os tweens rodam antes do roteamento, então a rota é resolvida aqui.
+    """
+    controller = registry.get('admission_controller')
+    if controller is None:
+        return handler
+
+    def admission_tween(request):
+        if request.method == 'OPTIONS':
+            return handler(request)
+        route = registry.getUtility(IRoutesMapper)(request)['route']
+        route_name = route.name if route else None
+        if route_name in NON_DB_ROUTES:
+            return handler(request)
+
+        priority = ROUTE_PRIORITIES.get(route_name, NORMAL)
+        if not controller.acquire(priority):
+            log_warning('request rejected by admission control', context={
+                'route': route_name,
+                'priority': priority,
+                'in_flight': controller.in_flight,
+                'connect_wait_ms': round(controller.connect_wait_ms, 2),
+            })
+            return _overloaded_response()
+        try:
+            return handler(request)
+        finally:
+            controller.release()
+
+    return admission_tween
+
+
+def includeme(config):
+    """
+    Registra o controle de admissão quando há limite configurado
+
+    Args:
+        config: Configurator do Pyramid
+    """
+    settings = config.get_settings()
+    max_in_flight = int(settings.get('perf.admission.max_in_flight', 0))
+    if max_in_flight <= 0:
+        return
+
+    controller = AdmissionController(
+        max_in_flight,
+        max_wait_ms=float(settings.get('perf.admission.max_wait_ms', 250)),
+        low_priority_share=float(settings.get('perf.admission.low_priority_share', 0.5)),
+        max_connect_wait_ms=float(settings.get('perf.admission.max_connect_wait_ms', 200)),
+    )
+    for engine in config.registry['dbengines']:
+        controller.attach(engine)
+    config.registry['admission_controller'] = controller
+    config.add_tween(
+        'backend.admission.admission_tween_factory',
+        over='pyramid_tm.tm_tween_factory'
+    )
@@ -0,0 +1,30 @@
+"""contracts.consumed_hours: horas consumidas mantidas a partir dos timesheets"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '20260410_0900_consumed_hours'
+down_revision: Union[str, None] = '20260403_1200_prd_api'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'contracts',
+        sa.Column('consumed_hours', sa.Numeric(precision=12, scale=2), nullable=False, server_default='0'),
+    )
+    op.execute(
+        """
+        UPDATE contracts c
+           SET consumed_hours = t.hours
+          FROM (SELECT contract_id, SUM(hours) AS hours FROM timesheets GROUP BY contract_id) t
+         WHERE t.contract_id = c.id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('contracts', 'consumed_hours')
@@ -0,0 +1,25 @@
+"""Índice parcial das parcelas em aberto (aging / previsão de caixa)"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '20260412_0900_open_receivables'
+down_revision: Union[str, None] = '20260410_0900_consumed_hours'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_installments_open_receivables',
+        'installments',
+        ['contract_id', 'expected_payment_date'],
+        unique=False,
+        postgresql_where=sa.text('payment_date IS NULL'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_installments_open_receivables', table_name='installments')
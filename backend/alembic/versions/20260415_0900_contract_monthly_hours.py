@@ -0,0 +1,49 @@
+"""contract_monthly_hours: horas consumidas por contrato, consultor e mês"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision: str = '20260415_0900_monthly_hours'
+down_revision: Union[str, None] = '20260412_0900_open_receivables'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'contract_monthly_hours',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('contract_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('consultant_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('month', sa.Date(), nullable=False),
+        sa.Column('hours', sa.Numeric(precision=12, scale=2), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint(
+            'contract_id', 'consultant_id', 'month',
+            name='uq_contract_monthly_hours', postgresql_nulls_not_distinct=True,
+        ),
+    )
+    op.create_index(
+        'ix_contract_monthly_hours_consultant_month',
+        'contract_monthly_hours',
+        ['consultant_id', 'month'],
+        unique=False,
+    )
+    op.execute(
+        """
+        INSERT INTO contract_monthly_hours (id, contract_id, consultant_id, month, hours)
+        SELECT gen_random_uuid(), contract_id, consultant_id,
+               date_trunc('month', COALESCE(filled_at, uploaded_at))::date AS month,
+               SUM(hours)
+          FROM timesheets
+         GROUP BY contract_id, consultant_id, month
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contract_monthly_hours_consultant_month', table_name='contract_monthly_hours')
+    op.drop_table('contract_monthly_hours')
@@ -0,0 +1,42 @@
+"""timesheets: colunas da detecção de horas anômalas"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '20260418_0900_ts_anomalies'
+down_revision: Union[str, None] = '20260415_0900_monthly_hours'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('timesheets', sa.Column('anomaly_score', sa.Numeric(precision=8, scale=2), nullable=True))
+    op.add_column(
+        'timesheets',
+        sa.Column('anomaly_flagged', sa.Boolean(), nullable=False, server_default=sa.false()),
+    )
+    op.add_column('timesheets', sa.Column('anomaly_checked_at', sa.DateTime(), nullable=True))
+    op.create_index(
+        'ix_timesheets_anomaly_flagged',
+        'timesheets',
+        ['contract_id'],
+        unique=False,
+        postgresql_where=sa.text('anomaly_flagged'),
+    )
+    op.create_index(
+        'ix_timesheets_anomaly_pending',
+        'timesheets',
+        ['created_at'],
+        unique=False,
+        postgresql_where=sa.text('anomaly_checked_at IS NULL'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_timesheets_anomaly_pending', table_name='timesheets')
+    op.drop_index('ix_timesheets_anomaly_flagged', table_name='timesheets')
+    op.drop_column('timesheets', 'anomaly_checked_at')
+    op.drop_column('timesheets', 'anomaly_flagged')
+    op.drop_column('timesheets', 'anomaly_score')
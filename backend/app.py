@@ -51,6 +51,45 @@ def main(global_config, **settings):
         # Fallback para config.py se não estiver em nenhum lugar
         settings['sqlalchemy.url'] = app_config.DATABASE_URL
     
+    # Réplicas de leitura (opcional) - GETs são distribuídos entre elas
+    if os.getenv('DATABASE_REPLICA_URLS'):
+        settings['sqlalchemy.replica_urls'] = os.getenv('DATABASE_REPLICA_URLS')
+    elif 'sqlalchemy.replica_urls' not in settings:
+        settings['sqlalchemy.replica_urls'] = app_config.DATABASE_REPLICA_URLS
+    
+    if os.getenv('REPLICA_STICKY_SECONDS'):
+        settings['perf.replica.sticky_seconds'] = os.getenv('REPLICA_STICKY_SECONDS')
+    elif 'perf.replica.sticky_seconds' not in settings:
+        settings['perf.replica.sticky_seconds'] = str(app_config.REPLICA_STICKY_SECONDS)
+    
+    # Compatibilidade com PgBouncer (pool em modo transaction)
+    if os.getenv('PGBOUNCER_MODE'):
+        settings['perf.pgbouncer.enabled'] = os.getenv('PGBOUNCER_MODE')
+    elif 'perf.pgbouncer.enabled' not in settings:
+        settings['perf.pgbouncer.enabled'] = app_config.PGBOUNCER_MODE
+    
+    # Timeouts de statement por classe de rota, aplicados por transação (SET LOCAL)
+    if os.getenv('DB_STATEMENT_TIMEOUT_MS'):
+        settings['perf.statement_timeout_ms'] = os.getenv('DB_STATEMENT_TIMEOUT_MS')
+    elif 'perf.statement_timeout_ms' not in settings:
+        settings['perf.statement_timeout_ms'] = str(app_config.DB_STATEMENT_TIMEOUT_MS)
+    
+    if os.getenv('DB_REPORT_STATEMENT_TIMEOUT_MS'):
+        settings['perf.statement_timeout.report_ms'] = os.getenv('DB_REPORT_STATEMENT_TIMEOUT_MS')
+    elif 'perf.statement_timeout.report_ms' not in settings:
+        settings['perf.statement_timeout.report_ms'] = str(app_config.DB_REPORT_STATEMENT_TIMEOUT_MS)
+    
+    if os.getenv('DB_EXPORT_STATEMENT_TIMEOUT_MS'):
+        settings['perf.statement_timeout.export_ms'] = os.getenv('DB_EXPORT_STATEMENT_TIMEOUT_MS')
+    elif 'perf.statement_timeout.export_ms' not in settings:
+        settings['perf.statement_timeout.export_ms'] = str(app_config.DB_EXPORT_STATEMENT_TIMEOUT_MS)
+    
+    # Controle de admissão (limite de requests simultâneos no banco, com prioridade por rota)
+    if os.getenv('ADMISSION_MAX_IN_FLIGHT'):
+        settings['perf.admission.max_in_flight'] = os.getenv('ADMISSION_MAX_IN_FLIGHT')
+    elif 'perf.admission.max_in_flight' not in settings:
+        settings['perf.admission.max_in_flight'] = str(app_config.ADMISSION_MAX_IN_FLIGHT)
+    
     # JWT Secret - prioridade: variável de ambiente > .ini
     if os.getenv('JWT_SECRET'):
         settings['jwt.secret'] = os.getenv('JWT_SECRET')
@@ -78,6 +117,47 @@ def main(global_config, **settings):
     elif 'cors.allow_origins' not in settings:
         settings['cors.allow_origins'] = ' '.join(app_config.CORS_ORIGINS)
     
+    # Orçamento de queries por request (detector de N+1)
+    if os.getenv('QUERY_BUDGET_MODE'):
+        settings['perf.query_budget.mode'] = os.getenv('QUERY_BUDGET_MODE')
+    elif 'perf.query_budget.mode' not in settings:
+        settings['perf.query_budget.mode'] = app_config.QUERY_BUDGET_MODE
+    
+    # Log de queries lentas
+    if os.getenv('SLOW_QUERY_THRESHOLD_MS'):
+        settings['perf.slow_query.threshold_ms'] = os.getenv('SLOW_QUERY_THRESHOLD_MS')
+    elif 'perf.slow_query.threshold_ms' not in settings:
+        settings['perf.slow_query.threshold_ms'] = str(app_config.SLOW_QUERY_THRESHOLD_MS)
+    
+    if os.getenv('SLOW_QUERY_EXPLAIN'):
+        settings['perf.slow_query.explain'] = os.getenv('SLOW_QUERY_EXPLAIN')
+    elif 'perf.slow_query.explain' not in settings:
+        settings['perf.slow_query.explain'] = app_config.SLOW_QUERY_EXPLAIN
+    
+    # Profiling sob demanda para admins
+    if os.getenv('PROFILING_ENABLED'):
+        settings['perf.profiling.enabled'] = os.getenv('PROFILING_ENABLED')
+    elif 'perf.profiling.enabled' not in settings:
+        settings['perf.profiling.enabled'] = app_config.PROFILING_ENABLED
+    
+    # Amostragem de memória (tracemalloc)
+    if os.getenv('MEMORY_PROFILE_SAMPLE_RATE'):
+        settings['perf.memory.sample_rate'] = os.getenv('MEMORY_PROFILE_SAMPLE_RATE')
+    elif 'perf.memory.sample_rate' not in settings:
+        settings['perf.memory.sample_rate'] = str(app_config.MEMORY_PROFILE_SAMPLE_RATE)
+    
+    # Log de acesso em JSON (entrada do replay de tráfego)
+    if os.getenv('ACCESS_LOG_ENABLED'):
+        settings['perf.access_log.enabled'] = os.getenv('ACCESS_LOG_ENABLED')
+    elif 'perf.access_log.enabled' not in settings:
+        settings['perf.access_log.enabled'] = app_config.ACCESS_LOG_ENABLED
+    
+    # Transação somente leitura para GET/HEAD
+    if os.getenv('READ_ONLY_REQUESTS'):
+        settings['perf.read_only_requests'] = os.getenv('READ_ONLY_REQUESTS')
+    elif 'perf.read_only_requests' not in settings:
+        settings['perf.read_only_requests'] = app_config.READ_ONLY_REQUESTS
+    
     config = Configurator(settings=settings)
     
     # Configura o JSON renderer com adapters customizados
@@ -93,6 +173,33 @@ def main(global_config, **settings):
     # Inclui configuração do banco de dados
     config.include('.database')
     
+    # Inclui a manutenção dos totais dos contratos (billed_value, balance, horas)
+    config.include('.contract_totals')
+    
+    # Inclui a tradução de statement_timeout em 503 (timeouts por classe de rota)
+    config.include('.statement_timeouts')
+    
+    # Inclui o controle de admissão (503 rápido quando o banco está saturado)
+    config.include('.admission')
+    
+    # Inclui o detector de N+1 / orçamento de queries (desligado por padrão)
+    config.include('.query_budget')
+    
+    # Inclui o log de queries lentas com EXPLAIN
+    config.include('.slow_query_log')
+    
+    # Inclui o profiling sob demanda (header X-Profile, apenas admin global)
+    config.include('.profiling')
+    
+    # Inclui a amostragem de memória por rota (desligada por padrão)
+    config.include('.memory_profiling')
+    
+    # Inclui o log de acesso em JSON (logs/access.log)
+    config.include('.access_log')
+    
+    # Inclui o id do request (X-Request-ID) nas linhas de log e na resposta
+    config.include('.request_id')
+    
     # Inclui as rotas
     config.include('.routes')
     
@@ -62,6 +62,7 @@ class AuthService:
             'username': user.username,
             'email': user.email,
             'role': user.role,
+            'partner_id': str(user.partner_id) if user.partner_id else None,
             'exp': expiration,
             'iat': datetime.utcnow()
         }
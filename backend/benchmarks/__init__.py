@@ -0,0 +1,4 @@
+"""
+Benchmarks de performance do backend
+Cada módulo pode ser executado isoladamente com `python -m backend.benchmarks.<nome>`
+"""
@@ -0,0 +1,445 @@
+"""
+Massa sintética para benchmarks
+Gera parceiros × clientes × contratos × parcelas × consultores × feedbacks ×
+timesheets de forma determinística (mesma semente = mesmos dados) e carrega
+no PostgreSQL em lotes.
+
+Os dados são referencialmente consistentes: billed_value/balance e
+consumed_hours de cada contrato (e as horas por consultor e mês) batem com
+as parcelas faturadas e os timesheets, consultores e timesheets pertencem ao parceiro do contrato e cada
+parceiro tem um admin de parceiro para os clientes autenticados do benchmark.
+"""
+import csv
+import enum
+import io
+import random
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import text
+
+from backend.auth import AuthService
+from backend.database import Base
+from backend.installment_schedule import add_months, month_label
+from backend.models import (
+    Partner, User, Client, Contract, Installment, Consultant, ConsultantFeedback, Timesheet,
+    ContractMonthlyHours, ContractStatus, UserRole, UserAssignmentType
+)
+
+BENCH_PASSWORD = 'bench123'
+BENCH_ADMIN_USERNAME = 'bench_admin'
+DEFAULT_BATCH_SIZE = 5000
+
+# Ordem de carga (pais antes dos filhos)
+TABLE_ORDER = [
+    Partner.__table__,
+    User.__table__,
+    Client.__table__,
+    Contract.__table__,
+    Installment.__table__,
+    Consultant.__table__,
+    ConsultantFeedback.__table__,
+    Timesheet.__table__,
+    ContractMonthlyHours.__table__,
+]
+
+
+class Scale:
+    """Quantidades de cada entidade na massa sintética"""
+
+    def __init__(self, partners=2, clients_per_partner=5, contracts_per_client=4,
+                 installments_per_contract=12, consultants_per_contract=3,
+                 feedbacks_per_consultant=4, timesheets_per_consultant=6):
+        self.partners = partners
+        self.clients_per_partner = clients_per_partner
+        self.contracts_per_client = contracts_per_client
+        self.installments_per_contract = installments_per_contract
+        self.consultants_per_contract = consultants_per_contract
+        self.feedbacks_per_consultant = feedbacks_per_consultant
+        self.timesheets_per_consultant = timesheets_per_consultant
+
+    @classmethod
+    def from_factor(cls, factor: float):
+        """
+        Escala proporcional ao número de parceiros (tenants)
+
+        Fator 1 ≈ 1 mil contratos, 24 mil parcelas e 36 mil timesheets;
+        fator 50 passa de 1 milhão de parcelas.
+        """
+        return cls(
+            partners=max(int(round(10 * factor)), 1),
+            clients_per_partner=20,
+            contracts_per_client=5,
+            installments_per_contract=24,
+            consultants_per_contract=3,
+            feedbacks_per_consultant=5,
+            timesheets_per_consultant=12,
+        )
+
+    def as_dict(self):
+        return dict(vars(self))
+
+    def expected_rows(self):
+        """Número aproximado de linhas por tabela"""
+        contracts = self.partners * self.clients_per_partner * self.contracts_per_client
+        consultants = contracts * self.consultants_per_contract
+        return {
+            'partners': self.partners,
+            'clients': self.partners * self.clients_per_partner,
+            'contracts': contracts,
+            'installments': contracts * self.installments_per_contract,
+            'consultants': consultants,
+            'consultant_feedbacks': consultants * self.feedbacks_per_consultant,
+            'timesheets': consultants * self.timesheets_per_consultant,
+        }
+
+
+def _money(value):
+    return Decimal(value).quantize(Decimal('0.01'))
+
+
+class DatasetGenerator:
+    """
+    Gera as linhas da massa sintética como dicionários por tabela
+
+    As linhas são produzidas em ordem de dependência (contrato antes das suas
+    parcelas, consultores antes dos seus feedbacks etc.), o que permite carregar
+    em lotes sem violar chaves estrangeiras.
+    """
+
+    def __init__(self, scale: Scale, seed: int = 42, now: datetime | None = None):
+        self.scale = scale
+        self.rng = random.Random(seed)
+        self.now = now or datetime(2026, 1, 1)
+        self.password_hash = AuthService.hash_password(BENCH_PASSWORD)
+
+    def _uuid(self):
+        return uuid.UUID(int=self.rng.getrandbits(128), version=4)
+
+    def installments_for(self, contract_id, total_value, start, count):
+        """Parcelas mensais de um contrato; as vencidas estão faturadas e a maioria paga"""
+        rows = []
+        if count <= 0:
+            return rows
+        value = _money(total_value / count)
+        for i in range(count):
+            due = add_months(start, i)
+            billed = due < self.now
+            payment_term = self.rng.choice([15, 30, 45]) if billed else None
+            billing_date = due + timedelta(days=self.rng.randint(0, 5)) if billed else None
+            expected = billing_date + timedelta(days=payment_term) if billed else None
+            paid = billed and self.rng.random() < 0.8
+            rows.append({
+                'id': self._uuid(),
+                'contract_id': contract_id,
+                'month': month_label(due),
+                'value': value,
+                'billed': billed,
+                'invoice_number': f'NF-{self.rng.randint(10000, 99999)}' if billed else None,
+                'billing_date': billing_date,
+                'payment_term': payment_term,
+                'expected_payment_date': expected,
+                'payment_date': expected + timedelta(days=self.rng.randint(-5, 20)) if paid else None,
+            })
+        return rows
+
+    def installment_count(self):
+        return self.scale.installments_per_contract
+
+    def consultant_count(self):
+        return self.scale.consultants_per_contract
+
+    def feedback_count(self):
+        return self.scale.feedbacks_per_consultant
+
+    def timesheet_count(self):
+        return self.scale.timesheets_per_consultant
+
+    def iter_rows(self):
+        """Produz tuplas (tabela, linha) em ordem de dependência"""
+        scale = self.scale
+        admin_id = self._uuid()
+        yield User.__table__, {
+            'id': admin_id,
+            'username': BENCH_ADMIN_USERNAME,
+            'email': f'{BENCH_ADMIN_USERNAME}@bench.local',
+            'password_hash': self.password_hash,
+            'role': UserRole.ADMIN_GLOBAL,
+            'assignment_type': UserAssignmentType.INTERNAL,
+            'partner_id': None,
+            'is_active': True,
+        }
+
+        for p in range(scale.partners):
+            partner_id = self._uuid()
+            yield Partner.__table__, {
+                'id': partner_id,
+                'name': f'Bench Partner {p:04d}',
+                'is_active': True,
+                'is_strategic': p % 3 == 0,
+                'status': 'active',
+            }
+            partner_admin_id = self._uuid()
+            yield User.__table__, {
+                'id': partner_admin_id,
+                'username': f'bench_partner_{p:04d}',
+                'email': f'bench_partner_{p:04d}@bench.local',
+                'password_hash': self.password_hash,
+                'role': UserRole.ADMIN_PARTNER,
+                'assignment_type': UserAssignmentType.PARTNER,
+                'partner_id': partner_id,
+                'is_active': True,
+            }
+
+            for c in range(scale.clients_per_partner):
+                client_id = self._uuid()
+                yield Client.__table__, {
+                    'id': client_id,
+                    'name': f'Bench Client {p:04d}-{c:04d}',
+                    'partner_id': partner_id,
+                    'cnpj': f'{self.rng.randint(10**13, 10**14 - 1)}',
+                    'razao_social': f'Bench Client {p:04d}-{c:04d} Ltda',
+                }
+
+                for k in range(scale.contracts_per_client):
+                    yield from self._contract_rows(
+                        partner_id, partner_admin_id, client_id, f'Bench Contract {p:04d}-{c:04d}-{k:03d}'
+                    )
+
+    def _contract_rows(self, partner_id, author_id, client_id, name):
+        contract_id = self._uuid()
+        installment_count = self.installment_count()
+        duration = max(installment_count, 1)
+        start = add_months(self.now, -self.rng.randint(0, duration))
+        total_value = _money(self.rng.randint(50, 2000) * 1000)
+        installments = self.installments_for(contract_id, total_value, start, installment_count)
+        billed_value = sum((row['value'] for row in installments if row['billed']), Decimal('0.00'))
+        monthly_hours = Decimal(self.rng.choice([80, 120, 160]))
+
+        contract = {
+            'id': contract_id,
+            'name': name,
+            'client_id': client_id,
+            'total_value': total_value,
+            'billed_value': billed_value,
+            'balance': total_value - billed_value,
+            'status': ContractStatus.ATIVO if self.rng.random() < 0.85 else ContractStatus.INATIVO,
+            'end_date': add_months(start, duration),
+            'responsible_name': f'Responsável {self.rng.randint(1, 500)}',
+            'payment_method': 'parcelado',
+            'contract_type': 'body_shop_recorrente',
+            'estimated_monthly_hours': monthly_hours,
+            'duration_months': duration,
+            'total_hours_contracted': monthly_hours * duration,
+            # Datas fixas: mesma massa, mesmo plano (o DISTINCT de /api/consultants agrupa por elas)
+            'created_at': start,
+            'updated_at': start,
+        }
+        staff = list(self._staff_rows(partner_id, author_id, contract_id, start, monthly_hours))
+        timesheets = [row for table, row in staff if table is Timesheet.__table__]
+        contract['consumed_hours'] = sum((row['hours'] for row in timesheets), Decimal('0.00'))
+        monthly_hours_rows = {}
+        for row in timesheets:
+            key = (row['consultant_id'], row['filled_at'].date().replace(day=1))
+            monthly_hours_rows[key] = monthly_hours_rows.get(key, Decimal('0.00')) + row['hours']
+
+        yield Contract.__table__, contract
+        for row in installments:
+            yield Installment.__table__, row
+        yield from staff
+        for (consultant_id, month), hours in monthly_hours_rows.items():
+            yield ContractMonthlyHours.__table__, {
+                'id': self._uuid(),
+                'contract_id': contract_id,
+                'consultant_id': consultant_id,
+                'month': month,
+                'hours': hours,
+            }
+
+    def _staff_rows(self, partner_id, author_id, contract_id, start, monthly_hours):
+        for _ in range(self.consultant_count()):
+            consultant_id = self._uuid()
+            yield Consultant.__table__, {
+                'id': consultant_id,
+                'name': f'Consultor {self.rng.randint(1, 10**6)}',
+                'role': self.rng.choice(['Desenvolvedor', 'Arquiteto', 'QA', 'Gerente de Projeto']),
+                'contract_id': contract_id,
+                'partner_id': partner_id,
+                'feedback_score': Decimal(self.rng.randint(60, 100)),
+            }
+            for _ in range(self.feedback_count()):
+                yield ConsultantFeedback.__table__, {
+                    'id': self._uuid(),
+                    'consultant_id': consultant_id,
+                    'user_id': author_id,
+                    'contract_id': contract_id,
+                    'comment': 'Feedback sintético de benchmark',
+                    'rating': self.rng.randint(50, 100),
+                }
+            for t in range(self.timesheet_count()):
+                filled_at = add_months(start, t) + timedelta(days=self.rng.randint(0, 27))
+                yield Timesheet.__table__, {
+                    'id': self._uuid(),
+                    'contract_id': contract_id,
+                    'consultant_id': consultant_id,
+                    'file_url': None,
+                    'hours': _money(self.rng.gauss(float(monthly_hours), 12)),
+                    'approver': 'Aprovador Bench',
+                    'approval_date': filled_at + timedelta(days=2),
+                    'approved': True,
+                    'filled_at': filled_at,
+                }
+
+
+class RaggedDatasetGenerator(DatasetGenerator):
+    """
+    Variante com distribuições irregulares, mais próximas da produção
+
+    As quantidades do `Scale` passam a ser médias: há contratos à vista (uma
+    parcela) e parcelamentos longos, contratos sem consultor e consultores com
+    dezenas de feedbacks (cauda longa).
+    """
+
+    INSTALLMENT_PLANS = (1, 3, 6, 12, 24, 36, 48)
+
+    def installment_count(self):
+        mean = self.scale.installments_per_contract
+        # Planos usuais em torno da média; ~10% à vista
+        if self.rng.random() < 0.1:
+            return 1
+        plans = [p for p in self.INSTALLMENT_PLANS if p > 1]
+        weights = [1 / (1 + abs(p - mean)) for p in plans]
+        return self.rng.choices(plans, weights=weights)[0]
+
+    def consultant_count(self):
+        return self._poisson(self.scale.consultants_per_contract)
+
+    def feedback_count(self):
+        # Pareto: a maioria recebe poucos feedbacks, alguns recebem muitos
+        mean = self.scale.feedbacks_per_consultant
+        if mean <= 0:
+            return 0
+        return min(int(self.rng.paretovariate(1.5) * mean / 3), mean * 20)
+
+    def timesheet_count(self):
+        return self._poisson(self.scale.timesheets_per_consultant)
+
+    def _poisson(self, mean):
+        # Knuth; suficiente para médias pequenas
+        if mean <= 0:
+            return 0
+        limit, k, p = pow(2.718281828459045, -mean), 0, 1.0
+        while True:
+            p *= self.rng.random()
+            if p <= limit:
+                return k
+            k += 1
+
+    def _contract_rows(self, partner_id, author_id, client_id, name):
+        for table, row in super()._contract_rows(partner_id, author_id, client_id, name):
+            if table is Contract.__table__ and row['duration_months'] == 1:
+                row['payment_method'] = 'a_vista'
+            yield table, row
+
+
+def insert_rows(connection, table, rows):
+    """Carrega um lote com INSERT multi-row (executemany) via SQLAlchemy Core"""
+    connection.execute(table.insert(), rows)
+
+
+_copy_converters_cache = {}
+
+
+def _copy_converters(connection, table):
+    """Conversores por coluna: defaults do model + bind processors do tipo (enums, UUID etc.)"""
+    converters = []
+    for column in table.columns:
+        default = column.default
+        if default is not None and default.is_callable:
+            default_value = lambda d=default: d.arg(None)
+        elif default is not None and default.is_scalar:
+            default_value = lambda d=default: d.arg
+        else:
+            default_value = lambda: None
+        processor = column.type.bind_processor(connection.dialect)
+        converters.append((column.name, default_value, processor))
+    return converters
+
+
+def _copy_value(value, processor):
+    if value is None:
+        return None
+    if processor is not None:
+        value = processor(value)
+    if isinstance(value, enum.Enum):
+        value = value.value
+    return value
+
+
+def copy_rows(connection, table, rows):
+    """
+    Carrega um lote com COPY ... FROM STDIN (CSV) pelo cursor do psycopg2
+
+    Ordens de grandeza mais rápido que INSERTs para milhões de linhas. Os
+    defaults do model (created_at etc.) e as conversões de tipo são aplicados
+    aqui, já que o COPY não passa pelo SQLAlchemy.
+    """
+    key = (connection.dialect.name, table.name)
+    if key not in _copy_converters_cache:
+        _copy_converters_cache[key] = _copy_converters(connection, table)
+    converters = _copy_converters_cache[key]
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([
+            _copy_value(row[name] if name in row else default_value(), processor)
+            for name, default_value, processor in converters
+        ])
+    buffer.seek(0)
+
+    columns = ', '.join(name for name, _, _ in converters)
+    cursor = connection.connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(f'COPY {table.name} ({columns}) FROM STDIN WITH (FORMAT csv)', buffer)
+    finally:
+        cursor.close()
+
+
+def load_dataset(engine, generator: DatasetGenerator, batch_size=DEFAULT_BATCH_SIZE, loader=insert_rows):
+    """
+    Carrega a massa em lotes, sempre descarregando as tabelas na ordem de dependência
+
+    Returns:
+        dict com o número de linhas carregadas por tabela
+    """
+    buffers = {table: [] for table in TABLE_ORDER}
+    counts = {table.name: 0 for table in TABLE_ORDER}
+
+    def flush(connection):
+        for table in TABLE_ORDER:
+            rows = buffers[table]
+            if rows:
+                loader(connection, table, rows)
+                counts[table.name] += len(rows)
+                buffers[table] = []
+
+    with engine.begin() as connection:
+        pending = 0
+        for table, row in generator.iter_rows():
+            buffers[table].append(row)
+            pending += 1
+            if pending >= batch_size:
+                flush(connection)
+                pending = 0
+        flush(connection)
+    return counts
+
+
+def reset_database(engine):
+    """Cria o schema se necessário e apaga todos os dados das tabelas da aplicação"""
+    Base.metadata.create_all(engine)
+    names = ', '.join(table.name for table in reversed(TABLE_ORDER))
+    with engine.begin() as connection:
+        connection.execute(text(f'TRUNCATE {names} CASCADE'))
@@ -0,0 +1,321 @@
+"""
+Benchmark de carga dos endpoints
+Semeia uma massa sintética num PostgreSQL local e dispara requests
+autenticados concorrentes contra a aplicação WSGI real (tweens, pyramid_tm,
+renderers), medindo por endpoint: throughput, latência p50/p95/p99, número de
+queries e pico de RSS. O resultado é salvo em JSON para comparar commits.
+
+Uso:
+  python -m backend.benchmarks.endpoints --database-url postgresql://.../ccm_bench --reset --seed
+  python -m backend.benchmarks.endpoints --requests 200 --concurrency 8 --compare benchmarks/results/abc123.json
+
+ATENÇÃO: --reset apaga todos os dados do banco informado. Use um banco dedicado.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from pyramid.interfaces import IRoutesMapper
+from sqlalchemy import create_engine, select
+from webob import Request
+
+from backend.app import main as make_app
+from backend.auth import AuthService
+from backend.benchmarks.dataset import (
+    BENCH_ADMIN_USERNAME, BENCH_PASSWORD, DatasetGenerator, Scale, copy_rows, load_dataset, reset_database
+)
+from backend.config import config as app_config
+from backend.models import Client, Consultant, Contract, Installment, Timesheet, User
+from backend.query_budget import QUERY_COUNT_HEADER
+
+RESULTS_DIR = Path('benchmarks/results')
+RSS_SAMPLE_INTERVAL = 0.05
+
+
+def percentile(values, pct):
+    """Percentil por interpolação linear (values já ordenados)"""
+    if not values:
+        return 0.0
+    k = (len(values) - 1) * pct / 100
+    lower = int(k)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (k - lower)
+
+
+def current_rss_kb():
+    """RSS atual do processo (Linux /proc); fora do Linux usa o máximo histórico"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class RssSampler:
+    """Amostra o RSS numa thread separada e guarda o pico do intervalo"""
+
+    def __init__(self):
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, current_rss_kb())
+            time.sleep(RSS_SAMPLE_INTERVAL)
+
+    def __enter__(self):
+        self.peak = current_rss_kb()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss_kb())
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def build_app(database_url, **overrides):
+    """Cria a aplicação WSGI real com o contador de queries ligado"""
+    settings = {
+        'sqlalchemy.url': database_url,
+        'jwt.secret': app_config.JWT_SECRET,
+        'jwt.algorithm': app_config.JWT_ALGORITHM,
+        'perf.query_budget.mode': 'warn',
+        'perf.slow_query.threshold_ms': '0',
+        'perf.profiling.enabled': 'false',
+        'perf.memory.sample_rate': '0',
+        'perf.access_log.enabled': 'false',
+        **overrides,
+    }
+    return make_app({}, **settings)
+
+
+class Fixtures:
+    """Ids e tokens da massa semeada usados para montar os requests"""
+
+    def __init__(self, engine):
+        with engine.connect() as conn:
+            self.admin = conn.execute(select(User).where(User.username == BENCH_ADMIN_USERNAME)).first()
+            self.partner_admin = conn.execute(
+                select(User).where(User.username.like('bench_partner_%')).order_by(User.username)
+            ).first()
+            if self.admin is None or self.partner_admin is None:
+                raise SystemExit('Massa de benchmark não encontrada. Rode com --seed.')
+            self.partner_id = self.partner_admin.partner_id
+            self.client_id = conn.execute(
+                select(Client.id).where(Client.partner_id == self.partner_id)
+            ).scalar()
+            self.contract_id = conn.execute(
+                select(Contract.id).where(Contract.client_id == self.client_id)
+            ).scalar()
+            self.installment_ids = conn.execute(
+                select(Installment.id).where(Installment.contract_id == self.contract_id)
+            ).scalars().all()
+            self.consultant_id = conn.execute(
+                select(Consultant.id).where(Consultant.contract_id == self.contract_id)
+            ).scalar()
+            self.timesheet_id = conn.execute(
+                select(Timesheet.id).where(Timesheet.contract_id == self.contract_id)
+            ).scalar()
+
+        self.admin_token = AuthService.create_token(self.admin)
+        self.partner_token = AuthService.create_token(self.partner_admin)
+
+
+def build_scenarios(fx: Fixtures):
+    """
+    Cenários por rota: (nome, rota, método, path, body, token)
+
+    Escritas usam objetos da própria massa e são idempotentes (o mesmo PATCH
+    repetido), para que o benchmark possa rodar várias vezes no mesmo banco.
+    """
+    admin, partner = fx.admin_token, fx.partner_token
+    installment_id = fx.installment_ids[0]
+    return [
+        ('health', 'health', 'GET', '/api/health', None, None),
+        ('api_home', 'api_home', 'GET', '/api', None, None),
+        ('auth_login', 'auth_login', 'POST', '/api/auth/login',
+         {'username': BENCH_ADMIN_USERNAME, 'password': BENCH_PASSWORD}, None),
+        ('auth_users', 'auth_users', 'GET', '/api/auth/users', None, admin),
+        ('auth_user', 'auth_user', 'GET', f'/api/auth/users/{fx.partner_admin.id}', None, admin),
+        ('dashboard[admin]', 'dashboard', 'GET', '/api/dashboard', None, admin),
+        ('dashboard[partner]', 'dashboard', 'GET', '/api/dashboard', None, partner),
+        ('clients', 'clients', 'GET', '/api/clients', None, partner),
+        ('client', 'client', 'GET', f'/api/clients/{fx.client_id}', None, partner),
+        ('contracts', 'contracts', 'GET', '/api/contracts', None, partner),
+        ('contract', 'contract', 'GET', f'/api/contracts/{fx.contract_id}', None, partner),
+        ('consultants', 'consultants', 'GET', '/api/consultants', None, partner),
+        ('consultant', 'consultant', 'GET', f'/api/consultants/{fx.consultant_id}', None, partner),
+        ('feedbacks_list', 'feedbacks_list', 'GET', '/api/feedbacks', None, partner),
+        ('installments', 'installments', 'GET', '/api/installments', None, partner),
+        ('installments_summary', 'installments_summary', 'GET', '/api/installments/summary', None, partner),
+        ('installment', 'installment', 'GET', f'/api/installments/{installment_id}', None, partner),
+        ('installment[PATCH]', 'installment', 'PATCH', f'/api/installments/{installment_id}',
+         {'invoice_number': 'NF-BENCH'}, partner),
+        ('installment_mark_billed', 'installment_mark_billed', 'PATCH',
+         f'/api/installments/{installment_id}/mark-billed', {'billed': True}, partner),
+        ('partners', 'partners', 'GET', '/api/partners', None, admin),
+        ('partner', 'partner', 'GET', f'/api/partners/{fx.partner_id}', None, admin),
+        ('timesheets', 'timesheets', 'GET', '/api/timesheets', None, partner),
+        ('timesheet', 'timesheet', 'GET', f'/api/timesheets/{fx.timesheet_id}', None, partner),
+        ('export_installments_csv', 'export_installments_csv', 'GET', '/api/installments/export/csv', None, partner),
+        ('export_installments_pdf', 'export_installments_pdf', 'GET', '/api/installments/export/pdf', None, partner),
+    ]
+
+
+def call_endpoint(app, method, path, body, token):
+    request = Request.blank(path, method=method)
+    if token:
+        request.headers['Authorization'] = f'Bearer {token}'
+    if body is not None:
+        request.body = json.dumps(body).encode('utf-8')
+        request.content_type = 'application/json'
+    started = time.perf_counter()
+    response = request.get_response(app)
+    elapsed = time.perf_counter() - started
+    return elapsed, response.status_code, int(response.headers.get(QUERY_COUNT_HEADER, 0))
+
+
+def run_scenario(app, scenario, requests, concurrency):
+    name, route, method, path, body, token = scenario
+    call_endpoint(app, method, path, body, token)  # aquecimento
+
+    with RssSampler() as rss, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        started = time.perf_counter()
+        results = list(pool.map(lambda _: call_endpoint(app, method, path, body, token), range(requests)))
+        wall = time.perf_counter() - started
+
+    latencies = sorted(r[0] * 1000 for r in results)
+    errors = sum(1 for r in results if r[1] >= 400)
+    return {
+        'name': name,
+        'route': route,
+        'method': method,
+        'requests': requests,
+        'errors': errors,
+        'throughput_rps': round(requests / wall, 2) if wall else 0,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'queries': round(sum(r[2] for r in results) / len(results), 1),
+        'peak_rss_kb': rss.peak,
+    }
+
+
+def uncovered_routes(app, scenarios):
+    """Rotas registradas no app sem cenário no benchmark"""
+    mapper = app.registry.getUtility(IRoutesMapper)
+    covered = {scenario[1] for scenario in scenarios}
+    return sorted(route.name for route in mapper.get_routes() if route.name not in covered)
+
+
+def compare(current, baseline_path):
+    """Imprime a variação de p95, throughput e queries em relação a um resultado anterior"""
+    with open(baseline_path, encoding='utf-8') as baseline_file:
+        baseline = {r['name']: r for r in json.load(baseline_file)['endpoints']}
+    print(f"\nComparação com {baseline_path}")
+    print(f"{'endpoint':<28} {'p95 Δ%':>9} {'rps Δ%':>9} {'queries Δ':>10}")
+    for result in current['endpoints']:
+        base = baseline.get(result['name'])
+        if not base:
+            continue
+        p95 = (result['p95_ms'] / base['p95_ms'] - 1) * 100 if base['p95_ms'] else 0
+        rps = (result['throughput_rps'] / base['throughput_rps'] - 1) * 100 if base['throughput_rps'] else 0
+        print(f"{result['name']:<28} {p95:>+9.1f} {rps:>+9.1f} {result['queries'] - base['queries']:>+10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de carga dos endpoints com massa sintética')
+    parser.add_argument('--database-url', default=os.getenv('BENCH_DATABASE_URL', app_config.DATABASE_URL))
+    parser.add_argument('--reset', action='store_true', help='Apaga TODOS os dados do banco antes de semear')
+    parser.add_argument('--seed', action='store_true', help='Semeia a massa sintética')
+    parser.add_argument('--partners', type=int, default=2)
+    parser.add_argument('--clients-per-partner', type=int, default=5)
+    parser.add_argument('--contracts-per-client', type=int, default=4)
+    parser.add_argument('--installments-per-contract', type=int, default=12)
+    parser.add_argument('--consultants-per-contract', type=int, default=3)
+    parser.add_argument('--feedbacks-per-consultant', type=int, default=4)
+    parser.add_argument('--timesheets-per-consultant', type=int, default=6)
+    parser.add_argument('--requests', type=int, default=100, help='Requests por endpoint')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--only', nargs='*', help='Roda apenas os cenários informados')
+    parser.add_argument('--output', help='Arquivo de resultado (padrão: benchmarks/results/<commit>.json)')
+    parser.add_argument('--compare', help='Resultado anterior para comparação')
+    args = parser.parse_args()
+
+    scale = Scale(
+        partners=args.partners,
+        clients_per_partner=args.clients_per_partner,
+        contracts_per_client=args.contracts_per_client,
+        installments_per_contract=args.installments_per_contract,
+        consultants_per_contract=args.consultants_per_contract,
+        feedbacks_per_consultant=args.feedbacks_per_consultant,
+        timesheets_per_consultant=args.timesheets_per_consultant,
+    )
+
+    engine = create_engine(args.database_url)
+    if args.reset:
+        reset_database(engine)
+    if args.seed:
+        started = time.perf_counter()
+        counts = load_dataset(engine, DatasetGenerator(scale), loader=copy_rows)
+        print(f"Massa carregada em {time.perf_counter() - started:.1f}s: {counts}")
+
+    fixtures = Fixtures(engine)
+    engine.dispose()
+
+    app = build_app(args.database_url)
+    scenarios = build_scenarios(fixtures)
+    if args.only:
+        scenarios = [s for s in scenarios if s[0] in args.only]
+
+    print(f"{'endpoint':<28} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'queries':>8} {'rss MB':>8} {'erros':>6}")
+    endpoints = []
+    for scenario in scenarios:
+        result = run_scenario(app, scenario, args.requests, args.concurrency)
+        endpoints.append(result)
+        print(f"{result['name']:<28} {result['throughput_rps']:>8} {result['p50_ms']:>8} "
+              f"{result['p95_ms']:>8} {result['p99_ms']:>8} {result['queries']:>8} "
+              f"{result['peak_rss_kb'] / 1024:>8.1f} {result['errors']:>6}")
+
+    missing = uncovered_routes(app, scenarios)
+    if missing:
+        print(f"\nRotas sem cenário: {', '.join(missing)}")
+
+    revision = git_revision()
+    report = {
+        'revision': revision,
+        'created_at': datetime.utcnow().isoformat(),
+        'scale': scale.as_dict(),
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'endpoints': endpoints,
+        'uncovered_routes': missing,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f'{revision}.json'
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as out:
+        json.dump(report, out, indent=2, ensure_ascii=False)
+    print(f"\nResultado salvo em {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == '__main__':
+    main()
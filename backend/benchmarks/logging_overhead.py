@@ -0,0 +1,92 @@
+"""
+Benchmark do custo de logging por request
+Compara o handler rotativo síncrono (antigo) com o pipeline via fila
+(QueueHandler/QueueListener) e com o nível desabilitado.
+
+Uso:
+  python -m backend.benchmarks.logging_overhead --requests 5000 --logs-per-request 5
+"""
+import argparse
+import logging
+import tempfile
+import time
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from backend import logging_config
+from backend.logging_config import (
+    FORMAT_STRING, MAX_LOG_BYTES, BACKUP_COUNT, JsonLinesFormatter,
+    make_queue_handler, stop_logging, log_info, log_debug
+)
+
+CONTEXT = {
+    'user_id': '0b5e3c1a-8f6d-4f0e-9d43-3f0f4c9f4a11',
+    'route': 'installments',
+    'filters': {'billed': 'false', 'year': '25'},
+}
+
+
+def _simulate_requests(requests: int, logs_per_request: int, log_fn) -> float:
+    """Executa `requests` requests simulados e retorna o custo médio (µs) por request"""
+    started = time.perf_counter()
+    for i in range(requests):
+        token = logging_config.set_request_id(f'bench-{i}')
+        for _ in range(logs_per_request):
+            log_fn('installments listed', context=CONTEXT)
+        logging_config.reset_request_id(token)
+    return (time.perf_counter() - started) / requests * 1_000_000
+
+
+def _run_scenario(name, handler, requests, logs_per_request, log_fn=log_info):
+    backend_logger = logging.getLogger('backend')
+    backend_logger.handlers = [handler]
+    backend_logger.setLevel(logging.INFO)
+    backend_logger.propagate = False
+    try:
+        per_request = _simulate_requests(requests, logs_per_request, log_fn)
+    finally:
+        backend_logger.handlers = []
+    return {'scenario': name, 'us_per_request': round(per_request, 2)}
+
+
+def run(requests: int, logs_per_request: int):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+
+        sync_handler = RotatingFileHandler(
+            tmp_path / 'sync.log', maxBytes=MAX_LOG_BYTES, backupCount=BACKUP_COUNT, encoding='utf-8'
+        )
+        sync_handler.setFormatter(logging.Formatter(FORMAT_STRING))
+        results.append(_run_scenario('sync_rotating_file', sync_handler, requests, logs_per_request))
+        sync_handler.close()
+
+        queued_handler = RotatingFileHandler(
+            tmp_path / 'queued.log', maxBytes=MAX_LOG_BYTES, backupCount=BACKUP_COUNT, encoding='utf-8'
+        )
+        queued_handler.setFormatter(JsonLinesFormatter())
+        results.append(_run_scenario(
+            'queue_json_lines', make_queue_handler(queued_handler), requests, logs_per_request
+        ))
+
+        results.append(_run_scenario(
+            'disabled_level', logging.NullHandler(), requests, logs_per_request, log_fn=log_debug
+        ))
+        stop_logging()
+        queued_handler.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do custo de logging por request')
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--logs-per-request', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'cenário':<22} {'µs/request':>12}")
+    for result in run(args.requests, args.logs_per_request):
+        print(f"{result['scenario']:<22} {result['us_per_request']:>12}")
+
+
+if __name__ == '__main__':
+    main()
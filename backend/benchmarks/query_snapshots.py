@@ -0,0 +1,137 @@
+"""
+Snapshots de queries por endpoint
+Executa um request de cada cenário do benchmark de endpoints contra a massa
+sintética padrão e registra a sequência de statements SQL normalizados
+(valores trocados por `?`). O resultado é comparado com o snapshot versionado
+em SNAPSHOT_PATH: qualquer query nova, removida ou repetida (N+1) aparece
+como diff e o comando sai com código 1, para rodar no CI.
+
+Uso:
+  python -m backend.benchmarks.query_snapshots --database-url postgresql://.../ccm_bench --reset --seed
+  python -m backend.benchmarks.query_snapshots --update   # regrava o snapshot após mudança intencional
+
+ATENÇÃO: --reset apaga todos os dados do banco informado. Use um banco dedicado.
+"""
+import argparse
+import difflib
+import json
+import os
+import sys
+from pathlib import Path
+
+from sqlalchemy import create_engine, event
+
+from backend.benchmarks.dataset import DatasetGenerator, Scale, copy_rows, load_dataset, reset_database
+from backend.benchmarks.endpoints import Fixtures, build_app, build_scenarios, uncovered_routes, call_endpoint
+from backend.config import config as app_config
+from backend.query_budget import normalize_statement
+
+SNAPSHOT_PATH = Path(__file__).resolve().parent / 'snapshots' / 'queries.json'
+
+
+class StatementRecorder:
+    """Guarda os statements normalizados executados enquanto está ativo"""
+
+    def __init__(self):
+        self.statements = None
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.statements is not None:
+            self.statements.append(normalize_statement(statement))
+
+    def record(self, func, *args):
+        self.statements = []
+        try:
+            status = func(*args)[1]
+            return status, self.statements
+        finally:
+            self.statements = None
+
+
+def capture(app, scenarios):
+    """Executa cada cenário uma vez; retorna {nome: {status, queries, statements}}"""
+    recorder = StatementRecorder()
+    for engine in app.registry['dbengines']:
+        event.listen(engine, 'before_cursor_execute', recorder.before_cursor_execute)
+    snapshots = {}
+    for name, _route, method, path, body, token in scenarios:
+        status, statements = recorder.record(call_endpoint, app, method, path, body, token)
+        snapshots[name] = {'status': status, 'queries': len(statements), 'statements': statements}
+    return snapshots
+
+
+def _lines(entry):
+    if entry is None:
+        return []
+    return [f"status {entry['status']}", f"queries {entry['queries']}", *entry['statements']]
+
+
+def diff_snapshots(expected, current):
+    """Diffs (unificados) dos cenários cujo SQL mudou"""
+    diffs = {}
+    for name in sorted(set(expected) | set(current)):
+        before, after = _lines(expected.get(name)), _lines(current.get(name))
+        if before != after:
+            diffs[name] = '\n'.join(difflib.unified_diff(
+                before, after, fromfile=f'{name} (snapshot)', tofile=f'{name} (atual)', lineterm=''
+            ))
+    return diffs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara o SQL de cada endpoint com o snapshot versionado')
+    parser.add_argument('--database-url', default=os.getenv('BENCH_DATABASE_URL', app_config.DATABASE_URL))
+    parser.add_argument('--reset', action='store_true', help='Apaga TODOS os dados do banco antes de semear')
+    parser.add_argument('--seed', action='store_true', help='Semeia a massa sintética padrão')
+    parser.add_argument('--update', action='store_true', help='Regrava o snapshot com o SQL atual')
+    parser.add_argument('--strict', action='store_true', help='Falha também se houver rotas sem cenário')
+    parser.add_argument('--snapshot', default=str(SNAPSHOT_PATH))
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    if args.reset:
+        reset_database(engine)
+    if args.seed:
+        # Sempre a massa padrão: os snapshots dependem dos dados
+        load_dataset(engine, DatasetGenerator(Scale()), loader=copy_rows)
+    fixtures = Fixtures(engine)
+    engine.dispose()
+
+    app = build_app(args.database_url)
+    scenarios = build_scenarios(fixtures)
+    current = capture(app, scenarios)
+    snapshot_path = Path(args.snapshot)
+
+    if args.update:
+        snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(snapshot_path, 'w', encoding='utf-8') as out:
+            json.dump(current, out, indent=2, ensure_ascii=False)
+            out.write('\n')
+        print(f"Snapshot de {len(current)} cenários salvo em {snapshot_path}")
+        return
+
+    if not snapshot_path.exists():
+        raise SystemExit(f'Snapshot {snapshot_path} não encontrado. Gere com --update.')
+    with open(snapshot_path, encoding='utf-8') as snapshot_file:
+        expected = json.load(snapshot_file)
+
+    diffs = diff_snapshots(expected, current)
+    for name, diff in diffs.items():
+        print(diff, end='\n\n')
+    for name, entry in current.items():
+        before = expected.get(name, {}).get('queries')
+        marker = 'OK' if name not in diffs else 'MUDOU'
+        print(f"{name:<28} {entry['queries']:>4} queries (snapshot: {before if before is not None else '-'}) {marker}")
+
+    missing = uncovered_routes(app, scenarios)
+    if missing:
+        print(f"\nRotas sem cenário: {', '.join(missing)}")
+
+    if diffs:
+        print('\nSQL diferente do snapshot. Se a mudança for intencional, rode com --update.')
+    if diffs or (missing and args.strict):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Benchmark da sessão somente leitura
+Roda os cenários GET do benchmark de endpoints com `perf.read_only_requests`
+desligado e ligado e compara a latência por endpoint — mede o custo que a
+sessão transacional (zope.sqlalchemy, autoflush, expire_on_commit) somava
+às leituras.
+
+Uso:
+  python -m backend.benchmarks.read_only --database-url postgresql://.../ccm_bench --requests 300
+"""
+import argparse
+import os
+
+from sqlalchemy import create_engine
+
+from backend.benchmarks.endpoints import Fixtures, build_app, build_scenarios, run_scenario
+from backend.config import config as app_config
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara leituras com e sem a sessão somente leitura')
+    parser.add_argument('--database-url', default=os.getenv('BENCH_DATABASE_URL', app_config.DATABASE_URL))
+    parser.add_argument('--requests', type=int, default=200, help='Requests por endpoint')
+    parser.add_argument('--concurrency', type=int, default=1)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    fixtures = Fixtures(engine)
+    engine.dispose()
+    scenarios = [s for s in build_scenarios(fixtures) if s[2] == 'GET']
+
+    results = {}
+    for mode in ('false', 'true'):
+        app = build_app(args.database_url, **{'perf.read_only_requests': mode})
+        results[mode] = {
+            scenario[0]: run_scenario(app, scenario, args.requests, args.concurrency)
+            for scenario in scenarios
+        }
+
+    print(f"{'endpoint':<28} {'p50 rw':>9} {'p50 ro':>9} {'Δ%':>7} {'p95 rw':>9} {'p95 ro':>9} {'Δ%':>7}")
+    for name, before in results['false'].items():
+        after = results['true'][name]
+        p50 = (after['p50_ms'] / before['p50_ms'] - 1) * 100 if before['p50_ms'] else 0
+        p95 = (after['p95_ms'] / before['p95_ms'] - 1) * 100 if before['p95_ms'] else 0
+        print(f"{name:<28} {before['p50_ms']:>9} {after['p50_ms']:>9} {p50:>+7.1f} "
+              f"{before['p95_ms']:>9} {after['p95_ms']:>9} {p95:>+7.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,449 @@
+"""
+Replay de tráfego de produção
+Reproduz o tráfego real de leitura contra a massa sintética, com o mesmo mix
+de rotas, a mesma distribuição por parceiro e os mesmos intervalos entre
+requests, e mede a latência e os erros por rota.
+
+Duas etapas, para que os logs de produção nunca saiam do servidor:
+
+  1. anonymize: lê o log de acesso (JSON de logs/access.log ou formato
+     common/combined do proxy) e grava um arquivo de replay sem ids reais —
+     ids de entidade, usuários e parceiros viram hashes (HMAC) e parâmetros
+     de texto livre são descartados.
+  2. run: mapeia cada hash para uma entidade da massa semeada (o mesmo hash
+     sempre cai na mesma entidade, preservando a localidade do tráfego) e
+     reproduz no ritmo original ou acelerado.
+
+Uso:
+  python -m backend.benchmarks.replay anonymize logs/access.log* --output replay.jsonl
+  python -m backend.benchmarks.replay run replay.jsonl --database-url postgresql://.../ccm_bench --speed 10
+  python -m backend.benchmarks.replay run replay.jsonl --target-url http://localhost:6543 --speed 1
+
+GET/HEAD são reproduzidos como estão. O log não guarda corpos de request:
+as escritas do fechamento do mês (marcar parcela como faturada, PATCH/PUT da
+parcela) são reproduzidas com um corpo sintético ({"billed": true}); as
+demais escritas são contadas e ignoradas. As rotas administrativas também.
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode
+
+from pyramid.config import Configurator
+from pyramid.interfaces import IRoutesMapper
+from sqlalchemy import create_engine, select
+
+from backend.auth import AuthService
+from backend.benchmarks.dataset import BENCH_ADMIN_USERNAME
+from backend.benchmarks.endpoints import RESULTS_DIR, build_app, call_endpoint, git_revision, percentile
+from backend.config import config as app_config
+from backend.models import Client, Consultant, Contract, Installment, Timesheet, User, UserRole
+
+REPLAYED_METHODS = ('GET', 'HEAD')
+# Escritas reproduzidas com corpo sintético: (método, rota) -> corpo JSON
+SYNTHESIZED_BODIES = {
+    ('PATCH', 'installment_mark_billed'): {'billed': True},
+    ('PATCH', 'installment'): {'billed': True},
+    ('PUT', 'installment'): {'billed': True},
+}
+POOL_SIZE = 200
+
+# Entidade referenciada pelo {id} de cada rota
+ROUTE_ENTITIES = {
+    'auth_user': 'user',
+    'auth_user_reset_password': 'user',
+    'client': 'client',
+    'contract': 'contract',
+    'consultant': 'consultant',
+    'consultant_feedback': 'consultant',
+    'feedback': 'consultant',
+    'consultant_feedbacks_create': 'consultant',
+    'installment': 'installment',
+    'installment_mark_billed': 'installment',
+    'partner': 'partner',
+    'timesheet': 'timesheet',
+    'timesheet_file': 'timesheet',
+}
+
+# Query params que referenciam entidades; os demais listados são mantidos como estão
+QUERY_ENTITIES = {
+    'client_id': 'client',
+    'contract_id': 'contract',
+    'consultant_id': 'consultant',
+    'partner_id': 'partner',
+}
+SAFE_QUERY_PARAMS = {'billed', 'status', 'month', 'year', 'limit', 'mine', 'start_date', 'end_date'}
+
+COMMON_LOG_LINE = re.compile(
+    r'^\S+ \S+ \S+ \[(?P<time>[^\]]+)\] "(?P<method>[A-Z]+) (?P<target>\S+)[^"]*" (?P<status>\d{3}) \S+'
+)
+
+
+def load_routes():
+    """Rotas da aplicação (sem banco), na ordem de registro"""
+    config = Configurator()
+    config.include('backend.routes')
+    config.commit()
+    return config.registry.getUtility(IRoutesMapper).get_routes()
+
+
+def match_route(routes, path):
+    for route in routes:
+        matchdict = route.match(path)
+        if matchdict is not None:
+            return route, matchdict
+    return None, None
+
+
+def parse_access_log(path):
+    """Lê linhas JSON do log de acesso ou no formato common/combined"""
+    with open(path, encoding='utf-8', errors='replace') as log_file:
+        for line in log_file:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('{'):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if 'method' not in entry or 'path' not in entry:
+                    continue
+                timestamp = datetime.fromisoformat(entry['timestamp'])
+                if timestamp.tzinfo is None:
+                    timestamp = timestamp.replace(tzinfo=timezone.utc)
+                yield {
+                    'timestamp': timestamp,
+                    'method': entry['method'],
+                    'path': entry['path'],
+                    'query': entry.get('query') or '',
+                    'status': entry.get('status'),
+                    'duration_ms': entry.get('duration_ms'),
+                    'user_id': entry.get('user_id'),
+                    'role': entry.get('role'),
+                    'partner_id': entry.get('partner_id'),
+                }
+                continue
+            match = COMMON_LOG_LINE.match(line)
+            if match:
+                path_part, _, query = match['target'].partition('?')
+                yield {
+                    'timestamp': datetime.strptime(match['time'], '%d/%b/%Y:%H:%M:%S %z'),
+                    'method': match['method'],
+                    'path': path_part,
+                    'query': query,
+                    'status': int(match['status']),
+                    'duration_ms': None,
+                    'user_id': None,
+                    'role': None,
+                    'partner_id': None,
+                }
+
+
+class Anonymizer:
+    """Troca ids reais por hashes estáveis (HMAC com salt)"""
+
+    def __init__(self, salt: bytes):
+        self.salt = salt
+
+    def ref(self, kind, value):
+        digest = hmac.new(self.salt, f'{kind}:{value}'.encode(), hashlib.sha256).hexdigest()[:16]
+        return f'{kind}:{digest}'
+
+    def actor(self, entry):
+        if entry['role'] == UserRole.ADMIN_GLOBAL.value:
+            return 'admin'
+        if entry['partner_id']:
+            return self.ref('partner', entry['partner_id'])
+        if entry['user_id']:
+            return self.ref('user', entry['user_id'])
+        return None
+
+
+def anonymize(log_paths, output, salt):
+    """Converte logs de acesso em eventos de replay; retorna contadores"""
+    routes = load_routes()
+    anonymizer = Anonymizer(salt)
+    entries = sorted(
+        (entry for path in log_paths for entry in parse_access_log(path)),
+        key=lambda entry: entry['timestamp']
+    )
+    counts = defaultdict(int)
+    if not entries:
+        return counts
+    first = entries[0]['timestamp']
+
+    with open(output, 'w', encoding='utf-8') as out:
+        for entry in entries:
+            route, matchdict = match_route(routes, entry['path'])
+            if route is None:
+                counts['unmatched'] += 1
+                continue
+            if route.name.startswith('admin_'):
+                counts['admin'] += 1
+                continue
+            entity = ROUTE_ENTITIES.get(route.name)
+            params = {key: anonymizer.ref(entity or key, value) for key, value in matchdict.items()}
+            query = {}
+            for key, value in parse_qsl(entry['query']):
+                if key in QUERY_ENTITIES:
+                    query[key] = anonymizer.ref(QUERY_ENTITIES[key], value)
+                elif key in SAFE_QUERY_PARAMS:
+                    query[key] = value
+            out.write(json.dumps({
+                'offset': round((entry['timestamp'] - first).total_seconds(), 3),
+                'method': entry['method'],
+                'route': route.name,
+                'params': params,
+                'query': query,
+                'actor': anonymizer.actor(entry),
+                'status': entry['status'],
+                'duration_ms': entry['duration_ms'],
+            }) + '\n')
+            counts['events'] += 1
+    return counts
+
+
+class TenantPools:
+    """Tokens e ids da massa semeada, por parceiro, para materializar os eventos"""
+
+    def __init__(self, engine, partners_limit):
+        with engine.connect() as conn:
+            admin = conn.execute(select(User).where(User.username == BENCH_ADMIN_USERNAME)).first()
+            partner_admins = conn.execute(
+                select(User).where(User.username.like('bench_partner_%')).order_by(User.username)
+                .limit(partners_limit)
+            ).all()
+            if admin is None or not partner_admins:
+                raise SystemExit('Massa de benchmark não encontrada. Rode o seed_scale.py ou o benchmark com --seed.')
+            self.admin_token = AuthService.create_token(admin)
+            self.tenants = [
+                {'token': AuthService.create_token(user), 'pools': self._pools(conn, user.partner_id)}
+                for user in partner_admins
+            ]
+            self.users = conn.execute(select(User.id).limit(POOL_SIZE)).scalars().all()
+
+    @staticmethod
+    def _pools(conn, partner_id):
+        contracts = select(Contract.id).join(Client).where(Client.partner_id == partner_id)
+
+        def ids(query):
+            return conn.execute(query.limit(POOL_SIZE)).scalars().all()
+
+        return {
+            'partner': [partner_id],
+            'client': ids(select(Client.id).where(Client.partner_id == partner_id)),
+            'contract': ids(contracts),
+            'installment': ids(select(Installment.id).where(Installment.contract_id.in_(contracts))),
+            'consultant': ids(select(Consultant.id).where(Consultant.partner_id == partner_id)),
+            'timesheet': ids(select(Timesheet.id).where(Timesheet.contract_id.in_(contracts))),
+        }
+
+    @staticmethod
+    def _pick(items, ref):
+        return items[int(ref.rpartition(':')[2], 16) % len(items)]
+
+    def resolve(self, event):
+        """Retorna (token, params, query) concretos para um evento anonimizado"""
+        actor = event['actor']
+        refs = [*event['params'].values(), *(v for k, v in event['query'].items() if k in QUERY_ENTITIES)]
+        if actor is None:
+            token, tenant = None, self.tenants[0]
+        elif actor == 'admin':
+            token = self.admin_token
+            tenant = self._pick(self.tenants, refs[0]) if refs else self.tenants[0]
+        else:
+            tenant = self._pick(self.tenants, actor)
+            token = tenant['token']
+
+        def concrete(ref):
+            kind = ref.partition(':')[0]
+            items = self.users if kind == 'user' else tenant['pools'].get(kind)
+            return str(self._pick(items, ref)) if items else ref.rpartition(':')[2]
+
+        params = {key: concrete(ref) for key, ref in event['params'].items()}
+        query = {key: concrete(value) if key in QUERY_ENTITIES else value for key, value in event['query'].items()}
+        return token, params, query
+
+
+def is_replayed(event):
+    return event['method'] in REPLAYED_METHODS or (event['method'], event['route']) in SYNTHESIZED_BODIES
+
+
+def http_call(target_url, method, path, token, body=None):
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    request = urllib.request.Request(target_url.rstrip('/') + path, data=data, method=method)
+    if token:
+        request.add_header('Authorization', f'Bearer {token}')
+    if data is not None:
+        request.add_header('Content-Type', 'application/json')
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as exc:
+        status = exc.code
+    return time.perf_counter() - started, status
+
+
+def replay(events, pools, routes, call, speed, concurrency):
+    """
+    Reproduz os eventos respeitando os intervalos originais divididos por `speed`
+    (0 = o mais rápido possível); retorna as amostras por rota
+    """
+    samples = defaultdict(list)
+    lock = threading.Lock()
+    started = time.perf_counter()
+
+    def run(event, scheduled):
+        # Atraso em relação ao horário previsto (fila cheia, GIL, banco lento)
+        lag = time.perf_counter() - scheduled if scheduled is not None else 0.0
+        body = SYNTHESIZED_BODIES.get((event['method'], event['route']))
+        try:
+            token, params, query = pools.resolve(event)
+            path = routes[event['route']].generate(params)
+            if query:
+                path = f'{path}?{urlencode(query)}'
+            elapsed, status = call(event['method'], path, token, body)
+        except Exception:
+            # Rota desconhecida, evento mal formado ou falha de transporte: conta como erro
+            elapsed, status = 0.0, 599
+        with lock:
+            samples[event['route']].append((elapsed, status, event['status'], lag))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for event in events:
+            scheduled = started + event['offset'] / speed if speed else None
+            if scheduled is not None:
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            pool.submit(run, event, scheduled)
+    return samples, time.perf_counter() - started
+
+
+def summarize(samples, originals):
+    """Distribuição de latência, erros e divergência de status por rota"""
+    report = []
+    for route, results in sorted(samples.items(), key=lambda item: -len(item[1])):
+        latencies = sorted(r[0] * 1000 for r in results)
+        original = sorted(d for d in originals.get(route, []) if d is not None)
+        report.append({
+            'route': route,
+            'requests': len(results),
+            'errors_5xx': sum(1 for r in results if r[1] >= 500),
+            'errors_4xx': sum(1 for r in results if 400 <= r[1] < 500),
+            'status_mismatch': sum(1 for r in results if r[2] and r[1] // 100 != r[2] // 100),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'max_ms': round(latencies[-1], 2) if latencies else 0,
+            'original_p95_ms': round(percentile(original, 95), 2) if original else None,
+            'avg_lag_ms': round(sum(r[3] for r in results) / len(results) * 1000, 2),
+        })
+    return report
+
+
+def run_command(args):
+    with open(args.replay_file, encoding='utf-8') as replay_file:
+        events = [json.loads(line) for line in replay_file if line.strip()]
+    skipped = sum(1 for e in events if not is_replayed(e))
+    events = [e for e in events if is_replayed(e)][:args.limit]
+    writes = sum(1 for e in events if e['method'] not in REPLAYED_METHODS)
+
+    engine = create_engine(args.database_url)
+    pools = TenantPools(engine, args.partners)
+    engine.dispose()
+    routes = {route.name: route for route in load_routes()}
+
+    if args.target_url:
+        call = lambda method, path, token, body: http_call(args.target_url, method, path, token, body)
+    else:
+        app = build_app(args.database_url)
+        call = lambda method, path, token, body: call_endpoint(app, method, path, body, token)[:2]
+
+    print(f"Reproduzindo {len(events)} requests ({writes} escritas com corpo sintético, "
+          f"ignoradas {skipped} escritas), "
+          f"velocidade {'máxima' if not args.speed else f'{args.speed:g}x'}")
+    samples, wall = replay(events, pools, routes, call, args.speed, args.concurrency)
+
+    originals = defaultdict(list)
+    for event in events:
+        originals[event['route']].append(event['duration_ms'])
+    endpoints = summarize(samples, originals)
+
+    print(f"{'rota':<28} {'reqs':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'orig p95':>9} {'5xx':>5} {'4xx':>5} {'lag':>7}")
+    for r in endpoints:
+        original = r['original_p95_ms'] if r['original_p95_ms'] is not None else '-'
+        print(f"{r['route']:<28} {r['requests']:>6} {r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8} "
+              f"{original:>9} {r['errors_5xx']:>5} {r['errors_4xx']:>5} {r['avg_lag_ms']:>7}")
+
+    revision = git_revision()
+    report = {
+        'revision': revision,
+        'created_at': datetime.utcnow().isoformat(),
+        'replay_file': args.replay_file,
+        'speed': args.speed,
+        'concurrency': args.concurrency,
+        'target': args.target_url or 'in-process',
+        'wall_seconds': round(wall, 2),
+        'replayed_writes': writes,
+        'skipped_writes': skipped,
+        'endpoints': endpoints,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f'replay-{revision}.json'
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as out:
+        json.dump(report, out, indent=2, ensure_ascii=False)
+    print(f"\nResultado salvo em {output}")
+
+
+def anonymize_command(args):
+    salt = args.salt.encode() if args.salt else secrets.token_bytes(32)
+    counts = anonymize(args.logs, args.output, salt)
+    print(f"{counts['events']} eventos gravados em {args.output} "
+          f"({counts['unmatched']} sem rota, {counts['admin']} administrativos descartados)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay de logs de acesso contra a massa sintética')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    anonymize_parser = commands.add_parser('anonymize', help='Gera o arquivo de replay anonimizado')
+    anonymize_parser.add_argument('logs', nargs='+', help='Logs de acesso (JSON ou common/combined)')
+    anonymize_parser.add_argument('--output', required=True)
+    anonymize_parser.add_argument(
+        '--salt', help='Salt do HMAC (padrão: aleatório; fixe para gerar arquivos comparáveis entre si)'
+    )
+    anonymize_parser.set_defaults(func=anonymize_command)
+
+    run_parser = commands.add_parser('run', help='Reproduz um arquivo de replay')
+    run_parser.add_argument('replay_file')
+    run_parser.add_argument('--database-url', default=os.getenv('BENCH_DATABASE_URL', app_config.DATABASE_URL))
+    run_parser.add_argument('--target-url', help='Servidor em execução (padrão: app WSGI no próprio processo)')
+    run_parser.add_argument('--speed', type=float, default=1.0, help='Aceleração (1 = ritmo original, 0 = máximo)')
+    run_parser.add_argument('--concurrency', type=int, default=16)
+    run_parser.add_argument('--partners', type=int, default=50, help='Parceiros da massa usados no mapeamento')
+    run_parser.add_argument('--limit', type=int, help='Reproduz apenas os primeiros N requests')
+    run_parser.add_argument('--output', help='Arquivo de resultado (padrão: benchmarks/results/replay-<commit>.json)')
+    run_parser.set_defaults(func=run_command)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,293 @@
+"""
+Micro-benchmarks dos schemas e do renderer JSON
+Mede dump e load de todos os schemas de backend/schemas.py, com diferentes
+quantidades de linhas e de filhos aninhados (parcelas, consultores,
+feedbacks e timesheets por contrato), e o custo do renderer JSON da
+aplicação com os adapters de Decimal/UUID/datetime. Não usa banco: os
+objetos são instâncias transientes dos models.
+
+Uso:
+  python -m backend.benchmarks.serializers
+  python -m backend.benchmarks.serializers --rows 10 100 1000 --children 0 12 --compare benchmarks/results/serializers-abc123.json
+"""
+import argparse
+import decimal
+import inspect
+import json
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from marshmallow import Schema
+from pyramid.renderers import JSON
+
+from backend import schemas
+from backend.app import datetime_adapter, decimal_adapter, uuid_adapter
+from backend.benchmarks.endpoints import RESULTS_DIR, git_revision
+from backend.models import (
+    Client, Consultant, ConsultantFeedback, Contract, ContractStatus, Installment, Partner,
+    Timesheet, User, UserAssignmentType, UserRole
+)
+
+NOW = datetime(2026, 1, 1)
+
+
+class ObjectGraph:
+    """Instâncias transientes dos models, com `children` filhos por coleção"""
+
+    def __init__(self, rows, children):
+        self.partner = Partner(
+            id=uuid.uuid4(), name='Bench Partner', is_active=True, is_strategic=False,
+            status='active', created_at=NOW, updated_at=NOW
+        )
+        self.users = [
+            User(
+                id=uuid.uuid4(), username=f'user{i}', email=f'user{i}@bench.local', role=UserRole.USER_PARTNER,
+                assignment_type=UserAssignmentType.PARTNER, partner_id=self.partner.id, partner=self.partner,
+                is_active=True, created_at=NOW, updated_at=NOW
+            )
+            for i in range(rows)
+        ]
+        self.clients = [
+            Client(
+                id=uuid.uuid4(), name=f'Cliente {i}', cnpj='12345678000199', razao_social=f'Cliente {i} Ltda',
+                partner_id=self.partner.id, partner=self.partner, created_at=NOW, updated_at=NOW
+            )
+            for i in range(rows)
+        ]
+        self.contracts = [self._contract(i, self.clients[i], children) for i in range(rows)]
+        # Contrato próprio para as listagens: os backrefs não inflam self.contracts
+        owner = self._contract(rows, self.clients[0], 0)
+        self.installments = [self._installment(owner, i) for i in range(rows)]
+        self.consultants = [self._consultant(owner, i, children) for i in range(rows)]
+        self.feedbacks = [self._feedback(self.users[0], i) for i in range(rows)]
+        self.timesheets = [self._timesheet(owner, i) for i in range(rows)]
+        self.expiring = [
+            {'id': c.id, 'name': c.name, 'client_name': c.client.name, 'end_date': c.end_date,
+             'days_remaining': 30, 'status': 'ativo'}
+            for c in self.contracts
+        ]
+
+    def _contract(self, i, client, children):
+        contract = Contract(
+            id=uuid.uuid4(), name=f'Contrato {i}', client_id=client.id, client=client,
+            total_value=Decimal('120000.00'), billed_value=Decimal('40000.00'), balance=Decimal('80000.00'),
+            status=ContractStatus.ATIVO, end_date=NOW + timedelta(days=365), responsible_name='Responsável',
+            payment_method='parcelado', contract_type='body_shop_recorrente',
+            estimated_monthly_hours=Decimal('160.00'), duration_months=12,
+            total_hours_contracted=Decimal('1920.00'), created_at=NOW, updated_at=NOW
+        )
+        contract.installments = [self._installment(contract, k) for k in range(children)]
+        contract.consultants = [self._consultant(contract, k, children // 4) for k in range(children // 4)]
+        contract.timesheets = [self._timesheet(contract, k) for k in range(children)]
+        return contract
+
+    @staticmethod
+    def _installment(contract, i):
+        return Installment(
+            id=uuid.uuid4(), contract_id=contract.id, contract=contract,
+            month='Jan/26', value=Decimal('10000.00'), billed=i % 2 == 0, invoice_number=f'NF-{i}',
+            billing_date=NOW, payment_term=30, expected_payment_date=NOW + timedelta(days=30),
+            payment_date=None, created_at=NOW, updated_at=NOW
+        )
+
+    def _consultant(self, contract, i, feedbacks):
+        consultant = Consultant(
+            id=uuid.uuid4(), name=f'Consultor {i}', role='Desenvolvedor',
+            contract_id=contract.id, partner_id=self.partner.id, partner=self.partner,
+            created_at=NOW, updated_at=NOW
+        )
+        consultant.feedback_comments = [self._feedback(self.users[0], k) for k in range(feedbacks)]
+        return consultant
+
+    @staticmethod
+    def _feedback(user, i):
+        return ConsultantFeedback(
+            id=uuid.uuid4(), consultant_id=uuid.uuid4(), user_id=user.id, user=user, contract_id=None,
+            comment='Feedback de benchmark', rating=80 + i % 20, created_at=NOW, updated_at=NOW
+        )
+
+    @staticmethod
+    def _timesheet(contract, i):
+        return Timesheet(
+            id=uuid.uuid4(), contract_id=contract.id, contract=contract,
+            consultant_id=None, hours=Decimal('160.00'), approver='Aprovador', approval_date=NOW,
+            approved=True, uploaded_at=NOW, created_at=NOW, filled_at=NOW
+        )
+
+
+# Objetos serializados por schema de saída
+DUMP_CASES = {
+    'PartnerSchema': lambda g: [g.partner] * len(g.clients),
+    'ClientSchema': lambda g: g.clients,
+    'UserSchema': lambda g: g.users,
+    'ContractSimpleSchema': lambda g: g.contracts,
+    'InstallmentSchema': lambda g: g.installments,
+    'ConsultantFeedbackSchema': lambda g: g.feedbacks,
+    'ConsultantSchema': lambda g: g.consultants,
+    'ContractSchema': lambda g: g.contracts,
+    'DashboardStatsSchema': lambda g: [{
+        'active_contracts': 10, 'inactive_contracts': 2, 'allocated_consultants': 30,
+        'average_feedback': 87.5, 'total_contracts_value': Decimal('1000000.00'),
+        'total_billed_value': Decimal('400000.00'), 'total_balance': Decimal('600000.00'), 'user_count': 12,
+    }] * len(g.clients),
+    'ContractExpirySchema': lambda g: g.expiring,
+    'TimesheetSchema': lambda g: g.timesheets,
+}
+
+# Payload de entrada por schema de carga
+LOAD_CASES = {
+    'PartnerSchema': {'name': 'Parceiro', 'is_active': True, 'is_strategic': False, 'status': 'active'},
+    'PartnerCreateSchema': {'name': 'Parceiro', 'is_strategic': True},
+    'ClientSchema': {'name': 'Cliente', 'cnpj': '12345678000199', 'partner_id': str(uuid.uuid4())},
+    'ClientCreateSchema': {'name': 'Cliente', 'cnpj': '12345678000199', 'partner': 'Parceiro'},
+    'UserLoginSchema': {'username': 'admin', 'password': 'admin123'},
+    'UserCreateSchema': {
+        'username': 'novo_usuario', 'email': 'novo@bench.local', 'password': 'segredo123',
+        'role': 'user_partner', 'assignment_type': 'partner', 'partner_id': str(uuid.uuid4()),
+    },
+    'UserPasswordResetSchema': {'new_password': 'segredo123'},
+    'InstallmentSchema': {
+        'contract_id': str(uuid.uuid4()), 'month': 'Jan/26', 'value': '10000.00', 'billed': True,
+        'invoice_number': 'NF-1', 'billing_date': '05/01/2026', 'payment_term': 30,
+    },
+    'ConsultantFeedbackCreateSchema': {'consultant_id': str(uuid.uuid4()), 'comment': 'Ótimo', 'rating': 90},
+    'ConsultantCreateSchema': {'name': 'Consultor', 'role': 'QA', 'contract_id': str(uuid.uuid4())},
+    'ContractCreateSchema': {
+        'name': 'Contrato', 'payment_method': 'parcelado', 'responsible_name': 'Responsável',
+        'client_id': str(uuid.uuid4()), 'total_value': '120000.00', 'status': 'ativo',
+        'end_date': '31/12/2026', 'contract_type': 'body_shop_recorrente',
+        'estimated_monthly_hours': '160', 'duration_months': 12,
+    },
+    'TimesheetSchema': {'contract_id': str(uuid.uuid4()), 'hours': '160.00', 'approval_date': '2026-01-05T00:00:00'},
+    'TimesheetCreateSchema': {
+        'contract_id': str(uuid.uuid4()), 'hours': '160.00', 'approver': 'Aprovador', 'filled_at': '31/01/2026',
+    },
+}
+
+
+def schema_classes():
+    """Schemas declarados em backend/schemas.py"""
+    return {
+        name: cls for name, cls in inspect.getmembers(schemas, inspect.isclass)
+        if issubclass(cls, Schema) and cls.__module__ == schemas.__name__
+    }
+
+
+def app_json_renderer():
+    """O mesmo renderer JSON configurado em backend/app.py"""
+    renderer = JSON()
+    renderer.add_adapter(decimal.Decimal, decimal_adapter)
+    renderer.add_adapter(uuid.UUID, uuid_adapter)
+    renderer.add_adapter(datetime, datetime_adapter)
+    render = renderer(None)
+    return lambda value: render(value, {'request': None})
+
+
+def measure(func, min_time, repeat):
+    """Mediana do tempo por chamada (µs), com loops calibrados para durar `min_time`"""
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time / repeat or loops >= 1_000_000:
+            break
+        loops *= 2
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        timings.append((time.perf_counter() - started) / loops)
+    return statistics.median(timings) * 1_000_000
+
+
+def build_cases(rows, children):
+    """Casos (nome, função) para uma combinação de linhas e filhos aninhados"""
+    graph = ObjectGraph(rows, children)
+    classes = schema_classes()
+    cases = []
+    for name, factory in DUMP_CASES.items():
+        schema, objects = classes[name](many=True), factory(graph)
+        cases.append((f'dump:{name}', lambda s=schema, o=objects: s.dump(o)))
+    for name, payload in LOAD_CASES.items():
+        schema, payloads = classes[name](many=True), [payload] * rows
+        cases.append((f'load:{name}', lambda s=schema, p=payloads: s.load(p)))
+
+    render = app_json_renderer()
+    dumped = {'contracts': classes['ContractSchema'](many=True).dump(graph.contracts)}
+    raw = {'installments': [
+        {'id': i.id, 'value': i.value, 'billing_date': i.billing_date, 'expected_payment_date': i.expected_payment_date}
+        for i in graph.installments
+    ]}
+    cases.append(('render:dumped_contracts', lambda: render(dumped)))
+    cases.append(('render:raw_adapters', lambda: render(raw)))
+    cases.append(('json.dumps:raw_default_str', lambda: json.dumps(raw, default=str)))
+    return cases
+
+
+def uncovered_schemas():
+    covered = set(DUMP_CASES) | set(LOAD_CASES)
+    return sorted(name for name in schema_classes() if name not in covered)
+
+
+def compare(current, baseline_path):
+    """Variação do tempo por caso em relação a um resultado anterior"""
+    with open(baseline_path, encoding='utf-8') as baseline_file:
+        baseline = {(r['case'], r['rows'], r['children']): r for r in json.load(baseline_file)['results']}
+    print(f"\nComparação com {baseline_path}")
+    for result in current['results']:
+        base = baseline.get((result['case'], result['rows'], result['children']))
+        if base and base['us_per_call']:
+            delta = (result['us_per_call'] / base['us_per_call'] - 1) * 100
+            print(f"{result['case']:<40} {result['rows']:>6} {result['children']:>4} {delta:>+8.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmarks dos schemas e do renderer JSON')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1, 100, 1000], help='Linhas por chamada (>= 1)')
+    parser.add_argument('--children', type=int, nargs='+', default=[0, 12], help='Filhos por coleção aninhada')
+    parser.add_argument('--min-time', type=float, default=0.2, help='Segundos por caso')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', help='Roda apenas casos que contenham este texto')
+    parser.add_argument('--output', help='Arquivo de resultado (padrão: benchmarks/results/serializers-<commit>.json)')
+    parser.add_argument('--compare', help='Resultado anterior para comparação')
+    args = parser.parse_args()
+
+    missing = uncovered_schemas()
+    if missing:
+        print(f"Schemas sem caso de benchmark: {', '.join(missing)}\n")
+
+    print(f"{'caso':<40} {'linhas':>6} {'filhos':>6} {'µs/chamada':>12} {'µs/linha':>10}")
+    results = []
+    for children in args.children:
+        for rows in args.rows:
+            for case, func in build_cases(rows, children):
+                if args.only and args.only not in case:
+                    continue
+                us = measure(func, args.min_time, args.repeat)
+                results.append({
+                    'case': case, 'rows': rows, 'children': children,
+                    'us_per_call': round(us, 2), 'us_per_row': round(us / rows, 3),
+                })
+                print(f"{case:<40} {rows:>6} {children:>6} {us:>12.1f} {us / rows:>10.2f}")
+
+    revision = git_revision()
+    report = {'revision': revision, 'created_at': datetime.utcnow().isoformat(), 'results': results}
+    output = Path(args.output) if args.output else RESULTS_DIR / f'serializers-{revision}.json'
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as out:
+        json.dump(report, out, indent=2, ensure_ascii=False)
+    print(f"\nResultado salvo em {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == '__main__':
+    main()
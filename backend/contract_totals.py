@@ -0,0 +1,460 @@
+"""
+Totais agregados dos contratos
+billed_value, balance e consumed_hours são mantidos por deltas: cada parcela,
+timesheet ou contrato alterado na sessão contribui com a variação que causa
+nos totais do seu contrato (valores antigos x novos). As variações são
+acumuladas por contrato durante a transação (before_flush) e aplicadas uma
+única vez por contrato no commit, num só UPDATE atômico
+(billed_value = billed_value + delta ...). Alterações concorrentes no mesmo
+contrato se serializam no lock da linha, sem a janela de "lê a soma, grava a
+soma" do recálculo completo. O valor antigo de onde sai o delta também precisa
+ser estável: as views que alteram parcelas e timesheets carregam a linha com
+SELECT ... FOR UPDATE antes de modificá-la.
+
+Quando a variação não pode ser calculada (valor antigo não carregado), o
+contrato é recalculado por completo a partir das parcelas e timesheets.
+
+As horas também são mantidas por consultor e mês (ContractMonthlyHours, mês
+de filled_at ou, sem ele, de uploaded_at), com o mesmo esquema de deltas:
+um único INSERT ... ON CONFLICT DO UPDATE por transação.
+
+A reconciliação compara os totais mantidos com as somas e, opcionalmente,
+corrige as divergências.
+"""
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import chain
+
+from sqlalchemy import Date, Numeric, cast, column, delete, event, func, or_, select, update, values
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.dialects.postgresql import UUID, insert
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
+
+from backend.models import Contract, ContractMonthlyHours, Installment, Timesheet
+
+ZERO = Decimal('0')
+TOTAL_FIELDS = ('billed_value', 'balance', 'consumed_hours')
+
+PENDING_DELTAS_KEY = 'contract_totals.deltas'
+PENDING_RECOMPUTE_KEY = 'contract_totals.recompute'
+PENDING_MONTHLY_KEY = 'contract_totals.monthly_hours'
+
+
+class _Unknown:
+    """Valor antigo de um atributo alterado sem ter sido carregado"""
+
+
+UNKNOWN = _Unknown()
+
+
+def billed_amount(billed, value):
+    """Quanto uma parcela contribui para o billed_value do contrato"""
+    if not billed or value is None:
+        return ZERO
+    return Decimal(str(value))
+
+
+def _decimal(value):
+    return ZERO if value is None else Decimal(str(value))
+
+
+def add_contract_deltas(session, contract_id, billed=ZERO, total=ZERO, hours=ZERO):
+    """
+    Acumula variações dos totais de um contrato para aplicar no commit
+
+    Args:
+        session: Sessão do SQLAlchemy
+        contract_id: Id do contrato
+        billed: Variação do total faturado
+        total: Variação do total_value (afeta apenas o balance)
+        hours: Variação das horas consumidas
+    """
+    if contract_id is None or not (billed or total or hours):
+        return
+    contract_id = uuid.UUID(str(contract_id))
+    deltas = session.info.setdefault(PENDING_DELTAS_KEY, {})
+    current = deltas.get(contract_id, (ZERO, ZERO, ZERO))
+    deltas[contract_id] = (current[0] + billed, current[1] + total, current[2] + hours)
+
+
+def add_monthly_hours_delta(session, contract_id, consultant_id, month, hours):
+    """
+    Acumula a variação das horas de um consultor num mês de um contrato
+
+    Args:
+        session: Sessão do SQLAlchemy
+        contract_id: Id do contrato
+        consultant_id: Id do consultor (None para timesheets sem consultor)
+        month: Data de qualquer dia do mês
+        hours: Variação das horas
+    """
+    if contract_id is None or not hours:
+        return
+    key = (
+        uuid.UUID(str(contract_id)),
+        uuid.UUID(str(consultant_id)) if consultant_id is not None else None,
+        date(month.year, month.month, 1),
+    )
+    deltas = session.info.setdefault(PENDING_MONTHLY_KEY, {})
+    deltas[key] = deltas.get(key, ZERO) + hours
+
+
+def timesheet_month(filled_at, uploaded_at):
+    """Mês em que as horas de um timesheet são contabilizadas"""
+    return filled_at or uploaded_at or datetime.utcnow()
+
+
+def mark_contract_for_recompute(session, contract_id):
+    """Agenda o recálculo completo dos totais de um contrato no commit"""
+    if contract_id is not None:
+        session.info.setdefault(PENDING_RECOMPUTE_KEY, set()).add(uuid.UUID(str(contract_id)))
+
+
+def _old_and_new(state, key):
+    """(valor antes da alteração, valor atual) de um atributo"""
+    history = state.attrs[key].history
+    if history.added:
+        return (history.deleted[0] if history.deleted else UNKNOWN), history.added[0]
+    value = history.unchanged[0] if history.unchanged else None
+    return value, value
+
+
+def _related_id(obj, state, relationship_name):
+    value = getattr(obj, f'{relationship_name}_id')
+    if value is not None:
+        return value
+    related = state.attrs[relationship_name].loaded_value
+    return getattr(related, 'id', None) if related is not None else None
+
+
+def _contract_id_of(obj, state):
+    return _related_id(obj, state, 'contract')
+
+
+def _collect_installment(session, obj, state, deleted):
+    if deleted:
+        add_contract_deltas(session, obj.contract_id, billed=-billed_amount(obj.billed, obj.value))
+        return
+    if state.key is None:
+        add_contract_deltas(session, _contract_id_of(obj, state), billed=billed_amount(obj.billed, obj.value))
+        return
+
+    old_contract, new_contract = _old_and_new(state, 'contract_id')
+    old_billed, new_billed = _old_and_new(state, 'billed')
+    old_value, new_value = _old_and_new(state, 'value')
+    if UNKNOWN in (old_contract, old_billed, old_value):
+        mark_contract_for_recompute(session, new_contract)
+        if old_contract is not UNKNOWN:
+            mark_contract_for_recompute(session, old_contract)
+        return
+    if (old_contract, old_billed, old_value) == (new_contract, new_billed, new_value):
+        return
+    add_contract_deltas(session, old_contract, billed=-billed_amount(old_billed, old_value))
+    add_contract_deltas(session, new_contract, billed=billed_amount(new_billed, new_value))
+
+
+def _add_timesheet_hours(session, contract_id, consultant_id, month, hours):
+    add_contract_deltas(session, contract_id, hours=hours)
+    add_monthly_hours_delta(session, contract_id, consultant_id, month, hours)
+
+
+def _collect_timesheet(session, obj, state, deleted):
+    if deleted:
+        _add_timesheet_hours(
+            session, obj.contract_id, obj.consultant_id,
+            timesheet_month(obj.filled_at, obj.uploaded_at), -_decimal(obj.hours)
+        )
+        return
+    if state.key is None:
+        _add_timesheet_hours(
+            session, _contract_id_of(obj, state), _related_id(obj, state, 'consultant'),
+            timesheet_month(obj.filled_at, obj.uploaded_at), _decimal(obj.hours)
+        )
+        return
+
+    old_contract, new_contract = _old_and_new(state, 'contract_id')
+    old_consultant, new_consultant = _old_and_new(state, 'consultant_id')
+    old_hours, new_hours = _old_and_new(state, 'hours')
+    old_filled, new_filled = _old_and_new(state, 'filled_at')
+    old_uploaded, new_uploaded = _old_and_new(state, 'uploaded_at')
+    if UNKNOWN in (old_contract, old_consultant, old_hours, old_filled, old_uploaded):
+        mark_contract_for_recompute(session, new_contract)
+        if old_contract is not UNKNOWN:
+            mark_contract_for_recompute(session, old_contract)
+        return
+    _add_timesheet_hours(
+        session, old_contract, old_consultant, timesheet_month(old_filled, old_uploaded), -_decimal(old_hours)
+    )
+    _add_timesheet_hours(
+        session, new_contract, new_consultant, timesheet_month(new_filled, new_uploaded), _decimal(new_hours)
+    )
+
+
+def _collect_contract(session, obj, state):
+    old_total, new_total = _old_and_new(state, 'total_value')
+    if old_total is UNKNOWN:
+        mark_contract_for_recompute(session, obj.id)
+    elif old_total != new_total:
+        add_contract_deltas(session, obj.id, total=_decimal(new_total) - _decimal(old_total))
+
+
+def _collect_changes(session, flush_context, instances):
+    """Listener de before_flush: acumula as variações do que vai ser gravado"""
+    with session.no_autoflush:
+        for obj in chain(session.new, session.dirty):
+            state = sa_inspect(obj)
+            if state.key is not None and not session.is_modified(obj):
+                continue
+            if isinstance(obj, Installment):
+                _collect_installment(session, obj, state, deleted=False)
+            elif isinstance(obj, Timesheet):
+                _collect_timesheet(session, obj, state, deleted=False)
+            elif isinstance(obj, Contract) and state.key is not None:
+                _collect_contract(session, obj, state)
+        for obj in session.deleted:
+            if isinstance(obj, Installment):
+                _collect_installment(session, obj, sa_inspect(obj), deleted=True)
+            elif isinstance(obj, Timesheet):
+                _collect_timesheet(session, obj, sa_inspect(obj), deleted=True)
+
+
+def _sync_loaded_contracts(session, rows):
+    for row in rows:
+        contract = session.identity_map.get(identity_key(Contract, row.id))
+        if contract is not None:
+            for field in TOTAL_FIELDS:
+                set_committed_value(contract, field, getattr(row, field))
+
+
+def _expected_billed_value():
+    return select(
+        func.coalesce(func.sum(Installment.value), ZERO)
+    ).where(
+        Installment.contract_id == Contract.id,
+        Installment.billed == True
+    ).correlate(Contract).scalar_subquery()
+
+
+def _expected_consumed_hours():
+    return select(
+        func.coalesce(func.sum(Timesheet.hours), ZERO)
+    ).where(
+        Timesheet.contract_id == Contract.id
+    ).correlate(Contract).scalar_subquery()
+
+
+def _timesheet_month_column():
+    return cast(
+        func.date_trunc('month', func.coalesce(Timesheet.filled_at, Timesheet.uploaded_at)), Date
+    )
+
+
+def _monthly_hours_total():
+    return select(
+        func.coalesce(func.sum(ContractMonthlyHours.hours), ZERO)
+    ).where(
+        ContractMonthlyHours.contract_id == Contract.id
+    ).correlate(Contract).scalar_subquery()
+
+
+def recompute_monthly_hours(session, contract_ids):
+    """Refaz as horas por consultor e mês dos contratos a partir dos timesheets"""
+    ids = sorted(contract_ids)
+    if not ids:
+        return
+    session.execute(delete(ContractMonthlyHours).where(ContractMonthlyHours.contract_id.in_(ids)))
+    month = _timesheet_month_column().label('month')
+    session.execute(
+        insert(ContractMonthlyHours).from_select(
+            ['id', 'contract_id', 'consultant_id', 'month', 'hours'],
+            select(
+                func.gen_random_uuid(),
+                Timesheet.contract_id,
+                Timesheet.consultant_id,
+                month,
+                func.sum(Timesheet.hours),
+            ).where(
+                Timesheet.contract_id.in_(ids)
+            ).group_by(Timesheet.contract_id, Timesheet.consultant_id, month)
+        )
+    )
+
+
+def _apply_monthly_hours(session, deltas):
+    """Soma as variações por consultor e mês num único INSERT ... ON CONFLICT"""
+    rows = [
+        {'id': uuid.uuid4(), 'contract_id': contract_id, 'consultant_id': consultant_id, 'month': month, 'hours': hours}
+        for (contract_id, consultant_id, month), hours in sorted(
+            deltas.items(), key=lambda item: (item[0][0], str(item[0][1]), item[0][2])
+        )
+    ]
+    if not rows:
+        return
+    statement = insert(ContractMonthlyHours).values(rows)
+    session.execute(statement.on_conflict_do_update(
+        constraint='uq_contract_monthly_hours',
+        set_={'hours': ContractMonthlyHours.hours + statement.excluded.hours},
+    ))
+    # Meses que ficaram sem horas (timesheets removidos ou movidos)
+    if any(hours < 0 for hours in deltas.values()):
+        session.execute(delete(ContractMonthlyHours).where(
+            ContractMonthlyHours.contract_id.in_({contract_id for contract_id, _, _ in deltas}),
+            ContractMonthlyHours.hours == 0,
+        ))
+
+
+def recompute_contract_totals(session, contract_ids):
+    """
+    Recalcula por completo os totais dos contratos (inclusive as horas por
+    consultor e mês) a partir das parcelas e timesheets
+
+    Trava as linhas dos contratos antes de somar: um delta concorrente espera
+    pelo lock e é aplicado sobre o valor recalculado.
+    """
+    ids = sorted(contract_ids)
+    if not ids:
+        return
+    session.execute(
+        select(Contract.id).where(Contract.id.in_(ids)).order_by(Contract.id).with_for_update()
+    ).all()
+    billed = _expected_billed_value()
+    rows = session.execute(
+        update(Contract)
+        .where(Contract.id.in_(ids))
+        .values(
+            billed_value=billed,
+            balance=Contract.total_value - billed,
+            consumed_hours=_expected_consumed_hours(),
+        )
+        .returning(Contract.id, *(getattr(Contract, field) for field in TOTAL_FIELDS)),
+        execution_options={'synchronize_session': False},
+    ).all()
+    _sync_loaded_contracts(session, rows)
+    recompute_monthly_hours(session, ids)
+
+
+def apply_contract_totals(session):
+    """
+    Aplica as variações acumuladas na transação: um único UPDATE para todos
+    os contratos afetados (mais o recálculo dos que não têm delta confiável)
+
+    Chamado no commit; as views que devolvem os totais do contrato chamam
+    antes de serializar. Os contratos carregados na sessão recebem os valores
+    do RETURNING, sem nova consulta.
+    """
+    session.flush()
+    deltas = session.info.pop(PENDING_DELTAS_KEY, {})
+    recompute = session.info.pop(PENDING_RECOMPUTE_KEY, set())
+    monthly = session.info.pop(PENDING_MONTHLY_KEY, {})
+    # Variações que se anulam (ex: timesheet editado só nos campos de aprovação/anomalia) não viram UPDATE
+    deltas = {
+        contract_id: delta for contract_id, delta in deltas.items()
+        if contract_id not in recompute and any(delta)
+    }
+    monthly = {key: hours for key, hours in monthly.items() if key[0] not in recompute and hours}
+
+    if deltas:
+        changes = values(
+            column('contract_id', UUID(as_uuid=True)),
+            column('billed', Numeric(15, 2)),
+            column('total', Numeric(15, 2)),
+            column('hours', Numeric(12, 2)),
+            name='deltas',
+        ).data([(contract_id, *delta) for contract_id, delta in sorted(deltas.items())])
+        rows = session.execute(
+            update(Contract)
+            .where(Contract.id == changes.c.contract_id)
+            .values(
+                billed_value=Contract.billed_value + changes.c.billed,
+                balance=Contract.balance + changes.c.total - changes.c.billed,
+                consumed_hours=Contract.consumed_hours + changes.c.hours,
+            )
+            .returning(Contract.id, *(getattr(Contract, field) for field in TOTAL_FIELDS)),
+            execution_options={'synchronize_session': False},
+        ).all()
+        _sync_loaded_contracts(session, rows)
+    _apply_monthly_hours(session, monthly)
+    recompute_contract_totals(session, recompute)
+
+
+def _discard_pending(session):
+    session.info.pop(PENDING_DELTAS_KEY, None)
+    session.info.pop(PENDING_RECOMPUTE_KEY, None)
+    session.info.pop(PENDING_MONTHLY_KEY, None)
+
+
+def attach(session_factory):
+    """Liga a coleta de variações e a aplicação no commit às sessões da factory"""
+    event.listen(session_factory, 'before_flush', _collect_changes)
+    event.listen(session_factory, 'before_commit', apply_contract_totals)
+    event.listen(session_factory, 'after_rollback', _discard_pending)
+
+
+def find_contract_total_drift(session, contract_ids=None):
+    """
+    Contratos cujos totais divergem das parcelas faturadas e dos timesheets
+    (inclusive a soma das horas por consultor e mês)
+
+    Returns:
+        Lista de dicts com os valores gravados e os esperados
+    """
+    totals = select(
+        Contract.id,
+        Contract.name,
+        Contract.total_value,
+        Contract.billed_value,
+        Contract.balance,
+        Contract.consumed_hours,
+        _expected_billed_value().label('expected_billed_value'),
+        _expected_consumed_hours().label('expected_consumed_hours'),
+        _monthly_hours_total().label('monthly_hours'),
+    )
+    if contract_ids is not None:
+        totals = totals.where(Contract.id.in_(contract_ids))
+    totals = totals.subquery()
+    query = select(totals).where(or_(
+        totals.c.billed_value != totals.c.expected_billed_value,
+        totals.c.balance != totals.c.total_value - totals.c.expected_billed_value,
+        totals.c.consumed_hours != totals.c.expected_consumed_hours,
+        totals.c.monthly_hours != totals.c.expected_consumed_hours,
+    )).order_by(totals.c.id)
+
+    return [
+        {
+            'contract_id': str(row.id),
+            'contract_name': row.name,
+            'billed_value': row.billed_value,
+            'expected_billed_value': row.expected_billed_value,
+            'balance': row.balance,
+            'expected_balance': row.total_value - row.expected_billed_value,
+            'consumed_hours': row.consumed_hours,
+            'expected_consumed_hours': row.expected_consumed_hours,
+            'monthly_hours': row.monthly_hours,
+        }
+        for row in session.execute(query)
+    ]
+
+
+def reconcile_contract_totals(session, contract_ids=None, fix=False):
+    """
+    Verifica (e com fix=True corrige) os totais dos contratos
+
+    Returns:
+        Divergências encontradas (antes da correção)
+    """
+    drift = find_contract_total_drift(session, contract_ids)
+    if fix and drift:
+        recompute_contract_totals(session, [uuid.UUID(item['contract_id']) for item in drift])
+    return drift
+
+
+def includeme(config):
+    """
+    Mantém os totais dos contratos nas sessões da aplicação
+
+    Args:
+        config: Configurator do Pyramid
+    """
+    attach(config.registry['dbsession_factory'])
@@ -2,17 +2,40 @@
 Configuração do banco de dados SQLAlchemy
 Define a sessão do banco e a base dos modelos
 """
-from sqlalchemy import engine_from_config, pool
+import itertools
+import re
+import threading
+import time
+
+from pyramid.settings import asbool, aslist
+from sqlalchemy import engine_from_config, event, pool
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, scoped_session
 from zope.sqlalchemy import register
 
+from backend.statement_timeouts import StatementTimeoutPolicy
+
 # Base declarativa para todos os models
 Base = declarative_base()
 
 # Session maker - será configurado no main
 DBSession = scoped_session(sessionmaker())
 
+# Métodos atendidos com sessão/transação somente leitura
+READ_ONLY_METHODS = ('GET', 'HEAD')
+
+# Janela (s) em que as leituras de quem acabou de escrever vão para o primário
+DEFAULT_REPLICA_STICKY_SECONDS = 5
+
+# Statements que deixam estado na conexão do servidor. Atrás do PgBouncer em
+# modo transaction a conexão é devolvida ao pool a cada transação, e esse
+# estado vazaria para o próximo cliente
+SESSION_STATE_STATEMENT = re.compile(
+    r'^\s*(SET\s+(?!LOCAL\b|TRANSACTION\b)|RESET\b|PREPARE\b|DEALLOCATE\b|LISTEN\b|'
+    r'CREATE\s+(TEMP|TEMPORARY)\b|DECLARE\b.*\bWITH\s+HOLD\b|SELECT\s+pg_advisory_lock\b)',
+    re.IGNORECASE | re.DOTALL
+)
+
 
 def get_engine(settings, prefix='sqlalchemy.'):
     """
@@ -25,7 +48,92 @@ def get_engine(settings, prefix='sqlalchemy.'):
     Returns:
         Engine do SQLAlchemy configurado
     """
-    return engine_from_config(settings, prefix, poolclass=pool.NullPool)
+    options = {}
+    if asbool(settings.get('perf.pgbouncer.enabled', False)) and '+psycopg:' in settings[f'{prefix}url']:
+        # psycopg 3 prepara statements no servidor após alguns usos; o psycopg2
+        # (driver padrão) nunca prepara
+        options['connect_args'] = {'prepare_threshold': None}
+    # replica_urls é lido por get_replica_engines, não é opção do create_engine
+    engine_settings = {key: value for key, value in settings.items() if key != f'{prefix}replica_urls'}
+    engine = engine_from_config(engine_settings, prefix, poolclass=pool.NullPool, **options)
+    configure_engine(engine, settings)
+    return engine
+
+
+def _reject_session_state(conn, cursor, statement, parameters, context, executemany):
+    if SESSION_STATE_STATEMENT.match(statement):
+        raise RuntimeError(
+            'Statement altera o estado da sessão e vazaria entre clientes do PgBouncer '
+            f'(use SET LOCAL / recursos da transação): {statement[:200]}'
+        )
+
+
+def configure_engine(engine, settings):
+    """
+    Eventos de conexão do engine
+
+    - perf.statement_timeout*: `SET LOCAL statement_timeout` no início de
+      cada transação, conforme a classe da rota (backend.statement_timeouts);
+      escopo da transação, seguro atrás do PgBouncer
+    - perf.pgbouncer.enabled: rejeita statements que deixam estado na sessão
+    """
+    if engine.dialect.name != 'postgresql':
+        return
+
+    StatementTimeoutPolicy(settings).attach(engine)
+
+    if asbool(settings.get('perf.pgbouncer.enabled', False)):
+        event.listen(engine, 'before_cursor_execute', _reject_session_state)
+
+
+def get_replica_engines(settings, prefix='sqlalchemy.'):
+    """
+    Cria os engines das réplicas de leitura (sqlalchemy.replica_urls)
+
+    Usam as mesmas opções do primário, trocando apenas a URL.
+    """
+    urls = aslist(settings.get(f'{prefix}replica_urls', '').replace(',', ' '))
+    return [get_engine({**settings, f'{prefix}url': url}, prefix) for url in urls]
+
+
+class ReplicaRouter:
+    """
+    Escolhe o engine das leituras
+
+    Réplicas em round-robin; o usuário que escreveu há menos de
+    `sticky_seconds` lê do primário, para enxergar a própria escrita mesmo com
+    atraso de replicação. O registro das escritas é por processo.
+    """
+
+    def __init__(self, replicas, sticky_seconds=DEFAULT_REPLICA_STICKY_SECONDS):
+        self.replicas = replicas
+        self.sticky_seconds = sticky_seconds
+        self._cycle = itertools.cycle(replicas)
+        self._last_write = {}
+        self._lock = threading.Lock()
+
+    def mark_write(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            self._last_write[user_id] = now
+            if len(self._last_write) > 10000:
+                self._last_write = {
+                    uid: written for uid, written in self._last_write.items()
+                    if now - written < self.sticky_seconds
+                }
+
+    def engine_for(self, user_id):
+        """Engine da réplica para a leitura, ou None para usar o primário"""
+        with self._lock:
+            written = self._last_write.get(user_id) if user_id else None
+            if written is not None and time.monotonic() - written < self.sticky_seconds:
+                return None
+            return next(self._cycle)
+
+
+def _request_user_id(request):
+    claims = getattr(request, 'jwt_claims', None) or {}
+    return claims.get('user_id')
 
 
 def get_session_factory(engine):
@@ -59,6 +167,35 @@ def get_tm_session(session_factory, transaction_manager):
     return dbsession
 
 
+def _set_transaction_read_only(session, transaction, connection):
+    """Primeiro statement da transação: qualquer escrita acidental vira erro no banco"""
+    connection.exec_driver_sql('SET TRANSACTION READ ONLY')
+
+
+def get_read_only_session(session_factory, request, bind=None):
+    """
+    Cria uma sessão somente leitura para requests GET/HEAD
+
+    Sem autoflush e sem expirar objetos, e fora do transaction manager: não há
+    nada para o zope.sqlalchemy coordenar no commit. A sessão é fechada (e a
+    transação desfeita) quando o request termina.
+
+    Args:
+        session_factory: Factory de sessões
+        request: Request do Pyramid
+        bind: Engine da réplica de leitura (None = primário)
+
+    Returns:
+        Sessão do banco de dados
+    """
+    options = {'bind': bind} if bind is not None else {}
+    dbsession = session_factory(autoflush=False, expire_on_commit=False, **options)
+    if dbsession.get_bind().dialect.name == 'postgresql':
+        event.listen(dbsession, 'after_begin', _set_transaction_read_only)
+    request.add_finished_callback(lambda r: dbsession.close())
+    return dbsession
+
+
 def includeme(config):
     """
     Configura o banco de dados na aplicação Pyramid
@@ -76,13 +213,33 @@ def includeme(config):
     # Cria a factory de sessões
     session_factory = get_session_factory(engine)
     
-    # Registra a factory no configurator
+    # Réplicas de leitura (opcionais)
+    replicas = get_replica_engines(settings)
+    router = ReplicaRouter(
+        replicas,
+        float(settings.get('perf.replica.sticky_seconds', DEFAULT_REPLICA_STICKY_SECONDS))
+    ) if replicas else None
+
+    # Registra o engine e a factory no configurator
+    # (dbengines inclui as réplicas, para os listeners de diagnóstico)
+    config.registry['dbengine'] = engine
+    config.registry['dbengines'] = [engine, *replicas]
     config.registry['dbsession_factory'] = session_factory
+    config.registry['replica_router'] = router
+
+    # GET/HEAD usam a sessão somente leitura (perf.read_only_requests),
+    # numa réplica quando houver; as escritas vão sempre para o primário
+    read_only = asbool(settings.get('perf.read_only_requests', True))
+
+    def dbsession(request):
+        user_id = _request_user_id(request)
+        if read_only and request.method in READ_ONLY_METHODS:
+            bind = router.engine_for(user_id) if router else None
+            return get_read_only_session(session_factory, request, bind=bind)
+        if router and user_id:
+            request.add_finished_callback(lambda r: router.mark_write(user_id))
+        return get_tm_session(session_factory, request.tm)
 
     # Adiciona uma request method para obter a sessão do banco
-    config.add_request_method(
-        lambda r: get_tm_session(session_factory, r.tm),
-        'dbsession',
-        reify=True
-    )
+    config.add_request_method(dbsession, 'dbsession', reify=True)
 
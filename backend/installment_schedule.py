@@ -0,0 +1,90 @@
+"""
+Geração do cronograma de parcelas de um contrato
+Divide o valor total em parcelas mensais a partir do mês inicial e grava todas
+com um único INSERT em lote — um contrato parcelado em 36 meses deixa de
+exigir 36 chamadas a POST /api/installments.
+
+O valor de cada parcela é arredondado para baixo em centavos; a diferença do
+arredondamento fica na última parcela, de modo que a soma bate exatamente com
+o total do contrato.
+"""
+import uuid
+from datetime import datetime, timedelta
+from decimal import ROUND_DOWN, Decimal
+
+from sqlalchemy import insert
+
+from backend.models import Installment
+
+MONTH_LABELS = ['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez']
+CENT = Decimal('0.01')
+MAX_SCHEDULE_MONTHS = 120
+
+
+def month_label(date):
+    """Rótulo de mês no formato usado pelas parcelas (ex: "Jan/25")"""
+    return f'{MONTH_LABELS[date.month - 1]}/{date.year % 100:02d}'
+
+
+def add_months(date, months):
+    month_index = date.month - 1 + months
+    return date.replace(year=date.year + month_index // 12, month=month_index % 12 + 1, day=1)
+
+
+def split_value(total_value, count):
+    """Valores das parcelas: iguais em centavos, com o resto na última"""
+    total_value = Decimal(str(total_value))
+    value = (total_value / count).quantize(CENT, rounding=ROUND_DOWN)
+    values = [value] * count
+    values[-1] = total_value - value * (count - 1)
+    return values
+
+
+def build_schedule(contract_id, total_value, duration_months, start_month, payment_term=None, billing_day=1):
+    """
+    Linhas das parcelas de um contrato, prontas para o INSERT em lote
+
+    Args:
+        contract_id: Id do contrato
+        total_value: Valor total a dividir
+        duration_months: Número de parcelas mensais
+        start_month: Data de qualquer dia do mês da primeira parcela
+        payment_term: Prazo de pagamento em dias (opcional); com ele a data
+            prevista de pagamento é o dia de faturamento + prazo
+        billing_day: Dia do mês previsto para o faturamento (1 a 28)
+
+    Returns:
+        Lista de dicts com as colunas das parcelas (não faturadas)
+    """
+    start = datetime(start_month.year, start_month.month, 1)
+    now = datetime.utcnow()
+    rows = []
+    for i, value in enumerate(split_value(total_value, duration_months)):
+        due = add_months(start, i)
+        expected_payment_date = None
+        if payment_term is not None:
+            expected_payment_date = due + timedelta(days=billing_day - 1 + payment_term)
+        rows.append({
+            'id': uuid.uuid4(),
+            'contract_id': contract_id,
+            'month': month_label(due),
+            'value': value,
+            'billed': False,
+            'payment_term': payment_term,
+            'expected_payment_date': expected_payment_date,
+            'created_at': now,
+            'updated_at': now,
+        })
+    return rows
+
+
+def insert_schedule(session, rows):
+    """
+    Grava as parcelas com um único INSERT em lote
+
+    As parcelas são criadas não faturadas, então os totais do contrato
+    (billed_value/balance) não mudam.
+    """
+    if rows:
+        session.execute(insert(Installment), rows)
+    return rows
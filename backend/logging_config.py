@@ -2,53 +2,262 @@
 Módulo central de logging para o backend.
 Fornece configuração inicial e helpers para debugs, ferramentas e tratamento de exceções.
 """
+import atexit
 import json
 import logging
-from logging.handlers import RotatingFileHandler
+import os
+from collections import deque
+from contextvars import ContextVar, Token
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
+from queue import SimpleQueue
 
 LOG_FILE_PATH = Path("logs/ccm.log")
+SLOW_QUERY_LOG_PATH = Path("logs/slow_queries.log")
+SLOW_QUERY_LOGGER_NAME = "backend.slow_query"
+ACCESS_LOG_PATH = Path("logs/access.log")
+ACCESS_LOGGER_NAME = "backend.access"
 MAX_LOG_BYTES = 10 * 1024 * 1024  # 10MB por arquivo
 BACKUP_COUNT = 5
 FORMAT_STRING = "%(asctime)s %(levelname)-5.5s [%(name)s:%(lineno)s] %(message)s"
 
+_request_id: ContextVar[str | None] = ContextVar("request_id", default=None)
+_queue_listeners: dict[str, QueueListener] = {}
+
+
+def set_request_id(request_id: str | None) -> Token:
+    """Define o id do request atual (incluído em todas as linhas de log)."""
+    return _request_id.set(request_id)
+
+
+def reset_request_id(token: Token):
+    """Restaura o id anterior ao set_request_id que devolveu o token."""
+    _request_id.reset(token)
+
+
+def get_request_id() -> str | None:
+    """Retorna o id do request atual, se houver."""
+    return _request_id.get()
+
+
+class _LazyPayload:
+    """
+    Mensagem com contexto formatada apenas quando o registro é emitido.
+
+    Handlers de texto usam `str()` ("mensagem | context={...}"); o
+    `JsonLinesFormatter` lê `message` e `context` separadamente.
+    """
+    __slots__ = ("message", "context")
+
+    def __init__(self, message: str, context: dict | None):
+        self.message = message
+        self.context = dict(context) if context else None
+
+    def __str__(self):
+        if not self.context:
+            return self.message
+        return f"{self.message} | context={_dumps(self.context)}"
+
+
+class _LazyJson:
+    """Objeto serializado em JSON apenas quando o registro é emitido."""
+    __slots__ = ("payload",)
+
+    def __init__(self, payload: dict):
+        self.payload = payload
+
+    def __str__(self):
+        return _dumps(self.payload)
+
+
+def _dumps(payload) -> str:
+    try:
+        return json.dumps(payload, default=str, ensure_ascii=False)
+    except Exception:
+        return str(payload)
+
+
+class RequestIdFilter(logging.Filter):
+    """Anexa o id do request atual ao registro (roda na thread do request)."""
+
+    def filter(self, record):
+        if not hasattr(record, "request_id"):
+            record.request_id = _request_id.get()
+        return True
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Formata cada registro como um objeto JSON em uma única linha."""
+
+    def format(self, record):
+        msg = record.msg
+        if isinstance(msg, _LazyPayload) and not record.args:
+            message, context = msg.message, msg.context
+        else:
+            message, context = record.getMessage(), None
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "location": f"{record.module}:{record.lineno}",
+            "thread": record.threadName,
+            "request_id": getattr(record, "request_id", None),
+            "message": message,
+        }
+        if context:
+            entry["context"] = context
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return _dumps(entry)
+
+
+class _InProcessQueueHandler(QueueHandler):
+    """
+    QueueHandler que não formata o registro na thread do request.
+
+    A fila é consumida no mesmo processo, então não é preciso tornar o registro
+    serializável: toda a formatação (incluindo JSON e traceback) fica com a
+    thread do QueueListener.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def make_queue_handler(handler: logging.Handler) -> QueueHandler:
+    """
+    Coloca `handler` atrás de uma fila atendida por uma thread própria.
+
+    Returns:
+        QueueHandler a ser anexado ao logger; o I/O e a rotação de arquivo
+        passam a acontecer fora da thread do request.
+    """
+    queue = SimpleQueue()
+    listener = QueueListener(queue, handler, respect_handler_level=True)
+    listener.start()
+    _queue_listeners[getattr(handler, "baseFilename", repr(handler))] = listener
+    queue_handler = _InProcessQueueHandler(queue)
+    queue_handler.addFilter(RequestIdFilter())
+    return queue_handler
+
+
+def stop_logging():
+    """Esvazia as filas e encerra as threads de escrita dos logs."""
+    while _queue_listeners:
+        _, listener = _queue_listeners.popitem()
+        listener.stop()
+
+
+atexit.register(stop_logging)
+
 
 def _ensure_log_dir():
     """Garante que o diretório de log exista."""
     LOG_FILE_PATH.parent.mkdir(parents=True, exist_ok=True)
 
 
+def _rotating_handler(path: Path, formatter: logging.Formatter) -> RotatingFileHandler:
+    handler = RotatingFileHandler(
+        filename=str(path),
+        maxBytes=MAX_LOG_BYTES,
+        backupCount=BACKUP_COUNT,
+        encoding="utf-8",
+        delay=True
+    )
+    handler.setFormatter(formatter)
+    return handler
+
+
 def bootstrap_logging():
     """
-    Configura o handler rotativo adicional para o logger root.
+    Configura o log rotativo (JSON lines) do logger root via fila.
 
-    Deve ser chamado depois de `pyramid.paster.setup_logging`.
+    Deve ser chamado depois de `pyramid.paster.setup_logging`. A escrita em
+    disco e a rotação acontecem na thread do QueueListener.
     """
     _ensure_log_dir()
-    root_logger = logging.getLogger()
-    for handler in root_logger.handlers:
-        if isinstance(handler, RotatingFileHandler) and handler.baseFilename == str(LOG_FILE_PATH):
-            return
+    if os.path.abspath(LOG_FILE_PATH) in _queue_listeners:
+        return
 
-    handler = RotatingFileHandler(
-        filename=str(LOG_FILE_PATH),
-        maxBytes=MAX_LOG_BYTES,
-        backupCount=BACKUP_COUNT,
-        encoding="utf-8"
-    )
+    handler = _rotating_handler(LOG_FILE_PATH, JsonLinesFormatter())
     handler.setLevel(logging.DEBUG)
-    handler.setFormatter(logging.Formatter(FORMAT_STRING))
-    root_logger.addHandler(handler)
+    logging.getLogger().addHandler(make_queue_handler(handler))
 
 
-def _format_payload(message: str, context: dict | None) -> str:
-    if not context:
-        return message
-    try:
-        payload = json.dumps(context, default=str, ensure_ascii=False)
-    except Exception:
-        payload = str(context)
-    return f"{message} | context={payload}"
+def bootstrap_slow_query_logging():
+    """
+    Configura o log rotativo dedicado às queries lentas.
+
+    Cada linha é um objeto JSON completo, para que o endpoint administrativo
+    possa ler o arquivo diretamente. O logger não propaga para o root.
+    """
+    _ensure_log_dir()
+    logger = logging.getLogger(SLOW_QUERY_LOGGER_NAME)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    if os.path.abspath(SLOW_QUERY_LOG_PATH) in _queue_listeners:
+        return logger
+
+    handler = _rotating_handler(SLOW_QUERY_LOG_PATH, logging.Formatter("%(message)s"))
+    logger.addHandler(make_queue_handler(handler))
+    return logger
+
+
+def log_slow_query(entry: dict):
+    """Grava uma query lenta (uma linha JSON) no log dedicado."""
+    logging.getLogger(SLOW_QUERY_LOGGER_NAME).info(_LazyJson(entry))
+
+
+def bootstrap_access_logging():
+    """
+    Configura o log de acesso (uma linha JSON por request).
+
+    Mesmo formato do log de queries lentas: é a entrada do replay de tráfego
+    (backend/benchmarks/replay.py). O logger não propaga para o root.
+    """
+    _ensure_log_dir()
+    logger = logging.getLogger(ACCESS_LOGGER_NAME)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    if os.path.abspath(ACCESS_LOG_PATH) in _queue_listeners:
+        return logger
+
+    handler = _rotating_handler(ACCESS_LOG_PATH, logging.Formatter("%(message)s"))
+    logger.addHandler(make_queue_handler(handler))
+    return logger
+
+
+def log_access(entry: dict):
+    """Grava um request atendido (uma linha JSON) no log de acesso."""
+    logging.getLogger(ACCESS_LOGGER_NAME).info(_LazyJson(entry))
+
+
+def read_slow_queries(limit: int = 100, route: str | None = None, partner_id: str | None = None) -> list[dict]:
+    """
+    Lê as entradas mais recentes do log de queries lentas (mais recentes primeiro).
+
+    Os filtros são aplicados durante a leitura, então até `limit` entradas
+    que atendem aos filtros são retornadas.
+    """
+    if not SLOW_QUERY_LOG_PATH.exists() or limit < 1:
+        return []
+    entries = deque(maxlen=limit)
+    with open(SLOW_QUERY_LOG_PATH, encoding="utf-8") as log_file:
+        for line in log_file:
+            # Descarta sem decodificar as linhas que não podem atender aos filtros
+            if (route and route not in line) or (partner_id and partner_id not in line):
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if route and entry.get("route") != route:
+                continue
+            if partner_id and entry.get("partner_id") != partner_id:
+                continue
+            entries.append(entry)
+    return list(reversed(entries))
 
 
 def get_logger(name: str | None = None) -> logging.Logger:
@@ -56,19 +265,30 @@ def get_logger(name: str | None = None) -> logging.Logger:
     return logging.getLogger(name or "backend")
 
 
+def _log(logger: logging.Logger, level: int, message: str, context: dict | None, **kwargs):
+    # Nada é montado quando o nível está desabilitado
+    if logger.isEnabledFor(level):
+        logger.log(level, _LazyPayload(message, context), stacklevel=3, **kwargs)
+
+
 def log_debug(message: str, *, context: dict | None = None):
     """Helper para logs de debug."""
-    get_logger().debug(_format_payload(message, context))
+    _log(get_logger(), logging.DEBUG, message, context)
 
 
 def log_info(message: str, *, context: dict | None = None):
     """Helper para logs informativos."""
-    get_logger().info(_format_payload(message, context))
+    _log(get_logger(), logging.INFO, message, context)
+
+
+def log_warning(message: str, *, context: dict | None = None):
+    """Helper para logs de alerta."""
+    _log(get_logger(), logging.WARNING, message, context)
 
 
 def log_error(message: str, *, context: dict | None = None):
     """Helper para logs de erro simples."""
-    get_logger().error(_format_payload(message, context))
+    _log(get_logger(), logging.ERROR, message, context)
 
 
 def log_exception(message: str, *, exc: Exception | None = None, context: dict | None = None):
@@ -79,20 +299,19 @@ def log_exception(message: str, *, exc: Exception | None = None, context: dict |
     """
     if exc:
         context = {**(context or {}), "exception": str(exc)}
-        get_logger().exception(
-            _format_payload(message, context),
-            exc_info=(type(exc), exc, exc.__traceback__)
-        )
+        _log(get_logger(), logging.ERROR, message, context, exc_info=(type(exc), exc, exc.__traceback__))
         return
-    get_logger().exception(_format_payload(message, context))
+    _log(get_logger(), logging.ERROR, message, context, exc_info=True)
 
 
 def log_tool_event(tool_name: str, action: str, *, status: str = "info", details: dict | None = None):
     """
     Log estruturado para integrações com ferramentas externas.
     """
+    logger = get_logger("backend.tools")
+    if not logger.isEnabledFor(logging.INFO):
+        return
     context = {"tool": tool_name, "action": action, "status": status}
     if details:
         context["details"] = details
-    get_logger("backend.tools").info(_format_payload(f"[tool:{tool_name}] {action}", context))
-
+    _log(logger, logging.INFO, f"[tool:{tool_name}] {action}", context)
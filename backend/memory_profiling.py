@@ -0,0 +1,209 @@
+"""
+Profiling de alocação de memória por rota (tracemalloc)
+Modo de amostragem para investigar o crescimento dos workers: uma fração dos
+requests (ou os que um admin global pedir via header `X-Memory-Profile`) é
+medida com o tracemalloc, registrando pico e memória retida por rota e os
+pontos do código que mais alocaram.
+
+Settings:
+    - perf.memory.sample_rate (MEMORY_PROFILE_SAMPLE_RATE): fração 0..1; 0 desliga
+    - perf.memory.frames: profundidade do traceback guardado pelo tracemalloc
+
+O tracemalloc é global ao processo: com requests concorrentes, as alocações de
+outras threads entram na medição. Use em staging/desenvolvimento ou com
+`threads = 1` no waitress para números exatos.
+"""
+import random
+import threading
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+from pyramid.settings import asbool
+
+from backend.logging_config import log_info
+from backend.profiling import is_admin_request
+
+SNAPSHOTS_DIR = Path('logs/memory')
+MEMORY_PROFILE_HEADER = 'X-Memory-Profile'
+TOP_ALLOCATION_SITES = 10
+DEFAULT_TRACE_FRAMES = 1
+
+_IGNORED_FILES = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+def _top_sites(stats, limit=TOP_ALLOCATION_SITES):
+    return [
+        {
+            'site': str(stat.traceback),
+            'size_kb': round(stat.size / 1024, 1),
+            'size_diff_kb': round(getattr(stat, 'size_diff', stat.size) / 1024, 1),
+            'count': stat.count,
+        }
+        for stat in stats[:limit]
+    ]
+
+
+class RouteMemoryStats:
+    """Agregado das amostras de memória de uma rota"""
+
+    def __init__(self):
+        self.samples = 0
+        self.max_peak = 0
+        self.total_peak = 0
+        self.total_retained = 0
+        self.top_sites = []
+
+    def add(self, peak, retained, top_sites):
+        self.samples += 1
+        self.max_peak = max(self.max_peak, peak)
+        self.total_peak += peak
+        self.total_retained += retained
+        self.top_sites = top_sites
+
+    def as_dict(self):
+        return {
+            'samples': self.samples,
+            'max_peak_kb': round(self.max_peak / 1024, 1),
+            'avg_peak_kb': round(self.total_peak / self.samples / 1024, 1) if self.samples else 0,
+            'avg_retained_kb': round(self.total_retained / self.samples / 1024, 1) if self.samples else 0,
+            'last_top_sites': self.top_sites,
+        }
+
+
+class MemoryProfiler:
+    """Amostra requests com o tracemalloc e agrega os resultados por rota"""
+
+    def __init__(self, sample_rate: float):
+        self.sample_rate = sample_rate
+        self._routes = {}
+        self._lock = threading.Lock()
+        # Um request medido por vez: reset_peak() e os snapshots são globais
+        self._sampling = threading.Lock()
+
+    def should_sample(self, request):
+        if request.headers.get(MEMORY_PROFILE_HEADER) and asbool(request.headers[MEMORY_PROFILE_HEADER]):
+            return is_admin_request(request)
+        return random.random() < self.sample_rate
+
+    def measure(self, handler, request):
+        """Executa o request medindo pico, memória retida e principais alocações"""
+        if not tracemalloc.is_tracing() or not self._sampling.acquire(blocking=False):
+            return handler(request)
+
+        try:
+            before = tracemalloc.take_snapshot().filter_traces(_IGNORED_FILES)
+            baseline, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+
+            response = handler(request)
+
+            current, peak = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot().filter_traces(_IGNORED_FILES)
+        finally:
+            self._sampling.release()
+
+        route = request.matched_route.name if request.matched_route else request.path
+        top_sites = _top_sites(after.compare_to(before, 'lineno'))
+        with self._lock:
+            self._routes.setdefault(route, RouteMemoryStats()).add(
+                peak - baseline, current - baseline, top_sites
+            )
+        log_info('request memory sampled', context={
+            'route': route,
+            'peak_kb': round((peak - baseline) / 1024, 1),
+            'retained_kb': round((current - baseline) / 1024, 1),
+        })
+        return response
+
+    def route_stats(self):
+        with self._lock:
+            return {route: stats.as_dict() for route, stats in self._routes.items()}
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+def take_snapshot():
+    """Salva um snapshot completo do processo e retorna seus metadados"""
+    if not tracemalloc.is_tracing():
+        return None
+    SNAPSHOTS_DIR.mkdir(parents=True, exist_ok=True)
+    snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORED_FILES)
+    snapshot_id = datetime.utcnow().strftime('%Y%m%d%H%M%S%f')
+    snapshot.dump(str(SNAPSHOTS_DIR / f'{snapshot_id}.snap'))
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        'id': snapshot_id,
+        'traced_kb': round(current / 1024, 1),
+        'peak_kb': round(peak / 1024, 1),
+        'top_sites': _top_sites(snapshot.statistics('lineno')),
+    }
+
+
+def list_snapshots():
+    """Ids dos snapshots salvos, mais recentes primeiro"""
+    if not SNAPSHOTS_DIR.exists():
+        return []
+    return sorted((path.stem for path in SNAPSHOTS_DIR.glob('*.snap')), reverse=True)
+
+
+def diff_snapshots(snapshot_id, base_id, limit=TOP_ALLOCATION_SITES, key_type='lineno'):
+    """
+    Compara dois snapshots salvos
+
+    Returns:
+        Lista dos pontos de alocação que mais cresceram de `base_id` para
+        `snapshot_id`, ou None se algum snapshot não existir
+    """
+    paths = [SNAPSHOTS_DIR / f'{Path(sid).name}.snap' for sid in (snapshot_id, base_id)]
+    if not all(path.exists() for path in paths):
+        return None
+    snapshot, base = (tracemalloc.Snapshot.load(str(path)) for path in paths)
+    return _top_sites(snapshot.compare_to(base, key_type), limit)
+
+
+def memory_profiling_tween_factory(handler, registry):
+    """
+    Tween de amostragem de memória
+
+    Fica acima do pyramid_tm para medir também o que sobra após o commit e o
+    fechamento da sessão (identity map, caches).
+    """
+    profiler = registry.get('memory_profiler')
+    if profiler is None:
+        return handler
+
+    def memory_profiling_tween(request):
+        if profiler.should_sample(request):
+            return profiler.measure(handler, request)
+        return handler(request)
+
+    return memory_profiling_tween
+
+
+def includeme(config):
+    """
+    Inicia o tracemalloc e registra o tween quando a amostragem está ligada
+
+    Args:
+        config: Configurator do Pyramid
+    """
+    settings = config.get_settings()
+    sample_rate = float(settings.get('perf.memory.sample_rate', 0))
+    if sample_rate <= 0:
+        return
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(int(settings.get('perf.memory.frames', DEFAULT_TRACE_FRAMES)))
+    config.registry['memory_profiler'] = MemoryProfiler(sample_rate)
+    config.add_tween(
+        'backend.memory_profiling.memory_profiling_tween_factory',
+        over='pyramid_tm.tm_tween_factory'
+    )
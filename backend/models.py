@@ -4,9 +4,10 @@ Define as tabelas do banco de dados usando SQLAlchemy
 """
 import uuid
 from datetime import datetime
+from decimal import Decimal
 from sqlalchemy import (
-    Column, String, Integer, Numeric, Boolean, 
-    DateTime, ForeignKey, Enum as SQLEnum, TypeDecorator
+    Column, String, Integer, Numeric, Boolean, Date,
+    DateTime, ForeignKey, Enum as SQLEnum, TypeDecorator, Index, UniqueConstraint, text
 )
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
@@ -160,6 +161,7 @@ class Contract(Base):
     estimated_monthly_hours = Column(Numeric(10, 2), nullable=True)
     duration_months = Column(Integer, nullable=True)
     total_hours_contracted = Column(Numeric(12, 2), nullable=True)
+    consumed_hours = Column(Numeric(12, 2), default=0, server_default='0', nullable=False)  # soma de Timesheet.hours (backend.contract_totals)
 
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
@@ -177,6 +179,20 @@ class Contract(Base):
             return float((self.billed_value / self.total_value) * 100)
         return 0.0
 
+    @property
+    def remaining_hours(self):
+        """Horas contratadas ainda não consumidas (None sem total_hours_contracted)"""
+        if self.total_hours_contracted is None:
+            return None
+        return Decimal(str(self.total_hours_contracted)) - Decimal(str(self.consumed_hours or 0))
+
+    @property
+    def consumed_hours_percentage(self):
+        """Calcula o percentual das horas contratadas já consumido"""
+        if self.total_hours_contracted:
+            return float(Decimal(str(self.consumed_hours or 0)) / Decimal(str(self.total_hours_contracted)) * 100)
+        return 0.0
+
     def __repr__(self):
         return f"<Contract(name='{self.name}', status='{self.status}')>"
 
@@ -207,6 +223,14 @@ class Installment(Base):
     # Relacionamentos
     contract = relationship("Contract", back_populates="installments")
 
+    __table_args__ = (
+        # Parcelas em aberto (aging, previsão de caixa)
+        Index(
+            'ix_installments_open_receivables', 'contract_id', 'expected_payment_date',
+            postgresql_where=text('payment_date IS NULL'),
+        ),
+    )
+
     def __repr__(self):
         return f"<Installment(month='{self.month}', value={self.value}, billed={self.billed})>"
 
@@ -308,10 +332,48 @@ class Timesheet(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     filled_at = Column(DateTime, nullable=True)
 
+    # Detecção de horas anômalas (backend.timesheet_anomalies), calculada em lote
+    anomaly_score = Column(Numeric(8, 2), nullable=True)         # maior |z| robusto (consultor/contrato)
+    anomaly_flagged = Column(Boolean, default=False, server_default=text('false'), nullable=False)
+    anomaly_checked_at = Column(DateTime, nullable=True)         # nulo = pendente de avaliação
+
     # Relacionamentos
     contract = relationship("Contract", back_populates="timesheets")
     consultant = relationship("Consultant", back_populates="timesheets")
 
+    __table_args__ = (
+        Index('ix_timesheets_anomaly_flagged', 'contract_id', postgresql_where=text('anomaly_flagged')),
+        Index('ix_timesheets_anomaly_pending', 'created_at', postgresql_where=text('anomaly_checked_at IS NULL')),
+    )
+
     def __repr__(self):
         return f"<Timesheet(contract_id='{self.contract_id}', hours={self.hours})>"
 
+
+
+class ContractMonthlyHours(Base):
+    """
+    Horas consumidas por contrato, consultor e mês
+    Soma de Timesheet.hours agrupada pelo mês de filled_at (ou uploaded_at),
+    mantida a partir dos timesheets por backend.contract_totals. É um dado
+    derivado: sem chaves estrangeiras, para que a remoção de contratos e
+    consultores não dependa da ordem em que as linhas são ajustadas.
+    """
+    __tablename__ = 'contract_monthly_hours'
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    contract_id = Column(UUID(as_uuid=True), nullable=False)
+    consultant_id = Column(UUID(as_uuid=True), nullable=True)  # timesheets sem consultor
+    month = Column(Date, nullable=False)  # primeiro dia do mês
+    hours = Column(Numeric(12, 2), nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint(
+            'contract_id', 'consultant_id', 'month',
+            name='uq_contract_monthly_hours', postgresql_nulls_not_distinct=True,
+        ),
+        Index('ix_contract_monthly_hours_consultant_month', 'consultant_id', 'month'),
+    )
+
+    def __repr__(self):
+        return f"<ContractMonthlyHours(contract_id='{self.contract_id}', month='{self.month}', hours={self.hours})>"
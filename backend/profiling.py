@@ -0,0 +1,275 @@
+"""
+Profiling sob demanda para administradores
+Executa um único request sob o cProfile quando um admin global pede,
+via header `X-Profile` ou query param `_profile`:
+
+    - return: a resposta é substituída pelo relatório do profile (JSON)
+    - store (ou 1/true): a resposta segue normal; o profile é salvo em
+      PROFILES_DIR e o id volta no header `X-Profile-Id`
+
+Um request é perfilado por vez: no Python 3.12+ o cProfile usa o slot global
+do sys.monitoring (um segundo profiler simultâneo falha) e passa a registrar
+também o trabalho das outras threads. Um pedido de profile enquanto outro está
+em andamento recebe 409.
+"""
+import cProfile
+import io
+import json
+import pstats
+import re
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+
+from pyramid.response import Response
+from pyramid.settings import asbool
+from sqlalchemy import event
+
+from backend.auth import AuthService
+from backend.logging_config import get_request_id, log_info
+from backend.models import UserRole
+
+PROFILES_DIR = Path('logs/profiles')
+PROFILE_HEADER = 'X-Profile'
+PROFILE_PARAM = '_profile'
+PROFILE_ID_HEADER = 'X-Profile-Id'
+TOP_FUNCTIONS = 40
+
+# Funções cujo tempo acumulado é contado como serialização
+SERIALIZATION_FUNCTIONS = (
+    ('marshmallow/schema.py', 'dump'),
+    ('json/__init__.py', 'dumps'),
+)
+
+_sql_timer: ContextVar['SqlTimer | None'] = ContextVar('profiling_sql_timer', default=None)
+
+# Um profile por vez no processo (ver docstring do módulo)
+_profiling_lock = threading.Lock()
+
+
+class SqlTimer:
+    """Acumula o tempo gasto dentro do cursor durante o request perfilado"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self._started = None
+
+    def start(self):
+        self._started = time.perf_counter()
+
+    def stop(self):
+        if self._started is not None:
+            self.seconds += time.perf_counter() - self._started
+            self.count += 1
+            self._started = None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timer = _sql_timer.get()
+    if timer is not None:
+        timer.start()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timer = _sql_timer.get()
+    if timer is not None:
+        timer.stop()
+
+
+def requested_profile_mode(request):
+    """Retorna 'return', 'store' ou None conforme o pedido de profiling do request"""
+    value = request.headers.get(PROFILE_HEADER) or request.GET.get(PROFILE_PARAM)
+    if not value:
+        return None
+    value = value.strip().lower()
+    if value == 'return':
+        return 'return'
+    if value == 'store' or asbool(value):
+        return 'store'
+    return None
+
+
+def is_admin_request(request):
+    """
+    Verifica no JWT se o request é de um admin global
+
+    Os tweens rodam antes do subscriber que popula `request.jwt_claims`, então
+    o token é decodificado aqui.
+    """
+    token = AuthService.get_token_from_header(request.headers.get('Authorization'))
+    payload = AuthService.decode_token(token) if token else None
+    return bool(payload) and payload.get('role') == UserRole.ADMIN_GLOBAL.value
+
+
+def _function_label(func):
+    filename, lineno, name = func
+    return f'{filename}:{lineno}({name})'
+
+
+def build_profile_report(profiler, wall_seconds, sql_timer, request, status_code):
+    """
+    Monta o relatório do profile
+
+    Returns:
+        dict com os tempos (total, SQL, Python, serialização), as funções mais
+        custosas por tempo acumulado e a árvore de chamadas em texto
+    """
+    stats = pstats.Stats(profiler)
+
+    serialization = 0.0
+    top = []
+    for func, (cc, nc, tt, ct, callers) in stats.stats.items():
+        filename, _, name = func
+        if any(filename.endswith(suffix) and name == fn for suffix, fn in SERIALIZATION_FUNCTIONS):
+            serialization += ct
+        top.append((ct, tt, nc, func))
+    top.sort(reverse=True)
+
+    call_tree = io.StringIO()
+    stats.stream = call_tree
+    stats.sort_stats('cumulative').print_callees(TOP_FUNCTIONS // 2)
+
+    return {
+        'request_id': getattr(request, 'request_id', None) or get_request_id(),
+        'created_at': datetime.utcnow().isoformat(),
+        'route': request.matched_route.name if request.matched_route else None,
+        'method': request.method,
+        'path': request.path,
+        'status': status_code,
+        'timings_ms': {
+            'total': round(wall_seconds * 1000, 2),
+            'sql': round(sql_timer.seconds * 1000, 2),
+            'python': round(max(wall_seconds - sql_timer.seconds, 0) * 1000, 2),
+            'serialization': round(serialization * 1000, 2),
+        },
+        'sql_statements': sql_timer.count,
+        'top_functions': [
+            {
+                'function': _function_label(func),
+                'calls': nc,
+                'tottime_ms': round(tt * 1000, 3),
+                'cumtime_ms': round(ct * 1000, 3),
+            }
+            for ct, tt, nc, func in top[:TOP_FUNCTIONS]
+        ],
+        'call_tree': call_tree.getvalue(),
+    }
+
+
+def store_profile(profiler, report):
+    """Salva o .prof (para snakeviz/pstats) e o resumo JSON; retorna o id do profile"""
+    PROFILES_DIR.mkdir(parents=True, exist_ok=True)
+    # O request id vem do cliente (X-Request-ID): o sufixo evita sobrescrever um profile anterior
+    request_id = re.sub(r'[^A-Za-z0-9_-]', '', report['request_id'] or '')[:64]
+    profile_id = '-'.join(filter(None, (
+        datetime.utcnow().strftime('%Y%m%d%H%M%S%f'), request_id, uuid.uuid4().hex[:8]
+    )))
+    profiler.dump_stats(str(PROFILES_DIR / f'{profile_id}.prof'))
+    with open(PROFILES_DIR / f'{profile_id}.json', 'w', encoding='utf-8') as summary:
+        json.dump(report, summary, ensure_ascii=False)
+    return profile_id
+
+
+def list_profiles(limit=50):
+    """Resumos dos profiles salvos, mais recentes primeiro (sem a árvore de chamadas)"""
+    if not PROFILES_DIR.exists():
+        return []
+    files = sorted(PROFILES_DIR.glob('*.json'), key=lambda p: p.stat().st_mtime, reverse=True)
+    profiles = []
+    for path in files[:limit]:
+        with open(path, encoding='utf-8') as summary:
+            report = json.load(summary)
+        profiles.append({
+            'id': path.stem,
+            'created_at': report.get('created_at'),
+            'route': report.get('route'),
+            'method': report.get('method'),
+            'path': report.get('path'),
+            'status': report.get('status'),
+            'timings_ms': report.get('timings_ms'),
+        })
+    return profiles
+
+
+def load_profile(profile_id):
+    """Carrega o resumo completo de um profile salvo (ou None)"""
+    path = PROFILES_DIR / f'{Path(profile_id).name}.json'
+    if not path.exists():
+        return None
+    with open(path, encoding='utf-8') as summary:
+        return json.load(summary)
+
+
+def profiling_tween_factory(handler, registry):
+    """
+    Tween que perfila o request quando um admin global pede
+
+    Fica acima do pyramid_tm para incluir o commit no tempo medido.
+    """
+    if not asbool(registry.settings.get('perf.profiling.enabled', True)):
+        return handler
+
+    def profiling_tween(request):
+        mode = requested_profile_mode(request)
+        if mode is None or not is_admin_request(request):
+            return handler(request)
+
+        if not _profiling_lock.acquire(blocking=False):
+            return Response(
+                json.dumps({'error': 'Outro request está sendo perfilado; tente novamente'}).encode('utf-8'),
+                status=409,
+                content_type='application/json',
+                charset='utf-8'
+            )
+        try:
+            profiler = cProfile.Profile()
+            timer = SqlTimer()
+            token = _sql_timer.set(timer)
+            started = time.perf_counter()
+            try:
+                response = profiler.runcall(handler, request)
+            finally:
+                wall_seconds = time.perf_counter() - started
+                _sql_timer.reset(token)
+        finally:
+            _profiling_lock.release()
+
+        report = build_profile_report(profiler, wall_seconds, timer, request, response.status_code)
+
+        if mode == 'return':
+            return Response(
+                json.dumps(report, default=str).encode('utf-8'),
+                status=200,
+                content_type='application/json',
+                charset='utf-8'
+            )
+
+        profile_id = store_profile(profiler, report)
+        log_info('request profiled', context={'profile_id': profile_id, 'timings_ms': report['timings_ms']})
+        response.headers[PROFILE_ID_HEADER] = profile_id
+        return response
+
+    return profiling_tween
+
+
+def includeme(config):
+    """
+    Registra o tween de profiling e os timers de SQL
+
+    Args:
+        config: Configurator do Pyramid
+    """
+    if not asbool(config.get_settings().get('perf.profiling.enabled', True)):
+        return
+
+    for engine in config.registry['dbengines']:
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    config.add_tween(
+        'backend.profiling.profiling_tween_factory',
+        over='pyramid_tm.tm_tween_factory'
+    )
@@ -0,0 +1,181 @@
+"""
+Detector de N+1 e orçamento de queries por request
+Conta os statements SQL de cada request, agrupa por formato normalizado e
+compara o total com o orçamento declarado para a rota.
+
+Modos (setting `perf.query_budget.mode` ou variável QUERY_BUDGET_MODE):
+    - off: desligado (padrão, sem custo por request)
+    - warn: registra um alerta estruturado no log
+    - raise: falha o request com 500 e desfaz a transação
+
+Statements de preparo da transação (`SET LOCAL statement_timeout`,
+`SET TRANSACTION READ ONLY`) não entram na contagem: fazem parte de toda
+transação e não dependem do que a view consulta.
+"""
+import json
+import re
+from collections import Counter
+from contextvars import ContextVar
+
+from pyramid.response import Response
+from sqlalchemy import event
+
+from backend.logging_config import log_warning
+
+DEFAULT_QUERY_BUDGET = 20
+DEFAULT_N_PLUS_ONE_THRESHOLD = 5
+QUERY_COUNT_HEADER = 'X-Query-Count'
+
+# Orçamento de statements por rota (nome da rota em routes.py).
+# Rotas ausentes usam `perf.query_budget.default`.
+ROUTE_QUERY_BUDGETS = {
+    'health': 0,
+    'api_home': 0,
+    'auth_login': 2,
+    'dashboard': 12,
+    'installments_summary': 12,
+    'installments': 4,
+    'installment': 6,
+    'installment_mark_billed': 6,
+    'timesheets': 6,
+    'timesheet': 6,
+    'timesheet_file': 3,
+    'export_installments_csv': 3,
+    'export_installments_pdf': 3,
+}
+
+_IN_LIST_RE = re.compile(r'IN \((?:\s*%\(\w+\)s\s*,?)+\)', re.IGNORECASE)
+_PARAM_RE = re.compile(r'%\(\w+?\)s')
+_NUMBER_RE = re.compile(r'\b\d+\b')
+_WHITESPACE_RE = re.compile(r'\s+')
+_SESSION_SETUP_RE = re.compile(r'\s*SET\s+(?:LOCAL|TRANSACTION)\b', re.IGNORECASE)
+
+_current_collector: ContextVar['QueryCollector | None'] = ContextVar(
+    'query_budget_collector', default=None
+)
+
+
+def normalize_statement(statement: str) -> str:
+    """
+    Reduz um statement SQL ao seu formato (shape)
+
+    Remove diferenças de espaçamento, nomes de parâmetros, literais numéricos e
+    tamanho de listas IN, de modo que queries idênticas disparadas com
+    parâmetros diferentes (padrão N+1) resultem no mesmo texto.
+    """
+    shape = _WHITESPACE_RE.sub(' ', statement).strip()
+    shape = _IN_LIST_RE.sub('IN (?)', shape)
+    shape = _PARAM_RE.sub('?', shape)
+    return _NUMBER_RE.sub('?', shape)
+
+
+class QueryCollector:
+    """Acumula os statements executados durante um request"""
+
+    def __init__(self):
+        self.count = 0
+        self.shapes = Counter()
+
+    def record(self, statement: str):
+        self.count += 1
+        self.shapes[normalize_statement(statement)] += 1
+
+    def repeated(self, threshold: int):
+        """Retorna os formatos executados pelo menos `threshold` vezes"""
+        return [
+            {'statement': shape, 'count': count}
+            for shape, count in self.shapes.most_common()
+            if count >= threshold
+        ]
+
+
+def current_collector():
+    """Retorna o coletor do request atual (ou None fora de um request monitorado)"""
+    return _current_collector.get()
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    collector = _current_collector.get()
+    if collector is not None and not _SESSION_SETUP_RE.match(statement):
+        collector.record(statement)
+
+
+def get_route_budget(route_name: str | None, default_budget: int) -> int:
+    """Orçamento de statements declarado para a rota"""
+    return ROUTE_QUERY_BUDGETS.get(route_name, default_budget)
+
+
+def query_budget_tween_factory(handler, registry):
+    """
+    Tween que monitora o número de queries de cada request
+
+    Fica abaixo do pyramid_tm para que, no modo `raise`, a transação seja
+    condenada antes do commit.
+    """
+    settings = registry.settings
+    mode = settings.get('perf.query_budget.mode', 'off')
+    if mode not in ('warn', 'raise'):
+        return handler
+
+    default_budget = int(settings.get('perf.query_budget.default', DEFAULT_QUERY_BUDGET))
+    threshold = int(settings.get(
+        'perf.query_budget.n_plus_one_threshold', DEFAULT_N_PLUS_ONE_THRESHOLD
+    ))
+
+    def query_budget_tween(request):
+        collector = QueryCollector()
+        token = _current_collector.set(collector)
+        try:
+            response = handler(request)
+        finally:
+            _current_collector.reset(token)
+
+        route_name = request.matched_route.name if request.matched_route else None
+        budget = get_route_budget(route_name, default_budget)
+        repeated = collector.repeated(threshold)
+        response.headers[QUERY_COUNT_HEADER] = str(collector.count)
+
+        context = {
+            'route': route_name,
+            'method': request.method,
+            'path': request.path,
+            'query_count': collector.count,
+            'budget': budget,
+            'repeated_statements': repeated,
+        }
+        if repeated:
+            log_warning('possible N+1 query pattern', context=context)
+
+        if collector.count <= budget:
+            return response
+
+        log_warning('query budget exceeded', context=context)
+        if mode == 'raise':
+            request.tm.doom()
+            return Response(
+                json.dumps({'error': 'Orçamento de queries excedido', 'details': context}).encode('utf-8'),
+                status=500,
+                content_type='application/json',
+                charset='utf-8'
+            )
+        return response
+
+    return query_budget_tween
+
+
+def includeme(config):
+    """
+    Registra o contador de statements no engine e o tween de orçamento
+
+    Args:
+        config: Configurator do Pyramid
+    """
+    if config.get_settings().get('perf.query_budget.mode', 'off') not in ('warn', 'raise'):
+        return
+
+    for engine in config.registry['dbengines']:
+        event.listen(engine, 'before_cursor_execute', _count_statement)
+    config.add_tween(
+        'backend.query_budget.query_budget_tween_factory',
+        under='pyramid_tm.tm_tween_factory'
+    )
@@ -0,0 +1,45 @@
+"""
+Id do request
+Reaproveita o X-Request-ID do proxy (ou gera um novo), expõe em
+request.request_id, inclui nas linhas de log do request e devolve no header
+X-Request-ID da resposta.
+
+O id do contexto é restaurado ao fim do request: numa thread do waitress, o
+que for logado fora de um request (listener, scripts, trabalho em background)
+não herda o id do request anterior.
+"""
+import uuid
+
+from pyramid.tweens import INGRESS
+
+from backend.logging_config import reset_request_id, set_request_id
+
+
+def request_id_tween_factory(handler, registry):
+    """
+    Tween do id do request
+
+    Fica acima de todos os tweens para que os logs deles (controle de admissão,
+    timeouts, log de acesso) também levem o id.
+    """
+    def request_id_tween(request):
+        request.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+        token = set_request_id(request.request_id)
+        try:
+            response = handler(request)
+            response.headers['X-Request-ID'] = request.request_id
+            return response
+        finally:
+            reset_request_id(token)
+
+    return request_id_tween
+
+
+def includeme(config):
+    """
+    Registra o tween do id do request
+
+    Args:
+        config: Configurator do Pyramid
+    """
+    config.add_tween('backend.request_id.request_id_tween_factory', under=INGRESS)
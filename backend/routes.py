@@ -39,6 +39,8 @@ def includeme(config):
     # Rotas de contratos
     config.add_route('contracts', '/api/contracts')
     config.add_route('contract', '/api/contracts/{id}')
+    config.add_route('contract_installment_schedule', '/api/contracts/{id}/installments/schedule')
+    config.add_route('contract_hours_burndown', '/api/contracts/{id}/hours-burndown')
     
     # Rotas de consultores
     config.add_route('consultants', '/api/consultants')
@@ -47,6 +49,7 @@ def includeme(config):
     # Rotas de parcelas/faturamento
     config.add_route('installments', '/api/installments')
     config.add_route('installments_summary', '/api/installments/summary')
+    config.add_route('installments_bulk', '/api/installments/bulk')
     config.add_route('installment', '/api/installments/{id}')
     config.add_route('installment_mark_billed', '/api/installments/{id}/mark-billed')
     
@@ -71,4 +74,22 @@ def includeme(config):
     # Rotas de exportação
     config.add_route('export_installments_csv', '/api/installments/export/csv')
     config.add_route('export_installments_pdf', '/api/installments/export/pdf')
-
+    
+    # Rotas de relatórios financeiros e de horas
+    config.add_route('report_receivables_aging', '/api/reports/receivables-aging')
+    config.add_route('report_cash_flow_forecast', '/api/reports/cash-flow-forecast')
+    config.add_route('report_receivables_risk', '/api/reports/receivables-risk')
+    config.add_route('report_consultant_utilization', '/api/reports/consultant-utilization')
+    config.add_route('report_consultant_utilization_csv', '/api/reports/consultant-utilization/csv')
+    
+    # Rotas de diagnóstico de performance (apenas admin global)
+    config.add_route('admin_slow_queries', '/api/admin/slow-queries')
+    config.add_route('admin_profiles', '/api/admin/profiles')
+    config.add_route('admin_profile', '/api/admin/profiles/{id}')
+    config.add_route('admin_memory', '/api/admin/memory')
+    config.add_route('admin_memory_snapshots', '/api/admin/memory/snapshots')
+    config.add_route('admin_memory_snapshot_diff', '/api/admin/memory/snapshots/{id}/diff')
+    config.add_route('admin_statement_timeouts', '/api/admin/statement-timeouts')
+    config.add_route('admin_admission', '/api/admin/admission')
+    config.add_route('admin_contract_totals', '/api/admin/contract-totals')
+    config.add_route('admin_timesheet_anomalies', '/api/admin/timesheet-anomalies')
@@ -7,6 +7,7 @@ from decimal import Decimal
 from marshmallow import Schema, fields, validate, validates, validates_schema, ValidationError, post_load
 from marshmallow.fields import DateTime
 from datetime import datetime
+from backend.installment_schedule import MAX_SCHEDULE_MONTHS
 from backend.models import ContractStatus, UserRole, UserAssignmentType
 
 
@@ -42,6 +43,17 @@ class FlexibleDateTime(fields.DateTime):
         return super()._deserialize(value, attr, data, **kwargs)
 
 
+class MonthField(FlexibleDateTime):
+    """Campo de mês: aceita yyyy-mm além dos formatos de FlexibleDateTime"""
+    def _deserialize(self, value, attr, data, **kwargs):
+        if isinstance(value, str) and len(value) == 7 and value[4] == '-':
+            try:
+                return datetime.strptime(value, '%Y-%m')
+            except ValueError:
+                raise ValidationError('Formato de mês inválido. Use yyyy-mm.')
+        return super()._deserialize(value, attr, data, **kwargs)
+
+
 # Partner Schemas
 class PartnerSchema(Schema):
     """Schema para serialização de parceiro"""
@@ -168,6 +180,37 @@ class InstallmentSchema(Schema):
     updated_at = fields.DateTime(dump_only=True)
 
 
+class InstallmentScheduleSchema(Schema):
+    """Schema para geração do cronograma de parcelas de um contrato"""
+    total_value = fields.Decimal(allow_none=True, as_string=True)  # padrão: total do contrato
+    duration_months = fields.Int(allow_none=True, validate=validate.Range(min=1, max=MAX_SCHEDULE_MONTHS))  # padrão: duração do contrato
+    start_month = MonthField(required=True)
+    payment_term = fields.Int(allow_none=True, validate=validate.Range(min=0))
+    billing_day = fields.Int(load_default=1, validate=validate.Range(min=1, max=28))
+
+    @validates('total_value')
+    def validate_total_value(self, value):
+        """Valida se o valor total é positivo"""
+        if value is not None and value <= 0:
+            raise ValidationError('O valor total deve ser maior que zero')
+
+
+class InstallmentBulkUpdateSchema(Schema):
+    """Schema para atualização em lote de parcelas (fechamento do mês)"""
+    ids = fields.List(fields.UUID(), required=True, validate=validate.Length(min=1, max=1000))
+    billed = fields.Bool(load_default=True)
+    billing_date = FlexibleDateTime(allow_none=True)
+    payment_term = fields.Int(allow_none=True, validate=validate.Range(min=0))
+    expected_payment_date = FlexibleDateTime(allow_none=True)
+    payment_date = FlexibleDateTime(allow_none=True)
+    # Número da nota fiscal por parcela: {"<id da parcela>": "NF-123"}
+    invoice_numbers = fields.Dict(
+        keys=fields.UUID(),
+        values=fields.Str(validate=validate.Length(max=100)),
+        load_default=dict,
+    )
+
+
 # Consultant Feedback Schemas
 class ConsultantFeedbackSchema(Schema):
     """Schema para serialização de feedback de consultor"""
@@ -243,6 +286,9 @@ class ContractSchema(Schema):
     estimated_monthly_hours = fields.Decimal(allow_none=True, as_string=True)
     duration_months = fields.Int(allow_none=True)
     total_hours_contracted = fields.Decimal(allow_none=True, as_string=True)
+    consumed_hours = fields.Decimal(as_string=True, dump_only=True)
+    remaining_hours = fields.Decimal(allow_none=True, as_string=True, dump_only=True)
+    consumed_hours_percentage = fields.Float(dump_only=True)
     
     # Nested relationships
     client = fields.Nested(ClientSchema, dump_only=True)
@@ -271,6 +317,11 @@ class ContractCreateSchema(Schema):
     estimated_monthly_hours = fields.Decimal(allow_none=True, as_string=True)
     duration_months = fields.Int(allow_none=True, validate=validate.Range(min=1))
     total_hours_contracted = fields.Decimal(allow_none=True, as_string=True)
+    # Gera as parcelas junto com o contrato (valor total e duração do próprio contrato)
+    installment_schedule = fields.Nested(
+        InstallmentScheduleSchema(only=('start_month', 'payment_term', 'billing_day')),
+        allow_none=True,
+    )
     
     @validates('total_value')
     def validate_total_value(self, value):
@@ -294,6 +345,20 @@ class ContractCreateSchema(Schema):
                     'Para time_material ou projeto informe total_hours_contracted.',
                 )
 
+    @validates_schema
+    def validate_installment_schedule(self, data, **kwargs):
+        # Só o pagamento à vista gera parcela única; qualquer outro caso parcela pela duração
+        if not data.get('installment_schedule') or data.get('payment_method') == 'a_vista':
+            return
+        duration_months = data.get('duration_months')
+        if duration_months is None:
+            raise ValidationError('Para gerar as parcelas de um contrato parcelado informe duration_months.')
+        if duration_months > MAX_SCHEDULE_MONTHS:
+            raise ValidationError(
+                f'Para gerar as parcelas junto com o contrato a duração deve ser de no máximo {MAX_SCHEDULE_MONTHS} meses.',
+                field_name='duration_months',
+            )
+
     @post_load
     def apply_total_hours(self, data, **kwargs):
         ct = data.get('contract_type')
@@ -342,6 +407,9 @@ class TimesheetSchema(Schema):
     uploaded_at = fields.DateTime(dump_only=True)
     created_at = fields.DateTime(dump_only=True)
     filled_at = fields.Method('dump_filled_at', dump_only=True)
+    anomaly_flagged = fields.Bool(dump_only=True)
+    anomaly_score = fields.Decimal(allow_none=True, as_string=True, dump_only=True)
+    anomaly_checked_at = fields.DateTime(allow_none=True, dump_only=True)
     contract = fields.Nested(ContractSimpleSchema, dump_only=True)
 
     def dump_filled_at(self, obj):
@@ -0,0 +1,51 @@
+"""
+Detecção de horas anômalas nos timesheets
+Avalia os timesheets pendentes (novos ou alterados desde a última execução)
+contra a mediana/MAD dos últimos timesheets do consultor e do contrato e
+marca os fora do padrão (GET /api/timesheets?anomalous=true).
+
+Uso local:
+  poetry run python backend/scripts/detect_timesheet_anomalies.py
+  poetry run python backend/scripts/detect_timesheet_anomalies.py --full
+
+Pensado para rodar em cron (ex: a cada hora), fora do caminho de criação.
+"""
+import argparse
+import os
+import sys
+
+# Adiciona o diretório raiz do projeto ao path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.config import config
+from backend.timesheet_anomalies import detect_timesheet_anomalies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Marca timesheets com horas fora do padrão do consultor/contrato")
+    parser.add_argument("--full", action="store_true", help="Reavalia todos os timesheets, não só os pendentes")
+    parser.add_argument("--limit", type=int, default=None, help="Máximo de timesheets pendentes por execução")
+    parser.add_argument("--database-url", default=config.DATABASE_URL)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    try:
+        result = detect_timesheet_anomalies(session, full=args.full, limit=args.limit)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+        engine.dispose()
+
+    print(f"✅ {result['checked']} timesheet(s) avaliado(s), {result['flagged']} marcado(s) como anômalo(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Reconciliação dos totais dos contratos
+Compara billed_value/balance de cada contrato com a soma das parcelas
+faturadas (e consumed_hours com a soma dos timesheets) e lista as
+divergências; com --fix, corrige-as.
+
+Uso local:
+  poetry run python backend/scripts/reconcile_contract_totals.py
+  poetry run python backend/scripts/reconcile_contract_totals.py --fix
+
+Sai com código 1 quando há divergência e --fix não foi usado (útil em cron/CI).
+"""
+import argparse
+import os
+import sys
+
+# Adiciona o diretório raiz do projeto ao path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.config import config
+from backend.contract_totals import reconcile_contract_totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Confere os totais dos contratos contra parcelas e timesheets")
+    parser.add_argument("--fix", action="store_true", help="Corrige as divergências encontradas")
+    parser.add_argument("--database-url", default=config.DATABASE_URL)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    try:
+        drift = reconcile_contract_totals(session, fix=args.fix)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+        engine.dispose()
+
+    if not drift:
+        print("✅ Todos os contratos conferem com as parcelas e timesheets")
+        return
+
+    print(f"{'contrato':<38} {'billed_value':>15} {'esperado':>15} {'balance':>15} {'esperado':>15} "
+          f"{'horas':>12} {'esperado':>12}")
+    for item in drift:
+        print(f"{item['contract_id']:<38} {item['billed_value']:>15} {item['expected_billed_value']:>15} "
+              f"{item['balance']:>15} {item['expected_balance']:>15} "
+              f"{item['consumed_hours']:>12} {item['expected_consumed_hours']:>12}")
+    print()
+    if args.fix:
+        print(f"🔧 {len(drift)} contrato(s) corrigido(s)")
+    else:
+        print(f"⚠️  {len(drift)} contrato(s) divergente(s); rode com --fix para corrigir")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,8 +6,12 @@ Ordem:
   2. seed_data.py      — clientes, contratos, consultores, parcelas base
   3. seed_installments.py — parcelas extras (opcional)
 
+Com --scale, roda apenas o seed_scale.py (massa sintética de alto volume via
+COPY) no lugar das massas de exemplo.
+
 Uso local:
   poetry run python backend/scripts/seed_all.py
+  poetry run python backend/scripts/seed_all.py --scale 10 --reset
 
 Docker:
   docker exec ccm_backend sh -c "cd backend && python scripts/seed_all.py"
@@ -18,11 +22,11 @@ import sys
 from pathlib import Path
 
 
-def run_script(script_name: str) -> None:
+def run_script(script_name: str, *args: str) -> None:
     scripts_dir = Path(__file__).resolve().parent
     script_path = scripts_dir / script_name
     print(f"\n>>> Executando {script_name}\n")
-    result = subprocess.run([sys.executable, str(script_path)], check=False)
+    result = subprocess.run([sys.executable, str(script_path), *args], check=False)
     if result.returncode != 0:
         raise SystemExit(result.returncode)
 
@@ -34,8 +38,22 @@ def main():
         action="store_true",
         help="Cria parcelas adicionais para todos os contratos (pode duplicar se já existirem)",
     )
+    parser.add_argument(
+        "--scale",
+        type=float,
+        help="Gera massa sintética de alto volume com este fator de escala (seed_scale.py)",
+    )
+    parser.add_argument(
+        "--reset",
+        action="store_true",
+        help="Com --scale: apaga TODOS os dados antes de semear",
+    )
     args = parser.parse_args()
 
+    if args.scale is not None:
+        run_script("seed_scale.py", "--scale", str(args.scale), *(["--reset"] if args.reset else []))
+        return
+
     print("=" * 80)
     print("🌱 Seed completo — Coddfy CCM")
     print("=" * 80)
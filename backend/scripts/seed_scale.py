@@ -0,0 +1,79 @@
+"""
+Seed de alto volume para testes de carga e performance
+Gera a massa sintética com distribuições irregulares (contratos à vista e
+parcelamentos longos, consultores com muitos feedbacks etc.) e carrega no
+PostgreSQL via COPY em lotes — milhões de linhas em poucos minutos.
+
+O `--scale` multiplica o número de parceiros (tenants); fator 1 gera ~1 mil
+contratos e ~80 mil linhas no total, fator 50 passa de 1 milhão de parcelas.
+
+Uso local:
+  poetry run python backend/scripts/seed_scale.py --scale 10 --reset
+
+Logins criados (senha bench123):
+  bench_admin              (admin global)
+  bench_partner_0000, ...  (admin de cada parceiro)
+"""
+import argparse
+import os
+import sys
+import time
+
+# Adiciona o diretório raiz do projeto ao path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from sqlalchemy import create_engine
+
+from backend.benchmarks.dataset import (
+    DEFAULT_BATCH_SIZE, RaggedDatasetGenerator, Scale, copy_rows, load_dataset, reset_database
+)
+from backend.config import config
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Popula o banco com massa sintética de alto volume (COPY)")
+    parser.add_argument("--scale", type=float, default=1.0, help="Fator de escala (1 ≈ 1 mil contratos)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE * 10, help="Linhas por lote de COPY")
+    parser.add_argument("--seed", type=int, default=42, help="Semente (mesma semente = mesmos dados)")
+    parser.add_argument("--database-url", default=config.DATABASE_URL)
+    parser.add_argument(
+        "--reset",
+        action="store_true",
+        help="Apaga TODOS os dados das tabelas antes de semear (nunca use em produção!)",
+    )
+    args = parser.parse_args()
+
+    scale = Scale.from_factor(args.scale)
+    print("=" * 80)
+    print(f"🌱 Seed de alto volume — escala {args.scale:g}")
+    print("=" * 80)
+    print(f"Estimativa (médias): {scale.expected_rows()}")
+
+    engine = create_engine(args.database_url)
+    try:
+        if args.reset:
+            print("🗑️  Limpando dados existentes...")
+            reset_database(engine)
+
+        started = time.perf_counter()
+        counts = load_dataset(
+            engine,
+            RaggedDatasetGenerator(scale, seed=args.seed),
+            batch_size=args.batch_size,
+            loader=copy_rows,
+        )
+        elapsed = time.perf_counter() - started
+    finally:
+        engine.dispose()
+
+    total = sum(counts.values())
+    print()
+    for table, count in counts.items():
+        print(f"  {table:<24} {count:>12,}")
+    print(f"  {'total':<24} {total:>12,}")
+    print()
+    print(f"✅ {total:,} linhas carregadas em {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} linhas/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Log de queries lentas
+Mede cada statement via eventos do SQLAlchemy e registra os que excedem o
+limite configurado, junto com a rota, o parceiro do usuário, o formato dos
+parâmetros e o plano de execução (EXPLAIN) capturado automaticamente.
+
+Settings:
+    - perf.slow_query.threshold_ms (SLOW_QUERY_THRESHOLD_MS): limite em ms; 0 desliga
+    - perf.slow_query.explain (SLOW_QUERY_EXPLAIN): captura o EXPLAIN (padrão true)
+"""
+import time
+from datetime import datetime
+
+from pyramid.settings import asbool
+from pyramid.threadlocal import get_current_request
+from sqlalchemy import event
+
+from backend.logging_config import (
+    bootstrap_slow_query_logging, get_request_id, log_slow_query, log_exception
+)
+
+DEFAULT_SLOW_QUERY_THRESHOLD_MS = 500
+EXPLAIN_SAVEPOINT = 'slow_query_explain'
+
+
+def describe_parameters(parameters):
+    """
+    Descreve o formato dos parâmetros sem expor seus valores
+
+    Args:
+        parameters: Parâmetros enviados ao cursor (dict, tupla ou lista de executemany)
+
+    Returns:
+        Estrutura com os nomes/posições e o tipo de cada valor
+    """
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return {'executemany': len(parameters), 'row': describe_parameters(parameters[0])}
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def _request_context():
+    request = get_current_request()
+    if request is None:
+        return {'route': None, 'method': None, 'path': None, 'user_id': None, 'partner_id': None}
+    claims = getattr(request, 'jwt_claims', None) or {}
+    return {
+        'route': request.matched_route.name if getattr(request, 'matched_route', None) else None,
+        'method': request.method,
+        'path': request.path,
+        'user_id': claims.get('user_id'),
+        'partner_id': claims.get('partner_id'),
+    }
+
+
+def capture_explain(conn, statement, parameters):
+    """
+    Captura o plano de execução do statement
+
+    Roda `EXPLAIN (FORMAT JSON)` num cursor separado da mesma conexão, dentro de
+    um SAVEPOINT, para não consumir o resultado da query original nem abortar a
+    transação caso o EXPLAIN falhe. Só é feito para SELECT/WITH em PostgreSQL.
+    """
+    if conn.dialect.name != 'postgresql':
+        return None
+    if not statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return None
+
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute(f'SAVEPOINT {EXPLAIN_SAVEPOINT}')
+        try:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {statement}', parameters)
+            plan = cursor.fetchone()[0]
+        except Exception:
+            cursor.execute(f'ROLLBACK TO SAVEPOINT {EXPLAIN_SAVEPOINT}')
+            raise
+        cursor.execute(f'RELEASE SAVEPOINT {EXPLAIN_SAVEPOINT}')
+        return plan
+    finally:
+        cursor.close()
+
+
+class SlowQueryRecorder:
+    """Listeners de cursor que registram os statements lentos"""
+
+    def __init__(self, threshold_ms: float, explain: bool = True):
+        self.threshold = threshold_ms / 1000.0
+        self.explain = explain
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('slow_query_start', []).append(time.perf_counter())
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['slow_query_start'].pop()
+        elapsed = time.perf_counter() - started
+        if elapsed < self.threshold:
+            return
+
+        entry = {
+            'timestamp': datetime.utcnow().isoformat(),
+            'duration_ms': round(elapsed * 1000, 2),
+            'request_id': get_request_id(),
+            'statement': statement,
+            'parameters': describe_parameters(parameters),
+            **_request_context(),
+            'plan': None,
+        }
+        if self.explain and not executemany:
+            try:
+                entry['plan'] = capture_explain(conn, statement, parameters)
+            except Exception as exc:
+                log_exception('failed to capture slow query plan', exc=exc, context={'statement': statement})
+        log_slow_query(entry)
+
+    def handle_error(self, exception_context):
+        # Descarta o início pendente do statement que falhou
+        starts = exception_context.connection.info.get('slow_query_start') if exception_context.connection else None
+        if starts:
+            starts.pop()
+
+    def attach(self, engine):
+        event.listen(engine, 'before_cursor_execute', self.before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self.after_cursor_execute)
+        event.listen(engine, 'handle_error', self.handle_error)
+
+
+def includeme(config):
+    """
+    Registra o log de queries lentas no engine da aplicação
+
+    Args:
+        config: Configurator do Pyramid
+    """
+    settings = config.get_settings()
+    threshold_ms = float(settings.get('perf.slow_query.threshold_ms', DEFAULT_SLOW_QUERY_THRESHOLD_MS))
+    if threshold_ms <= 0:
+        return
+
+    bootstrap_slow_query_logging()
+    recorder = SlowQueryRecorder(
+        threshold_ms,
+        explain=asbool(settings.get('perf.slow_query.explain', True))
+    )
+    for engine in config.registry['dbengines']:
+        recorder.attach(engine)
+    config.registry['slow_query_recorder'] = recorder
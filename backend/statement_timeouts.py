@@ -0,0 +1,164 @@
+"""
+Timeouts de statement por classe de rota
+Cada transação começa com `SET LOCAL statement_timeout` conforme a classe da
+rota do request: telas interativas têm limite curto, relatórios e exportações
+limites maiores. Uma query cancelada pelo timeout vira um 503 limpo (em vez
+de um 500 genérico) e é contada por rota.
+
+Settings (0 desliga a classe):
+    - perf.statement_timeout_ms (DB_STATEMENT_TIMEOUT_MS): classe interactive (padrão)
+    - perf.statement_timeout.report_ms (DB_REPORT_STATEMENT_TIMEOUT_MS)
+    - perf.statement_timeout.export_ms (DB_EXPORT_STATEMENT_TIMEOUT_MS)
+"""
+import json
+import threading
+
+from pyramid.response import Response
+from pyramid.threadlocal import get_current_request
+from sqlalchemy import event
+
+from backend.logging_config import log_warning
+
+# SQLSTATE query_canceled (statement_timeout ou pg_cancel_backend)
+QUERY_CANCELED = '57014'
+RETRY_AFTER_SECONDS = 5
+
+DEFAULT_TIMEOUT_CLASS = 'interactive'
+ROUTE_TIMEOUT_CLASSES = {
+    'dashboard': 'report',
+    'installments_summary': 'report',
+    'report_receivables_aging': 'report',
+    'report_cash_flow_forecast': 'report',
+    'report_receivables_risk': 'report',
+    'report_consultant_utilization': 'report',
+    'report_consultant_utilization_csv': 'report',
+    # Análise em lote (full=true reavalia todos os timesheets)
+    'admin_timesheet_anomalies': 'report',
+    'export_installments_csv': 'export',
+    'export_installments_pdf': 'export',
+}
+
+
+class StatementTimeoutPolicy:
+    """Timeout (ms) de cada classe de rota"""
+
+    def __init__(self, settings):
+        self.timeouts = {
+            DEFAULT_TIMEOUT_CLASS: int(float(settings.get('perf.statement_timeout_ms', 0))),
+            'report': int(float(settings.get('perf.statement_timeout.report_ms', 0))),
+            'export': int(float(settings.get('perf.statement_timeout.export_ms', 0))),
+        }
+
+    @property
+    def enabled(self):
+        return any(self.timeouts.values())
+
+    def timeout_for(self, route_name):
+        return self.timeouts[ROUTE_TIMEOUT_CLASSES.get(route_name, DEFAULT_TIMEOUT_CLASS)]
+
+    def set_local_statement_timeout(self, conn):
+        """Listener de `begin`: aplica o timeout da rota do request atual"""
+        request = get_current_request()
+        route = getattr(request, 'matched_route', None) if request is not None else None
+        timeout_ms = self.timeout_for(route.name if route else None)
+        if timeout_ms > 0:
+            conn.exec_driver_sql(f'SET LOCAL statement_timeout = {timeout_ms}')
+
+    def attach(self, engine):
+        if self.enabled:
+            event.listen(engine, 'begin', self.set_local_statement_timeout)
+
+
+def is_query_canceled(exc):
+    return getattr(getattr(exc, 'orig', None), 'pgcode', None) == QUERY_CANCELED
+
+
+def _flag_canceled_query(exception_context):
+    # As views costumam capturar a exceção e responder 500 por conta própria;
+    # a marca no request permite ao tween reconhecer o caso
+    if is_query_canceled(exception_context.sqlalchemy_exception):
+        request = get_current_request()
+        if request is not None:
+            request.statement_timeout_hit = True
+
+
+class StatementTimeoutStats:
+    """Contagem de statements cancelados por timeout, por rota"""
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, route):
+        with self._lock:
+            self._counts[route] = self._counts.get(route, 0) + 1
+
+    def as_dict(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+def _timeout_response(request, stats, policy):
+    route = request.matched_route.name if request.matched_route else None
+    stats.record(route)
+    log_warning('statement timeout', context={
+        'route': route,
+        'timeout_ms': policy.timeout_for(route),
+        'path': request.path,
+    })
+    response = Response(
+        json.dumps({'error': 'A consulta excedeu o tempo limite. Tente novamente em instantes.'}).encode('utf-8'),
+        status=503,
+        content_type='application/json',
+        charset='utf-8'
+    )
+    response.headers['Retry-After'] = str(RETRY_AFTER_SECONDS)
+    return response
+
+
+def statement_timeout_tween_factory(handler, registry):
+    """
+    Converte cancelamentos por statement_timeout em 503
+
+    Fica acima do pyramid_tm para tratar também a falha no commit de uma
+    transação abortada pelo cancelamento.
+    """
+    stats = registry['statement_timeout_stats']
+    policy = registry['statement_timeout_policy']
+
+    def statement_timeout_tween(request):
+        try:
+            response = handler(request)
+        except Exception as exc:
+            if is_query_canceled(exc) or getattr(request, 'statement_timeout_hit', False):
+                return _timeout_response(request, stats, policy)
+            raise
+        if response.status_code >= 500 and getattr(request, 'statement_timeout_hit', False):
+            return _timeout_response(request, stats, policy)
+        return response
+
+    return statement_timeout_tween
+
+
+def includeme(config):
+    """
+    Registra a tradução de cancelamentos em 503 e as estatísticas
+
+    O `SET LOCAL` em si é ligado ao engine em backend.database.configure_engine,
+    para valer também nos engines criados fora da aplicação.
+
+    Args:
+        config: Configurator do Pyramid
+    """
+    policy = StatementTimeoutPolicy(config.get_settings())
+    config.registry['statement_timeout_policy'] = policy
+    config.registry['statement_timeout_stats'] = StatementTimeoutStats()
+    if not policy.enabled:
+        return
+
+    for engine in config.registry['dbengines']:
+        event.listen(engine, 'handle_error', _flag_canceled_query)
+    config.add_tween(
+        'backend.statement_timeouts.statement_timeout_tween_factory',
+        over='pyramid_tm.tm_tween_factory'
+    )
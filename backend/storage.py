@@ -8,12 +8,15 @@ from typing import Optional
 from uuid import uuid4
 
 STORAGE_DIR = Path(os.getenv('TIMESHEET_STORAGE_PATH', 'storage/timesheets'))
+_storage_ready = False
 
 
 def ensure_storage_dir() -> Path:
-    """Garante que o diretório de armazenamento exista."""
-    STORAGE_DIR.mkdir(parents=True, exist_ok=True)
-    print(f"STORAGE_DIR: {STORAGE_DIR}")
+    """Garante que o diretório de armazenamento exista (verificado uma vez por processo)."""
+    global _storage_ready
+    if not _storage_ready:
+        STORAGE_DIR.mkdir(parents=True, exist_ok=True)
+        _storage_ready = True
     return STORAGE_DIR
 
 
@@ -0,0 +1,154 @@
+"""
+Detecção de horas anômalas nos timesheets
+Análise em lote, fora do caminho de criação: cada timesheet é comparado com a
+linha de base do seu consultor e do seu contrato — mediana e MAD (desvio
+absoluto mediano) dos últimos timesheets anteriores — pelo z-score robusto
+
+    z = 0.6745 × (horas - mediana) / MAD
+
+e marcado quando |z| passa do limite em qualquer uma das duas bases (ou
+quando as horas estão fora do intervalo plausível de um mês).
+
+A criação de timesheets não faz nenhum cálculo: timesheets novos (ou com
+horas/datas alteradas) ficam com anomaly_checked_at nulo e são avaliados na
+próxima execução (script backend/scripts/detect_timesheet_anomalies.py ou
+POST /api/admin/timesheet-anomalies). Cada execução carrega, numa consulta, o
+histórico só dos consultores e contratos com timesheets pendentes, percorre
+tudo uma vez em ordem cronológica com janelas deslizantes e grava o
+resultado num único UPDATE.
+"""
+from collections import defaultdict, deque
+from datetime import datetime
+from decimal import Decimal
+from statistics import median
+
+from sqlalchemy import Boolean, DateTime, Numeric, column, func, or_, select, update, values
+from sqlalchemy.dialects.postgresql import UUID
+
+from backend.models import Timesheet
+
+# Timesheets anteriores usados na linha de base de cada consultor/contrato
+WINDOW_SIZE = 12
+# Mínimo de timesheets anteriores para a linha de base valer
+MIN_BASELINE_SAMPLES = 4
+# |z| acima do qual o timesheet é marcado (Iglewicz & Hoaglin)
+Z_THRESHOLD = Decimal('3.5')
+# MAD mínimo em horas: evita marcar variações pequenas de quem lança sempre o mesmo valor
+MIN_MAD_HOURS = Decimal('4')
+# Intervalo plausível de horas de um timesheet (744 = 31 dias × 24 h)
+MAX_TIMESHEET_HOURS = Decimal('744')
+MAX_SCORE = Decimal('9999.99')
+MAD_SCALE = Decimal('0.6745')
+# Timesheets pendentes avaliados por execução do endpoint admin
+DEFAULT_BATCH_SIZE = 5000
+
+
+def robust_z(hours, window):
+    """z-score robusto de hours contra a janela; None sem histórico suficiente"""
+    if len(window) < MIN_BASELINE_SAMPLES:
+        return None
+    center = median(window)
+    mad = max(median(abs(value - center) for value in window), MIN_MAD_HOURS)
+    return MAD_SCALE * (hours - center) / mad
+
+
+def score_timesheets(rows, pending_ids):
+    """
+    Avalia os timesheets pendentes contra as janelas do consultor e do contrato
+
+    Args:
+        rows: (id, consultant_id, contract_id, horas, data) em ordem cronológica,
+            incluindo o histórico usado nas linhas de base
+        pending_ids: Ids a avaliar
+
+    Returns:
+        Lista de (id, score, flagged)
+    """
+    windows = defaultdict(lambda: deque(maxlen=WINDOW_SIZE))
+    results = []
+    for timesheet_id, consultant_id, contract_id, hours, _ in rows:
+        hours = Decimal(hours or 0)
+        keys = [('contract', contract_id)]
+        if consultant_id is not None:
+            keys.append(('consultant', consultant_id))
+        if timesheet_id in pending_ids:
+            scores = [z for z in (robust_z(hours, windows[key]) for key in keys) if z is not None]
+            score = max((abs(z) for z in scores), default=None)
+            flagged = (
+                hours <= 0 or hours > MAX_TIMESHEET_HOURS
+                or (score is not None and score > Z_THRESHOLD)
+            )
+            if score is not None:
+                score = min(score, MAX_SCORE).quantize(Decimal('0.01'))
+            results.append((timesheet_id, score, flagged))
+        for key in keys:
+            windows[key].append(hours)
+    return results
+
+
+def detect_timesheet_anomalies(session, full=False, limit=None):
+    """
+    Avalia os timesheets pendentes (ou todos, com full=True)
+
+    Args:
+        session: Sessão do SQLAlchemy
+        full: Reavalia todos os timesheets, não só os pendentes
+        limit: Máximo de timesheets pendentes por execução
+
+    Returns:
+        Dict com quantos timesheets foram avaliados e marcados
+    """
+    pending = select(Timesheet.id, Timesheet.consultant_id, Timesheet.contract_id)
+    if not full:
+        pending = pending.where(Timesheet.anomaly_checked_at.is_(None))
+    if limit:
+        pending = pending.order_by(Timesheet.created_at).limit(limit)
+    pending = session.execute(pending).all()
+    if not pending:
+        return {'checked': 0, 'flagged': 0}
+
+    pending_ids = {row.id for row in pending}
+    consultant_ids = {row.consultant_id for row in pending if row.consultant_id is not None}
+    contract_ids = {row.contract_id for row in pending}
+
+    # Histórico dos consultores e contratos envolvidos, numa única consulta
+    when = func.coalesce(Timesheet.filled_at, Timesheet.uploaded_at)
+    history = select(
+        Timesheet.id, Timesheet.consultant_id, Timesheet.contract_id, Timesheet.hours, when
+    ).order_by(when, Timesheet.created_at, Timesheet.id)
+    if not full:
+        conditions = [Timesheet.contract_id.in_(contract_ids)]
+        if consultant_ids:
+            conditions.append(Timesheet.consultant_id.in_(consultant_ids))
+        history = history.where(or_(*conditions))
+    results = score_timesheets(session.execute(history), pending_ids)
+
+    checked_at = datetime.utcnow()
+    scores = values(
+        column('id', UUID(as_uuid=True)),
+        column('score', Numeric(8, 2)),
+        column('flagged', Boolean),
+        column('checked_at', DateTime),
+        name='scores',
+    ).data([(timesheet_id, score, flagged, checked_at) for timesheet_id, score, flagged in results])
+    session.execute(
+        update(Timesheet)
+        .where(Timesheet.id == scores.c.id)
+        .values(
+            anomaly_score=scores.c.score,
+            anomaly_flagged=scores.c.flagged,
+            anomaly_checked_at=scores.c.checked_at,
+        ),
+        execution_options={'synchronize_session': False},
+    )
+    return {
+        'checked': len(results),
+        'flagged': sum(1 for _, _, flagged in results if flagged),
+    }
+
+
+def reset_anomaly_check(timesheet):
+    """Marca um timesheet alterado para ser reavaliado na próxima execução"""
+    timesheet.anomaly_checked_at = None
+    timesheet.anomaly_flagged = False
+    timesheet.anomaly_score = None
@@ -5,11 +5,13 @@ Endpoints CRUD para gestão de contratos
 from pyramid.view import view_config, view_defaults
 from pyramid.response import Response
 from sqlalchemy.exc import IntegrityError
-from backend.models import Contract, Client, Installment, ContractStatus
-from backend.schemas import ContractSchema, ContractCreateSchema
+from backend.models import Contract, Client, Installment, ContractStatus, ContractMonthlyHours, Consultant
+from backend.schemas import ContractSchema, ContractCreateSchema, InstallmentSchema
 from backend.auth_helpers import require_authenticated, apply_partner_filter, can_access_resource
+from backend.contract_totals import apply_contract_totals
+from backend.installment_schedule import add_months, build_schedule, insert_schedule, month_label
 import json
-from datetime import datetime
+from datetime import date, datetime
 from decimal import Decimal
 
 
@@ -171,9 +173,24 @@ class ContractViews:
             self.db.add(contract)
             self.db.flush()
             
+            # Gera as parcelas junto com o contrato (opcional), num único INSERT em lote
+            installments = []
+            schedule = data.get('installment_schedule')
+            if schedule:
+                duration_months = 1 if contract.payment_method == 'a_vista' else contract.duration_months
+                installments = insert_schedule(self.db, build_schedule(
+                    contract.id,
+                    contract.total_value,
+                    duration_months,
+                    schedule['start_month'],
+                    payment_term=schedule.get('payment_term'),
+                    billing_day=schedule.get('billing_day', 1),
+                ))
+            
             # Serializa os dados do contrato
-            result_schema = ContractSchema()
+            result_schema = ContractSchema(exclude=('installments',))
             contract_data = result_schema.dump(contract)
+            contract_data['installments'] = InstallmentSchema(many=True, exclude=('contract',)).dump(installments)
             
             return Response(
                 json.dumps(contract_data).encode('utf-8'),
@@ -263,10 +280,9 @@ class ContractViews:
                 if emh is not None and dm is not None:
                     contract.total_hours_contracted = Decimal(str(emh)) * dm
             
-            # Recalcula o balance
-            contract.balance = contract.total_value - contract.billed_value
-            
-            self.db.flush()
+            # O balance acompanha a variação do total_value (backend.contract_totals);
+            # aplica já para devolver os totais atualizados
+            apply_contract_totals(self.db)
             
             # Serializa os dados
             schema = ContractSchema()
@@ -324,3 +340,113 @@ class ContractViews:
                 content_type='application/json'
             )
 
+    @view_config(route_name='contract_hours_burndown', request_method='GET')
+    def hours_burndown(self):
+        """
+        GET /api/contracts/{id}/hours-burndown
+        Burn-down das horas do contrato: horas consumidas por mês (e por
+        consultor) contra as horas contratadas, a partir dos totais mensais
+        mantidos pelos timesheets (sem somar os timesheets a cada consulta)
+
+        Returns:
+            Totais do contrato, série mensal (consumido, acumulado, planejado
+            acumulado e saldo) e horas por consultor e mês
+        """
+        user = require_authenticated(self.request)
+        contract_id = self.request.matchdict['id']
+        contract = self.db.query(Contract).join(Client).filter(
+            Contract.id == contract_id
+        ).first()
+
+        if not contract:
+            return Response(
+                json.dumps({'error': 'Contrato não encontrado'}).encode('utf-8'),
+                status=404,
+                content_type='application/json',
+                charset='utf-8'
+            )
+
+        if not can_access_resource(user, contract.client.partner_id):
+            return Response(
+                json.dumps({'error': 'Você não tem permissão para acessar este contrato'}).encode('utf-8'),
+                status=403,
+                content_type='application/json',
+                charset='utf-8'
+            )
+
+        rows = self.db.query(
+            ContractMonthlyHours.month,
+            ContractMonthlyHours.consultant_id,
+            Consultant.name.label('consultant_name'),
+            ContractMonthlyHours.hours,
+        ).outerjoin(
+            Consultant, ContractMonthlyHours.consultant_id == Consultant.id
+        ).filter(
+            ContractMonthlyHours.contract_id == contract.id,
+            ContractMonthlyHours.hours != 0
+        ).order_by(ContractMonthlyHours.month).all()
+
+        by_month = {}
+        consultants = {}
+        for row in rows:
+            by_month[row.month] = by_month.get(row.month, Decimal('0')) + row.hours
+            consultant = consultants.setdefault(row.consultant_id, {
+                'consultant_id': str(row.consultant_id) if row.consultant_id else None,
+                'consultant_name': row.consultant_name,
+                'hours': Decimal('0'),
+                'months': {},
+            })
+            consultant['hours'] += row.hours
+            consultant['months'][row.month.strftime('%Y-%m')] = str(row.hours)
+
+        # Do mês de criação (ou do primeiro lançamento) até o mês atual, limitado ao fim do contrato
+        first = date(contract.created_at.year, contract.created_at.month, 1)
+        last = min(date.today(), contract.end_date.date()).replace(day=1)
+        if by_month:
+            first = min(first, min(by_month))
+            last = max(last, max(by_month))
+
+        total_hours = contract.total_hours_contracted
+        monthly_plan = contract.estimated_monthly_hours
+        if monthly_plan is None and total_hours is not None and contract.duration_months:
+            monthly_plan = Decimal(str(total_hours)) / contract.duration_months
+
+        months = []
+        cumulative = Decimal('0')
+        month = first
+        index = 0
+        while month <= last:
+            hours = by_month.get(month, Decimal('0'))
+            cumulative += hours
+            index += 1
+            planned = None
+            if monthly_plan is not None:
+                planned = Decimal(str(monthly_plan)) * index
+                if total_hours is not None:
+                    planned = min(planned, Decimal(str(total_hours)))
+            months.append({
+                'month': month.strftime('%Y-%m'),
+                'label': month_label(month),
+                'hours': str(hours),
+                'cumulative_hours': str(cumulative),
+                'planned_cumulative_hours': str(planned) if planned is not None else None,
+                'remaining_hours': str(Decimal(str(total_hours)) - cumulative) if total_hours is not None else None,
+            })
+            month = add_months(month, 1)
+
+        return {
+            'contract_id': str(contract.id),
+            'contract_name': contract.name,
+            'total_hours_contracted': str(total_hours) if total_hours is not None else None,
+            'estimated_monthly_hours': (
+                str(contract.estimated_monthly_hours) if contract.estimated_monthly_hours is not None else None
+            ),
+            'consumed_hours': str(contract.consumed_hours),
+            'remaining_hours': str(contract.remaining_hours) if contract.remaining_hours is not None else None,
+            'consumed_hours_percentage': round(contract.consumed_hours_percentage, 2),
+            'months': months,
+            'consultants': [
+                {**consultant, 'hours': str(consultant['hours'])}
+                for consultant in sorted(consultants.values(), key=lambda c: c['consultant_name'] or '')
+            ],
+        }
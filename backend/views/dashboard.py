@@ -4,6 +4,7 @@ Endpoints para exibir estatísticas consolidadas
 """
 from pyramid.view import view_config
 from sqlalchemy import func
+from sqlalchemy.orm import contains_eager
 from datetime import datetime, timedelta
 from backend.models import Contract, Consultant, ContractStatus, Installment, Client, User
 from backend.auth_helpers import require_authenticated, apply_partner_filter
@@ -82,7 +83,9 @@ def dashboard_view(request):
     today = datetime.utcnow()
     thirty_days = today + timedelta(days=30)
     
-    expiring_contracts_query = db.query(Contract).join(Client).filter(
+    expiring_contracts_query = db.query(Contract).join(Client).options(
+        contains_eager(Contract.client)
+    ).filter(
         Contract.end_date <= thirty_days,
         Contract.end_date >= today,
         Contract.status == ContractStatus.ATIVO
@@ -0,0 +1,278 @@
+"""
+Views de diagnóstico de performance
+Endpoints administrativos para inspecionar queries lentas, profiles de requests,
+alocação de memória, cancelamentos por statement_timeout e controle de admissão
+Apenas admin global pode acessar
+"""
+import json
+from pyramid.view import view_config
+from pyramid.response import Response
+from backend.auth_helpers import require_admin_global
+from backend.logging_config import read_slow_queries
+from backend.profiling import list_profiles, load_profile
+from backend.memory_profiling import take_snapshot, list_snapshots, diff_snapshots
+from backend.statement_timeouts import ROUTE_TIMEOUT_CLASSES
+from backend.admission import ROUTE_PRIORITIES
+from backend.contract_totals import find_contract_total_drift
+from backend.timesheet_anomalies import DEFAULT_BATCH_SIZE, detect_timesheet_anomalies
+
+MAX_SLOW_QUERY_LIMIT = 1000
+
+
+@view_config(route_name='admin_slow_queries', request_method='GET', renderer='json')
+def list_slow_queries(request):
+    """
+    GET /api/admin/slow-queries
+    Lista as queries lentas mais recentes registradas no log dedicado
+    
+    Query params:
+        - limit: Número máximo de entradas (padrão 100, máximo 1000)
+        - route: Filtrar pelo nome da rota
+        - partner_id: Filtrar pelo parceiro do usuário
+    
+    Returns:
+        Entradas do log (mais recentes primeiro) com statement, duração e plano
+    """
+    require_admin_global(request)
+    
+    try:
+        limit = max(1, min(int(request.params.get('limit', 100)), MAX_SLOW_QUERY_LIMIT))
+    except ValueError:
+        limit = 100
+    
+    entries = read_slow_queries(
+        limit,
+        route=request.params.get('route') or None,
+        partner_id=request.params.get('partner_id') or None,
+    )
+    
+    return {'slow_queries': entries, 'count': len(entries)}
+
+
+@view_config(route_name='admin_profiles', request_method='GET', renderer='json')
+def list_request_profiles(request):
+    """
+    GET /api/admin/profiles
+    Lista os profiles de requests salvos (modo `X-Profile: store`)
+    
+    Query params:
+        - limit: Número máximo de profiles (padrão 50)
+    
+    Returns:
+        Resumo de cada profile (rota, status e tempos), mais recentes primeiro
+    """
+    require_admin_global(request)
+    
+    try:
+        limit = int(request.params.get('limit', 50))
+    except ValueError:
+        limit = 50
+    
+    return {'profiles': list_profiles(limit)}
+
+
+@view_config(route_name='admin_profile', request_method='GET', renderer='json')
+def get_request_profile(request):
+    """
+    GET /api/admin/profiles/{id}
+    Retorna o relatório completo de um profile (funções mais custosas e árvore de chamadas)
+    """
+    require_admin_global(request)
+    
+    report = load_profile(request.matchdict['id'])
+    if not report:
+        return Response(
+            json.dumps({'error': 'Profile não encontrado'}).encode('utf-8'),
+            status=404,
+            content_type='application/json',
+            charset='utf-8'
+        )
+    return report
+
+
+def _memory_profiling_disabled():
+    return Response(
+        json.dumps({'error': 'Profiling de memória desligado (perf.memory.sample_rate = 0)'}).encode('utf-8'),
+        status=409,
+        content_type='application/json',
+        charset='utf-8'
+    )
+
+
+@view_config(route_name='admin_memory', request_method='GET', renderer='json')
+def get_memory_stats(request):
+    """
+    GET /api/admin/memory
+    Retorna pico e memória retida por rota nas amostras do tracemalloc
+    
+    Returns:
+        Estatísticas por rota e os pontos de alocação da última amostra
+    """
+    require_admin_global(request)
+    
+    profiler = request.registry.get('memory_profiler')
+    if profiler is None:
+        return _memory_profiling_disabled()
+    
+    return {'sample_rate': profiler.sample_rate, 'routes': profiler.route_stats()}
+
+
+@view_config(route_name='admin_memory', request_method='DELETE', renderer='json')
+def reset_memory_stats(request):
+    """
+    DELETE /api/admin/memory
+    Zera as estatísticas de memória acumuladas por rota
+    """
+    require_admin_global(request)
+    
+    profiler = request.registry.get('memory_profiler')
+    if profiler is None:
+        return _memory_profiling_disabled()
+    
+    profiler.reset()
+    return {'message': 'Estatísticas de memória zeradas'}
+
+
+@view_config(route_name='admin_memory_snapshots', request_method='GET', renderer='json')
+def list_memory_snapshots(request):
+    """
+    GET /api/admin/memory/snapshots
+    Lista os snapshots de memória salvos
+    """
+    require_admin_global(request)
+    return {'snapshots': list_snapshots()}
+
+
+@view_config(route_name='admin_memory_snapshots', request_method='POST', renderer='json')
+def create_memory_snapshot(request):
+    """
+    POST /api/admin/memory/snapshots
+    Tira um snapshot do tracemalloc do processo atual
+    
+    Returns:
+        Id do snapshot, memória rastreada e principais pontos de alocação
+    """
+    require_admin_global(request)
+    
+    snapshot = take_snapshot()
+    if snapshot is None:
+        return _memory_profiling_disabled()
+    
+    return Response(
+        json.dumps(snapshot).encode('utf-8'),
+        status=201,
+        content_type='application/json',
+        charset='utf-8'
+    )
+
+
+@view_config(route_name='admin_memory_snapshot_diff', request_method='GET', renderer='json')
+def diff_memory_snapshots(request):
+    """
+    GET /api/admin/memory/snapshots/{id}/diff
+    Compara um snapshot com outro (base)
+    
+    Query params:
+        - base: Id do snapshot de referência (obrigatório)
+        - limit: Número de pontos de alocação (padrão 10)
+        - key: Agrupamento — lineno, filename ou traceback (padrão lineno)
+    """
+    require_admin_global(request)
+    
+    base_id = request.params.get('base')
+    key_type = request.params.get('key', 'lineno')
+    if not base_id or key_type not in ('lineno', 'filename', 'traceback'):
+        return Response(
+            json.dumps({'error': 'Informe base e key válidos (lineno, filename ou traceback)'}).encode('utf-8'),
+            status=400,
+            content_type='application/json',
+            charset='utf-8'
+        )
+    
+    try:
+        limit = int(request.params.get('limit', 10))
+    except ValueError:
+        limit = 10
+    
+    diff = diff_snapshots(request.matchdict['id'], base_id, limit, key_type)
+    if diff is None:
+        return Response(
+            json.dumps({'error': 'Snapshot não encontrado'}).encode('utf-8'),
+            status=404,
+            content_type='application/json',
+            charset='utf-8'
+        )
+    return {'snapshot': request.matchdict['id'], 'base': base_id, 'top_sites': diff}
+
+
+@view_config(route_name='admin_statement_timeouts', request_method='GET', renderer='json')
+def get_statement_timeout_stats(request):
+    """
+    GET /api/admin/statement-timeouts
+    Retorna os timeouts por classe de rota e quantos statements foram
+    cancelados por rota desde o início do processo
+    """
+    require_admin_global(request)
+    
+    policy = request.registry['statement_timeout_policy']
+    return {
+        'timeouts_ms': policy.timeouts,
+        'route_classes': ROUTE_TIMEOUT_CLASSES,
+        'cancellations': request.registry['statement_timeout_stats'].as_dict(),
+    }
+
+
+@view_config(route_name='admin_admission', request_method='GET', renderer='json')
+def get_admission_stats(request):
+    """
+    GET /api/admin/admission
+    Retorna o estado do controle de admissão: requests em andamento, limites,
+    tempo médio de conexão e admitidos/recusados por prioridade
+    """
+    require_admin_global(request)
+    
+    controller = request.registry.get('admission_controller')
+    if controller is None:
+        return {'enabled': False, 'route_priorities': ROUTE_PRIORITIES}
+    return {
+        'enabled': True,
+        'route_priorities': ROUTE_PRIORITIES,
+        **controller.stats(),
+    }
+
+
+@view_config(route_name='admin_contract_totals', request_method='GET', renderer='json')
+def check_contract_totals(request):
+    """
+    GET /api/admin/contract-totals
+    Confere billed_value/balance e consumed_hours de todos os contratos contra
+    as parcelas faturadas e os timesheets (correção:
+    backend/scripts/reconcile_contract_totals.py --fix)
+    """
+    require_admin_global(request)
+    
+    drift = find_contract_total_drift(request.dbsession)
+    return {'consistent': not drift, 'drift': drift}
+
+
+@view_config(route_name='admin_timesheet_anomalies', request_method='POST', renderer='json')
+def run_timesheet_anomalies(request):
+    """
+    POST /api/admin/timesheet-anomalies
+    Avalia os timesheets pendentes (novos ou alterados) contra as linhas de
+    base de consultor e contrato; os marcados aparecem em
+    GET /api/timesheets?anomalous=true
+
+    Query params:
+        - full: true para reavaliar todos os timesheets (sujeito ao timeout de
+          relatório; em bases grandes use backend/scripts/detect_timesheet_anomalies.py)
+        - limit: Máximo de timesheets pendentes avaliados (padrão 5000)
+    """
+    require_admin_global(request)
+
+    full = request.params.get('full', 'false').lower() in ('true', '1', 'yes')
+    try:
+        limit = int(request.params.get('limit', DEFAULT_BATCH_SIZE))
+    except ValueError:
+        limit = DEFAULT_BATCH_SIZE
+    return detect_timesheet_anomalies(request.dbsession, full=full, limit=None if full else limit)
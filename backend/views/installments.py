@@ -4,12 +4,15 @@ Endpoints CRUD para gestão de parcelas de contratos
 """
 from pyramid.view import view_config, view_defaults
 from pyramid.response import Response
-from sqlalchemy import func, Integer
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy import case, func, select, update, Integer
+from sqlalchemy.exc import DBAPIError, IntegrityError
 from sqlalchemy.orm import joinedload
 from backend.models import Installment, Contract, ContractStatus, Client, UserRole
 from backend.auth_helpers import require_authenticated, apply_partner_filter, can_access_resource
-from backend.schemas import InstallmentSchema
+from backend.schemas import InstallmentSchema, InstallmentScheduleSchema, InstallmentBulkUpdateSchema
+from backend.contract_totals import add_contract_deltas, billed_amount
+from backend.installment_schedule import MAX_SCHEDULE_MONTHS, build_schedule, insert_schedule
+from marshmallow import ValidationError
 import json
 from datetime import datetime
 from decimal import Decimal
@@ -396,6 +399,126 @@ class InstallmentViews:
                 charset='utf-8'
             )
     
+    @view_config(route_name='contract_installment_schedule', request_method='POST')
+    def generate_schedule(self):
+        """
+        POST /api/contracts/{id}/installments/schedule
+        Gera todas as parcelas mensais do contrato em uma única requisição
+        
+        Body:
+            {
+                "start_month": "2026-01",
+                "total_value": 360000.00,     (opcional, padrão: total do contrato)
+                "duration_months": 36,        (opcional, padrão: duração do contrato; à vista = 1)
+                "payment_term": 30,           (opcional)
+                "billing_day": 5              (opcional, padrão 1)
+            }
+        
+        Returns:
+            Parcelas criadas; a diferença do arredondamento fica na última
+        """
+        user = require_authenticated(self.request)
+        contract_id = self.request.matchdict['id']
+        # Trava o contrato: dois POSTs simultâneos passariam juntos pela verificação
+        # de parcelas existentes abaixo e gravariam o cronograma duas vezes
+        contract = self.db.query(Contract).options(
+            joinedload(Contract.client)
+        ).filter(
+            Contract.id == contract_id
+        ).populate_existing().with_for_update(of=Contract).one_or_none()
+        
+        if not contract:
+            return Response(
+                json.dumps({'error': 'Contrato não encontrado'}).encode('utf-8'),
+                status=404,
+                content_type='application/json',
+                charset='utf-8'
+            )
+        
+        if not can_access_resource(user, contract.client.partner_id):
+            return Response(
+                json.dumps({'error': 'Você não tem permissão para criar parcelas para este contrato'}).encode('utf-8'),
+                status=403,
+                content_type='application/json',
+                charset='utf-8'
+            )
+        
+        try:
+            data = InstallmentScheduleSchema().load(self.request.json_body)
+        except ValidationError as e:
+            return Response(
+                json.dumps({'error': 'Dados inválidos', 'details': e.messages}).encode('utf-8'),
+                status=400,
+                content_type='application/json',
+                charset='utf-8'
+            )
+        
+        # Mesma regra da criação do contrato: à vista é parcela única
+        if contract.payment_method == 'a_vista':
+            if data.get('duration_months') not in (None, 1):
+                return Response(
+                    json.dumps({'error': 'Contrato à vista tem parcela única'}).encode('utf-8'),
+                    status=400,
+                    content_type='application/json',
+                    charset='utf-8'
+                )
+            duration_months = 1
+        else:
+            duration_months = data.get('duration_months') or contract.duration_months
+        if not duration_months:
+            return Response(
+                json.dumps({'error': 'Informe duration_months (o contrato não tem duração cadastrada)'}).encode('utf-8'),
+                status=400,
+                content_type='application/json',
+                charset='utf-8'
+            )
+        # A duração herdada do contrato pode vir de antes do limite de meses
+        if duration_months > MAX_SCHEDULE_MONTHS:
+            return Response(
+                json.dumps({'error': f'O cronograma deve ter no máximo {MAX_SCHEDULE_MONTHS} parcelas; informe duration_months'}).encode('utf-8'),
+                status=400,
+                content_type='application/json',
+                charset='utf-8'
+            )
+        
+        has_installments = self.db.query(
+            self.db.query(Installment).filter(Installment.contract_id == contract.id).exists()
+        ).scalar()
+        if has_installments:
+            return Response(
+                json.dumps({'error': 'O contrato já possui parcelas'}).encode('utf-8'),
+                status=409,
+                content_type='application/json',
+                charset='utf-8'
+            )
+        
+        # Erros do banco (inclusive o cancelamento por statement_timeout) seguem para os tweens
+        try:
+            rows = build_schedule(
+                contract.id,
+                data.get('total_value') or contract.total_value,
+                duration_months,
+                data['start_month'],
+                payment_term=data.get('payment_term'),
+                billing_day=data['billing_day'],
+            )
+        except ValueError:
+            return Response(
+                json.dumps({'error': 'As parcelas do cronograma ficariam fora do intervalo de datas suportado'}).encode('utf-8'),
+                status=400,
+                content_type='application/json',
+                charset='utf-8'
+            )
+        insert_schedule(self.db, rows)
+        
+        schema = InstallmentSchema(many=True, exclude=('contract',))
+        return Response(
+            json.dumps({'installments': schema.dump(rows)}).encode('utf-8'),
+            status=201,
+            content_type='application/json',
+            charset='utf-8'
+        )
+    
     @view_config(route_name='installment_mark_billed', request_method='PATCH')
     def mark_as_billed(self):
         """
@@ -412,11 +535,12 @@ class InstallmentViews:
         """
         user = require_authenticated(self.request)
         installment_id = self.request.matchdict['id']
+        # Trava a parcela: os deltas dos totais do contrato partem do valor antigo lido aqui
         installment = self.db.query(Installment).options(
             joinedload(Installment.contract).joinedload(Contract.client)
         ).filter(
             Installment.id == installment_id
-        ).first()
+        ).populate_existing().with_for_update(of=Installment).one_or_none()
         
         if not installment:
             return Response(
@@ -438,11 +562,9 @@ class InstallmentViews:
             data = self.request.json_body
             installment.billed = data.get('billed', True)
             
+            # billed_value/balance do contrato são ajustados no commit (backend.contract_totals)
             self.db.flush()
             
-            # Atualiza o billed_value e balance do contrato
-            self._update_contract_billed_value(installment.contract)
-            
             # Serializa os dados
             schema = InstallmentSchema()
             return schema.dump(installment)
@@ -456,6 +578,107 @@ class InstallmentViews:
                 charset='utf-8'
             )
     
+    @view_config(route_name='installments_bulk', request_method='PATCH')
+    def bulk_update(self):
+        """
+        PATCH /api/installments/bulk
+        Marca várias parcelas como faturadas (ou atualiza os dados de
+        faturamento) em uma única requisição
+        
+        Body:
+            {
+                "ids": ["uuid", ...],
+                "billed": true,
+                "billing_date": "2026-01-31",
+                "payment_term": 30,
+                "expected_payment_date": "2026-03-02",
+                "payment_date": null,
+                "invoice_numbers": {"uuid": "NF-123", ...}
+            }
+        
+        Returns:
+            Parcelas atualizadas e ids não encontrados (inexistentes ou de outro parceiro)
+        """
+        user = require_authenticated(self.request)
+        try:
+            data = InstallmentBulkUpdateSchema().load(self.request.json_body)
+        except ValidationError as e:
+            return Response(
+                json.dumps({'error': 'Dados inválidos', 'details': e.messages}).encode('utf-8'),
+                status=400,
+                content_type='application/json',
+                charset='utf-8'
+            )
+        
+        ids = list(dict.fromkeys(data['ids']))
+        changes = {'billed': data['billed']}
+        for field in ('billing_date', 'payment_term', 'expected_payment_date', 'payment_date'):
+            if field in data:
+                changes[field] = data[field]
+        if data['invoice_numbers']:
+            changes['invoice_number'] = case(
+                data['invoice_numbers'],
+                value=Installment.id,
+                else_=Installment.invoice_number
+            )
+        
+        try:
+            # Estado anterior das parcelas acessíveis ao usuário, travadas até o commit
+            previous = select(
+                Installment.id, Installment.billed
+            ).join(
+                Contract, Installment.contract_id == Contract.id
+            ).join(
+                Client, Contract.client_id == Client.id
+            ).where(
+                Installment.id.in_(ids)
+            )
+            previous = apply_partner_filter(previous, Client, user).with_for_update(
+                of=Installment
+            ).subquery('previous')
+            
+            rows = self.db.execute(
+                update(Installment)
+                .where(Installment.id == previous.c.id)
+                .values(**changes)
+                .returning(
+                    Installment.id,
+                    Installment.contract_id,
+                    Installment.value,
+                    Installment.billed,
+                    previous.c.billed.label('was_billed')
+                ),
+                execution_options={'synchronize_session': False}
+            ).all()
+            
+            # Totais de cada contrato afetado ajustados uma única vez, no commit
+            for row in rows:
+                add_contract_deltas(
+                    self.db,
+                    row.contract_id,
+                    billed=billed_amount(row.billed, row.value) - billed_amount(row.was_billed, row.value)
+                )
+            
+            updated = {row.id for row in rows}
+            return {
+                'updated': len(rows),
+                'ids': [str(row.id) for row in rows],
+                'not_found': [str(installment_id) for installment_id in ids if installment_id not in updated],
+                'contracts': sorted({str(row.contract_id) for row in rows}),
+            }
+        except DBAPIError:
+            # Erros do banco (inclusive o cancelamento por statement_timeout,
+            # que vira 503) ficam com os tweens, sem a mensagem do driver
+            raise
+        except Exception as e:
+            self.db.rollback()
+            return Response(
+                json.dumps({'error': str(e)}).encode('utf-8'),
+                status=400,
+                content_type='application/json',
+                charset='utf-8'
+            )
+    
     @view_config(route_name='installment', request_method=('PUT', 'PATCH'))
     def update_installment(self):
         """
@@ -470,11 +693,12 @@ class InstallmentViews:
         """
         user = require_authenticated(self.request)
         installment_id = self.request.matchdict['id']
+        # Trava a parcela: os deltas dos totais do contrato partem do valor antigo lido aqui
         installment = self.db.query(Installment).options(
             joinedload(Installment.contract).joinedload(Contract.client)
         ).filter(
             Installment.id == installment_id
-        ).first()
+        ).populate_existing().with_for_update(of=Installment).one_or_none()
         
         if not installment:
             return Response(
@@ -513,11 +737,9 @@ class InstallmentViews:
             if 'payment_date' in data:
                 installment.payment_date = data['payment_date']
             
+            # billed_value/balance do contrato são ajustados no commit (backend.contract_totals)
             self.db.flush()
             
-            # Atualiza o billed_value e balance do contrato
-            self._update_contract_billed_value(installment.contract)
-            
             # Serializa os dados
             schema = InstallmentSchema()
             return schema.dump(installment)
@@ -542,11 +764,12 @@ class InstallmentViews:
         """
         user = require_authenticated(self.request)
         installment_id = self.request.matchdict['id']
+        # Trava a parcela: os deltas dos totais do contrato partem do valor antigo lido aqui
         installment = self.db.query(Installment).options(
             joinedload(Installment.contract).joinedload(Contract.client)
         ).filter(
             Installment.id == installment_id
-        ).first()
+        ).populate_existing().with_for_update(of=Installment).one_or_none()
         
         if not installment:
             return Response(
@@ -565,13 +788,10 @@ class InstallmentViews:
             )
         
         try:
-            contract = installment.contract
+            # billed_value/balance do contrato são ajustados no commit (backend.contract_totals)
             self.db.delete(installment)
             self.db.flush()
             
-            # Atualiza o billed_value e balance do contrato
-            self._update_contract_billed_value(contract)
-            
             return {'message': 'Parcela removida com sucesso'}
         except Exception as e:
             self.db.rollback()
@@ -581,29 +801,3 @@ class InstallmentViews:
                 charset='utf-8',
                 content_type='application/json'
             )
-    
-    def _update_contract_billed_value(self, contract):
-        """
-        Método auxiliar para atualizar o valor faturado do contrato
-        Soma todas as parcelas marcadas como 'billed=True'
-        """
-        # Usa o ID do contract para fazer a query
-        contract_id = contract.id if hasattr(contract, 'id') else contract
-        
-        # Faz a query para calcular o total faturado
-        total_billed = self.db.query(
-            func.sum(Installment.value)
-        ).filter(
-            Installment.contract_id == contract_id,
-            Installment.billed == True
-        ).scalar() or 0
-        
-        # Busca o contract novamente na sessão para garantir que está anexado
-        contract_in_session = self.db.query(Contract).filter(
-            Contract.id == contract_id
-        ).first()
-        
-        if contract_in_session:
-            contract_in_session.billed_value = total_billed
-            contract_in_session.balance = contract_in_session.total_value - total_billed
-
@@ -0,0 +1,678 @@
+"""
+Views de Relatórios financeiros e de horas
+Relatórios agregados calculados no banco, em consultas agrupadas, para
+continuar rápidos com centenas de milhares de parcelas
+"""
+from pyramid.view import view_config
+from pyramid.response import Response
+from sqlalchemy import Date, Integer, case, cast, func, literal, null, select, union_all
+from backend.models import Installment, Contract, Client, Partner, Consultant, ContractMonthlyHours
+from backend.auth_helpers import require_authenticated, apply_partner_filter
+from backend.installment_schedule import MONTH_LABELS, add_months, month_label
+from backend import receivables_risk
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+# Faixas de atraso do aging: (chave, menor atraso em dias, maior atraso em dias)
+AGING_BUCKETS = (
+    ('current', None, 0),
+    ('1_30', 1, 30),
+    ('31_60', 31, 60),
+    ('61_90', 61, 90),
+    ('90_plus', 91, None),
+)
+
+FORECAST_GRANULARITIES = ('week', 'month')
+DEFAULT_FORECAST_HORIZON = {'week': 13, 'month': 12}
+MAX_FORECAST_HORIZON = {'week': 104, 'month': 36}
+# Prazo assumido para parcelas ainda não faturadas e sem payment_term
+DEFAULT_PAYMENT_TERM_DAYS = 30
+
+DEFAULT_UTILIZATION_MONTHS = 12
+MAX_UTILIZATION_MONTHS = 24
+
+
+def _parse_date_param(request, name):
+    value = request.params.get(name)
+    if not value:
+        return None
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def _bad_request(message):
+    return Response(
+        json.dumps({'error': message}).encode('utf-8'),
+        status=400,
+        content_type='application/json',
+        charset='utf-8'
+    )
+
+
+def _empty_buckets():
+    return {key: {'count': 0, 'value': Decimal('0')} for key, _, _ in AGING_BUCKETS}
+
+
+def _add_buckets(target, source):
+    for key, _, _ in AGING_BUCKETS:
+        target[key]['count'] += source[key]['count']
+        target[key]['value'] += source[key]['value']
+
+
+def _serialize_buckets(buckets):
+    total_value = sum((bucket['value'] for bucket in buckets.values()), Decimal('0'))
+    return {
+        'buckets': {
+            key: {'count': bucket['count'], 'value': str(bucket['value'])}
+            for key, bucket in buckets.items()
+        },
+        'total_count': sum(bucket['count'] for bucket in buckets.values()),
+        'total_value': str(total_value),
+    }
+
+
+@view_config(route_name='report_receivables_aging', request_method='GET', renderer='json')
+def receivables_aging(request):
+    """
+    GET /api/reports/receivables-aging
+    Aging de contas a receber: parcelas sem pagamento (payment_date nulo)
+    agrupadas por dias de atraso em relação à expected_payment_date
+    (em dia, 1–30, 31–60, 61–90, 90+), por parceiro, cliente e contrato
+
+    Query params:
+        - as_of: Data de referência (YYYY-MM-DD, padrão hoje)
+        - partner_id: Filtrar por parceiro (admin global)
+        - client_id: Filtrar por cliente
+
+    Returns:
+        Totais por faixa no portfólio e por parceiro → cliente → contrato
+    """
+    user = require_authenticated(request)
+    db = request.dbsession
+
+    try:
+        as_of = _parse_date_param(request, 'as_of') or date.today()
+    except ValueError:
+        return _bad_request('as_of deve estar no formato YYYY-MM-DD')
+
+    # Uma única consulta agrupada por contrato; cada faixa é um SUM/COUNT com FILTER
+    days_overdue = cast(literal(as_of), Date) - cast(Installment.expected_payment_date, Date)
+    columns = []
+    for key, low, high in AGING_BUCKETS:
+        condition = days_overdue <= high if low is None else (
+            days_overdue >= low if high is None else days_overdue.between(low, high)
+        )
+        columns.append(func.count(Installment.id).filter(condition).label(f'{key}_count'))
+        columns.append(func.coalesce(func.sum(Installment.value).filter(condition), 0).label(f'{key}_value'))
+
+    query = db.query(
+        Partner.id.label('partner_id'),
+        Partner.name.label('partner_name'),
+        Client.id.label('client_id'),
+        Client.name.label('client_name'),
+        Contract.id.label('contract_id'),
+        Contract.name.label('contract_name'),
+        *columns
+    ).select_from(Installment).join(
+        Contract, Installment.contract_id == Contract.id
+    ).join(
+        Client, Contract.client_id == Client.id
+    ).join(
+        Partner, Client.partner_id == Partner.id
+    ).filter(
+        Installment.payment_date.is_(None),
+        Installment.expected_payment_date.isnot(None)
+    )
+
+    rows = _scoped(query, request, user).group_by(
+        Partner.id, Partner.name, Client.id, Client.name, Contract.id, Contract.name
+    ).order_by(
+        Partner.name, Client.name, Contract.name
+    ).all()
+
+    # Consolida os níveis cliente/parceiro/portfólio a partir das linhas por contrato
+    totals = _empty_buckets()
+    partners = {}
+    for row in rows:
+        buckets = {
+            key: {'count': getattr(row, f'{key}_count'), 'value': Decimal(getattr(row, f'{key}_value'))}
+            for key, _, _ in AGING_BUCKETS
+        }
+        partner = partners.setdefault(row.partner_id, {
+            'partner_id': str(row.partner_id),
+            'partner_name': row.partner_name,
+            'totals': _empty_buckets(),
+            'clients': {},
+        })
+        client = partner['clients'].setdefault(row.client_id, {
+            'client_id': str(row.client_id),
+            'client_name': row.client_name,
+            'totals': _empty_buckets(),
+            'contracts': [],
+        })
+        client['contracts'].append({
+            'contract_id': str(row.contract_id),
+            'contract_name': row.contract_name,
+            **_serialize_buckets(buckets),
+        })
+        _add_buckets(client['totals'], buckets)
+        _add_buckets(partner['totals'], buckets)
+        _add_buckets(totals, buckets)
+
+    return {
+        'as_of': as_of.isoformat(),
+        'bucket_keys': [key for key, _, _ in AGING_BUCKETS],
+        **_serialize_buckets(totals),
+        'partners': [
+            {
+                'partner_id': partner['partner_id'],
+                'partner_name': partner['partner_name'],
+                **_serialize_buckets(partner['totals']),
+                'clients': [
+                    {
+                        'client_id': client['client_id'],
+                        'client_name': client['client_name'],
+                        **_serialize_buckets(client['totals']),
+                        'contracts': client['contracts'],
+                    }
+                    for client in partner['clients'].values()
+                ],
+            }
+            for partner in partners.values()
+        ],
+    }
+
+
+def _competence_date():
+    """Primeiro dia do mês de competência da parcela a partir do rótulo ("Fev/26")"""
+    label_year = func.nullif(
+        func.regexp_replace(func.split_part(Installment.month, '/', 2), r'\D', '', 'g'), ''
+    )
+    month_number = case(
+        {label: index + 1 for index, label in enumerate(MONTH_LABELS)},
+        value=func.split_part(Installment.month, '/', 1)
+    )
+    return func.make_date(2000 + cast(label_year, Integer), month_number, 1)
+
+
+def _projected_payment_date():
+    """
+    Data prevista de pagamento de uma parcela em aberto: expected_payment_date;
+    senão billing_date + payment_term; senão competência + payment_term
+    """
+    return func.coalesce(
+        cast(Installment.expected_payment_date, Date),
+        cast(Installment.billing_date, Date) + Installment.payment_term,
+        _competence_date() + func.coalesce(Installment.payment_term, DEFAULT_PAYMENT_TERM_DAYS)
+    )
+
+
+def _scoped(query, request, user):
+    """Filtros partner_id/client_id do request mais o filtro de parceiro do usuário"""
+    partner_id = request.params.get('partner_id')
+    if partner_id:
+        query = query.filter(Client.partner_id == partner_id)
+    client_id = request.params.get('client_id')
+    if client_id:
+        query = query.filter(Client.id == client_id)
+    return apply_partner_filter(query, Client, user)
+
+
+def _period_starts(as_of, granularity, horizon):
+    if granularity == 'week':
+        first = as_of - timedelta(days=as_of.weekday())
+        return [first + timedelta(weeks=i) for i in range(horizon)]
+    first = date(as_of.year, as_of.month, 1)
+    return [add_months(first, i) for i in range(horizon)]
+
+
+@view_config(route_name='report_cash_flow_forecast', request_method='GET', renderer='json')
+def cash_flow_forecast(request):
+    """
+    GET /api/reports/cash-flow-forecast
+    Previsão de entradas de caixa por semana ou mês a partir das parcelas em
+    aberto (payment_date nulo)
+
+    A data prevista de cada parcela é, nesta ordem: expected_payment_date;
+    billing_date + payment_term; ou, para parcelas não faturadas, o mês de
+    competência + payment_term (30 dias quando não informado). Com
+    adjust_delays, soma-se o atraso médio histórico do cliente
+    (payment_date - expected_payment_date das parcelas pagas).
+
+    Query params:
+        - granularity: week | month (padrão week)
+        - horizon: Número de períodos (padrão 13 semanas / 12 meses)
+        - as_of: Data de referência (YYYY-MM-DD, padrão hoje)
+        - adjust_delays: true/false (padrão false)
+        - partner_id: Filtrar por parceiro (admin global)
+        - client_id: Filtrar por cliente
+
+    Returns:
+        Valores previstos por período (faturado x a faturar) e o total já
+        vencido que ainda não foi pago
+    """
+    user = require_authenticated(request)
+    db = request.dbsession
+
+    granularity = request.params.get('granularity', 'week')
+    if granularity not in FORECAST_GRANULARITIES:
+        return _bad_request('granularity deve ser week ou month')
+    try:
+        as_of = _parse_date_param(request, 'as_of') or date.today()
+        horizon = int(request.params.get('horizon', DEFAULT_FORECAST_HORIZON[granularity]))
+    except ValueError:
+        return _bad_request('Parâmetros inválidos: as_of deve ser YYYY-MM-DD e horizon um inteiro')
+    if not 1 <= horizon <= MAX_FORECAST_HORIZON[granularity]:
+        return _bad_request(f'horizon deve estar entre 1 e {MAX_FORECAST_HORIZON[granularity]}')
+    adjust_delays = request.params.get('adjust_delays', 'false').lower() in ('true', '1', 'yes')
+
+    def scoped(query):
+        return _scoped(query, request, user)
+
+    projected = _projected_payment_date()
+
+    open_installments = db.query(
+        Installment.value.label('value'),
+        Installment.billed.label('billed'),
+    ).join(
+        Contract, Installment.contract_id == Contract.id
+    ).join(
+        Client, Contract.client_id == Client.id
+    ).filter(
+        Installment.payment_date.is_(None)
+    )
+
+    if adjust_delays:
+        # Atraso médio (dias) de cada cliente nas parcelas já pagas
+        delays = scoped(db.query(
+            Client.id.label('client_id'),
+            func.avg(
+                cast(Installment.payment_date, Date) - cast(Installment.expected_payment_date, Date)
+            ).label('avg_delay')
+        ).select_from(Installment).join(
+            Contract, Installment.contract_id == Contract.id
+        ).join(
+            Client, Contract.client_id == Client.id
+        ).filter(
+            Installment.payment_date.isnot(None),
+            Installment.expected_payment_date.isnot(None)
+        )).group_by(Client.id).subquery('delays')
+        open_installments = open_installments.outerjoin(delays, delays.c.client_id == Client.id)
+        projected = projected + cast(func.round(func.coalesce(delays.c.avg_delay, 0)), Integer)
+
+    periods = _period_starts(as_of, granularity, horizon)
+    horizon_end = periods[-1] + timedelta(weeks=1) if granularity == 'week' else add_months(periods[-1], 1)
+
+    forecast = scoped(open_installments.add_columns(
+        projected.label('projected')
+    )).subquery('forecast')
+
+    # Vencidas e não pagas ficam no grupo NULL (overdue); o resto, no período da data prevista
+    bucketed = db.query(
+        case(
+            (forecast.c.projected < as_of, None),
+            else_=cast(func.date_trunc(granularity, forecast.c.projected), Date)
+        ).label('period'),
+        forecast.c.value,
+        forecast.c.billed,
+    ).filter(
+        forecast.c.projected.isnot(None),
+        forecast.c.projected < horizon_end
+    ).subquery('bucketed')
+    rows = db.query(
+        bucketed.c.period,
+        func.count().label('count'),
+        func.sum(bucketed.c.value).label('value'),
+        func.coalesce(func.sum(bucketed.c.value).filter(bucketed.c.billed == True), 0).label('billed_value'),
+    ).group_by(bucketed.c.period).all()
+
+    by_period = {row.period: row for row in rows}
+    overdue = by_period.pop(None, None)
+    result_periods = []
+    total = Decimal('0')
+    for start in periods:
+        row = by_period.get(start)
+        value = Decimal(row.value) if row else Decimal('0')
+        billed_value = Decimal(row.billed_value) if row else Decimal('0')
+        total += value
+        result_periods.append({
+            'start': start.isoformat(),
+            'count': row.count if row else 0,
+            'value': str(value),
+            'billed_value': str(billed_value),
+            'unbilled_value': str(value - billed_value),
+        })
+
+    return {
+        'as_of': as_of.isoformat(),
+        'granularity': granularity,
+        'adjusted_for_delays': adjust_delays,
+        'overdue': {
+            'count': overdue.count if overdue else 0,
+            'value': str(Decimal(overdue.value) if overdue else Decimal('0')),
+        },
+        'total_value': str(total),
+        'periods': result_periods,
+    }
+
+
+def _end_of_quarter(day):
+    return add_months(date(day.year, (day.month - 1) // 3 * 3 + 1, 1), 3) - timedelta(days=1)
+
+
+@view_config(route_name='report_receivables_risk', request_method='GET', renderer='json')
+def receivables_risk_report(request):
+    """
+    GET /api/reports/receivables-risk
+    Simulação de Monte Carlo do valor recebido até uma data limite, a partir
+    das parcelas em aberto e da distribuição histórica de atraso de cada
+    cliente (clientes com poucas parcelas pagas usam a da carteira)
+
+    Query params:
+        - horizon_date: Data limite (YYYY-MM-DD, padrão fim do trimestre atual)
+        - scenarios: Número de cenários (padrão 2000, máx. 10000)
+        - target: Valor alvo; retorna a probabilidade de recebê-lo até a data
+        - partner_id: Filtrar por parceiro (admin global)
+        - client_id: Filtrar por cliente
+
+    Returns:
+        Valor em aberto, valor certo, valor esperado e percentis do valor recebido
+    """
+    user = require_authenticated(request)
+    db = request.dbsession
+
+    try:
+        as_of = date.today()
+        horizon_date = _parse_date_param(request, 'horizon_date') or _end_of_quarter(as_of)
+        scenarios = int(request.params.get('scenarios', receivables_risk.DEFAULT_SCENARIOS))
+        target = request.params.get('target')
+        target = float(target) if target else None
+    except ValueError:
+        return _bad_request('Parâmetros inválidos: horizon_date deve ser YYYY-MM-DD, scenarios um inteiro e target um número')
+    if not 1 <= scenarios <= receivables_risk.MAX_SCENARIOS:
+        return _bad_request(f'scenarios deve estar entre 1 e {receivables_risk.MAX_SCENARIOS}')
+    if horizon_date < as_of:
+        return _bad_request('horizon_date não pode estar no passado')
+
+    def scoped(query):
+        return _scoped(query.join(
+            Contract, Installment.contract_id == Contract.id
+        ).join(
+            Client, Contract.client_id == Client.id
+        ), request, user)
+
+    # Versão dos dados do escopo: qualquer parcela criada, alterada ou removida muda a chave do cache
+    version = tuple(str(item) for item in scoped(db.query(
+        func.count(Installment.id), func.max(Installment.updated_at)
+    ).select_from(Installment)).one())
+    cache_key = (
+        str(user.role), str(user.partner_id),
+        request.params.get('partner_id'), request.params.get('client_id'),
+        as_of, horizon_date, scenarios, target, version,
+    )
+    cached = receivables_risk.simulation_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    # Histograma de atrasos por cliente: (cliente, dias de atraso, quantidade)
+    delay = (
+        cast(Installment.payment_date, Date) - cast(Installment.expected_payment_date, Date)
+    ).label('delay')
+    histogram = scoped(db.query(
+        Client.id, delay, func.count()
+    ).select_from(Installment)).filter(
+        Installment.payment_date.isnot(None),
+        Installment.expected_payment_date.isnot(None)
+    ).group_by(Client.id, delay).all()
+    clients, portfolio = receivables_risk.fit_distributions(histogram)
+
+    projected = _projected_payment_date().label('projected')
+    open_installments = scoped(db.query(
+        Client.id, projected, Installment.value
+    ).select_from(Installment)).filter(
+        Installment.payment_date.is_(None)
+    ).all()
+
+    result = receivables_risk.simulate(
+        (
+            (client_id, projected_date, float(value))
+            for client_id, projected_date, value in open_installments
+            if projected_date is not None and value is not None
+        ),
+        clients,
+        portfolio,
+        as_of,
+        horizon_date,
+        scenarios,
+        seed=zlib.crc32(repr(cache_key).encode('utf-8')),
+        target=target,
+    )
+    result = {
+        'as_of': as_of.isoformat(),
+        'horizon_date': horizon_date.isoformat(),
+        'history_samples': portfolio.samples,
+        'clients_with_own_history': len(clients),
+        **result,
+    }
+    receivables_risk.simulation_cache.put(cache_key, result)
+    return result
+
+
+def _parse_month_param(request, name):
+    value = request.params.get(name)
+    if not value:
+        return None
+    return datetime.strptime(value, '%Y-%m').date()
+
+
+def _utilization(hours, expected):
+    if not expected:
+        return None
+    return round(float(hours / expected * 100), 1)
+
+
+def _utilization_matrix(request):
+    """
+    Matriz consultor × mês das horas dos contratos body_shop_recorrente
+
+    Returns:
+        (meses, linhas por consultor) ou Response de erro
+    """
+    user = require_authenticated(request)
+    db = request.dbsession
+
+    try:
+        today = date.today()
+        last = _parse_month_param(request, 'to_month') or date(today.year, today.month, 1)
+        first = _parse_month_param(request, 'from_month') or add_months(last, 1 - DEFAULT_UTILIZATION_MONTHS)
+    except ValueError:
+        return _bad_request('from_month e to_month devem estar no formato YYYY-MM')
+    months = []
+    month = first
+    while month <= last and len(months) <= MAX_UTILIZATION_MONTHS:
+        months.append(month)
+        month = add_months(month, 1)
+    if not months:
+        return _bad_request('from_month deve ser anterior ou igual a to_month')
+    if len(months) > MAX_UTILIZATION_MONTHS:
+        return _bad_request(f'O período deve ter no máximo {MAX_UTILIZATION_MONTHS} meses')
+
+    # Uma única consulta agrupada sobre as horas mensais mantidas pelos timesheets
+    # (mês de filled_at, ou de uploaded_at quando não preenchido). As linhas vêm
+    # das horas de cada consultor/contrato no período — inclusive de contratos em
+    # que o consultor não está mais alocado —, mais a alocação atual de cada
+    # consultor, para que quem ainda não lançou horas apareça zerado.
+    cells = union_all(
+        select(
+            ContractMonthlyHours.consultant_id,
+            ContractMonthlyHours.contract_id,
+            ContractMonthlyHours.month,
+            ContractMonthlyHours.hours,
+        ).where(
+            ContractMonthlyHours.consultant_id.isnot(None),
+            ContractMonthlyHours.month.between(first, last),
+        ),
+        select(
+            Consultant.id,
+            Consultant.contract_id,
+            cast(null(), Date),
+            literal(0),
+        ).where(Consultant.contract_id.isnot(None)),
+    ).subquery('cells')
+
+    query = db.query(
+        cells.c.consultant_id,
+        Consultant.name.label('consultant_name'),
+        Contract.id.label('contract_id'),
+        Contract.name.label('contract_name'),
+        Client.name.label('client_name'),
+        Contract.estimated_monthly_hours,
+        cells.c.month,
+        func.coalesce(func.sum(cells.c.hours), 0).label('hours'),
+    ).select_from(cells).join(
+        Contract, cells.c.contract_id == Contract.id
+    ).join(
+        Client, Contract.client_id == Client.id
+    ).outerjoin(
+        Consultant, cells.c.consultant_id == Consultant.id
+    ).filter(
+        Contract.contract_type == 'body_shop_recorrente'
+    )
+    contract_id = request.params.get('contract_id')
+    if contract_id:
+        query = query.filter(Contract.id == contract_id)
+
+    rows = _scoped(query, request, user).group_by(
+        cells.c.consultant_id, Consultant.name, Contract.id, Contract.name, Client.name,
+        Contract.estimated_monthly_hours, cells.c.month
+    ).order_by(
+        Client.name, Contract.name, Consultant.name, cells.c.consultant_id
+    ).all()
+
+    index = {month: i for i, month in enumerate(months)}
+    consultants = {}
+    for row in rows:
+        consultant = consultants.get((row.consultant_id, row.contract_id))
+        if consultant is None:
+            consultant = consultants[(row.consultant_id, row.contract_id)] = {
+                'consultant_id': row.consultant_id,
+                'consultant_name': row.consultant_name,
+                'contract_id': row.contract_id,
+                'contract_name': row.contract_name,
+                'client_name': row.client_name,
+                'estimated_monthly_hours': row.estimated_monthly_hours,
+                'hours': [Decimal('0')] * len(months),
+            }
+        if row.month is not None:
+            consultant['hours'][index[row.month]] += Decimal(row.hours)
+    return months, list(consultants.values())
+
+
+@view_config(route_name='report_consultant_utilization', request_method='GET', renderer='json')
+def consultant_utilization(request):
+    """
+    GET /api/reports/consultant-utilization
+    Utilização dos consultores de contratos body_shop_recorrente: horas
+    lançadas por mês contra as estimated_monthly_hours do contrato
+
+    Query params:
+        - from_month: Primeiro mês (YYYY-MM, padrão 11 meses antes de to_month)
+        - to_month: Último mês (YYYY-MM, padrão mês atual); no máximo 24 meses
+        - partner_id: Filtrar por parceiro (admin global)
+        - client_id: Filtrar por cliente
+        - contract_id: Filtrar por contrato
+
+    Returns:
+        Meses do período e, por consultor/contrato, horas e utilização (%)
+        alinhadas com os meses
+    """
+    result = _utilization_matrix(request)
+    if isinstance(result, Response):
+        return result
+    months, consultants = result
+
+    total_hours = Decimal('0')
+    total_expected = Decimal('0')
+    items = []
+    for consultant in consultants:
+        expected = consultant['estimated_monthly_hours']
+        hours = sum(consultant['hours'], Decimal('0'))
+        total_hours += hours
+        if expected:
+            total_expected += expected * len(months)
+        items.append({
+            'consultant_id': str(consultant['consultant_id']),
+            'consultant_name': consultant['consultant_name'],
+            'contract_id': str(consultant['contract_id']),
+            'contract_name': consultant['contract_name'],
+            'client_name': consultant['client_name'],
+            'estimated_monthly_hours': str(expected) if expected is not None else None,
+            'hours': [str(value) for value in consultant['hours']],
+            'utilization': [_utilization(value, expected) for value in consultant['hours']],
+            'total_hours': str(hours),
+            'average_utilization': _utilization(hours, expected * len(months) if expected else None),
+        })
+
+    return {
+        'months': [month.strftime('%Y-%m') for month in months],
+        'total_hours': str(total_hours),
+        'total_expected_hours': str(total_expected),
+        'utilization': _utilization(total_hours, total_expected),
+        'consultants': items,
+    }
+
+
+@view_config(route_name='report_consultant_utilization_csv', request_method='GET')
+def export_consultant_utilization_csv(request):
+    """
+    GET /api/reports/consultant-utilization/csv
+    Exporta a matriz de utilização para CSV/Excel (mesmos filtros do relatório)
+
+    Returns:
+        Arquivo CSV com horas e utilização (%) por mês
+    """
+    result = _utilization_matrix(request)
+    if isinstance(result, Response):
+        return result
+    months, consultants = result
+
+    output = io.StringIO()
+    writer = csv.writer(output)
+    header = ['Consultor', 'Contrato', 'Cliente', 'Horas Estimadas/Mês']
+    for month in months:
+        header += [f'{month_label(month)} Horas', f'{month_label(month)} %']
+    header += ['Total Horas', 'Utilização Média %']
+    writer.writerow(header)
+
+    for consultant in consultants:
+        expected = consultant['estimated_monthly_hours']
+        line = [
+            consultant['consultant_name'],
+            consultant['contract_name'],
+            consultant['client_name'],
+            str(expected) if expected is not None else '',
+        ]
+        for value in consultant['hours']:
+            utilization = _utilization(value, expected)
+            line += [str(value), '' if utilization is None else str(utilization)]
+        hours = sum(consultant['hours'], Decimal('0'))
+        average = _utilization(hours, expected * len(months) if expected else None)
+        line += [str(hours), '' if average is None else str(average)]
+        writer.writerow(line)
+
+    csv_data = output.getvalue()
+    output.close()
+
+    filename = f'utilizacao_consultores_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+
+    response = Response(
+        body=csv_data.encode('utf-8-sig'),  # utf-8-sig para Excel reconhecer UTF-8
+        content_type='text/csv; charset=utf-8-sig',
+        charset='utf-8-sig'
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+
+    return response
@@ -13,6 +13,7 @@ from backend.schemas import TimesheetSchema, TimesheetCreateSchema
 from backend.auth_helpers import require_authenticated, can_access_resource, apply_partner_filter
 from backend.storage import get_timesheet_file_path, save_timesheet_file
 from backend.logging_config import log_exception
+from backend.timesheet_anomalies import reset_anomaly_check
 from marshmallow import ValidationError
 import json
 import uuid
@@ -64,6 +65,8 @@ class TimesheetViews:
         Query params:
             - contract_id: Filtrar por contrato (UUID)
             - consultant_id: Filtrar por consultor (UUID)
+            - anomalous: true/false — apenas timesheets marcados (ou não) pela
+              detecção de horas anômalas (backend.timesheet_anomalies)
         
         Returns:
             Lista de timesheets
@@ -83,6 +86,10 @@ class TimesheetViews:
         if consultant_id:
             query = query.filter(Timesheet.consultant_id == consultant_id)
         
+        anomalous = self.request.params.get('anomalous')
+        if anomalous is not None:
+            query = query.filter(Timesheet.anomaly_flagged == (anomalous.lower() in ('true', '1', 'yes')))
+        
         # Aplicar filtro por parceiro (usuários não-admin só veem timesheets dos seus contratos)
         if user.role.value != 'admin_global':
             query = query.join(Contract).join(Client)
@@ -284,11 +291,12 @@ class TimesheetViews:
                 content_type='application/json',
                 charset='utf-8'
             )
+        # Trava o timesheet: os deltas de horas do contrato partem do valor antigo lido aqui
         timesheet = self.db.query(Timesheet).options(
             joinedload(Timesheet.contract).joinedload(Contract.client)
         ).filter(
             Timesheet.id == timesheet_id
-        ).first()
+        ).populate_existing().with_for_update(of=Timesheet).one_or_none()
         
         if not timesheet:
             return Response(
@@ -343,6 +351,10 @@ class TimesheetViews:
                         )
                 timesheet.consultant_id = data['consultant_id']
             
+            # Horas, data ou consultor alterados: volta para a fila da detecção de anomalias
+            if {'hours', 'filled_at', 'consultant_id'} & data.keys():
+                reset_anomaly_check(timesheet)
+            
             self.db.flush()
             
             # Serializa os dados
@@ -385,11 +397,12 @@ class TimesheetViews:
                 content_type='application/json',
                 charset='utf-8'
             )
+        # Trava o timesheet: os deltas de horas do contrato partem do valor antigo lido aqui
         timesheet = self.db.query(Timesheet).options(
             joinedload(Timesheet.contract).joinedload(Contract.client)
         ).filter(
             Timesheet.id == timesheet_id
-        ).first()
+        ).populate_existing().with_for_update(of=Timesheet).one_or_none()
         
         if not timesheet:
             return Response(